@@ -0,0 +1,113 @@
+"""Micro-benchmark: serializing a list of full reports.
+
+Compares FastAPI's default path (jsonable_encoder + stdlib json), orjson
+behind jsonable_encoder (what api_router's default response class does for
+ordinary return values) and orjson on the raw Mongo documents (what the
+report read endpoints do by returning ORJSONResponse themselves).
+
+Usage (from the backend directory):
+    python bench_json.py [--reports 1000] [--photos 4] [--repeat 5]
+"""
+import argparse
+import hashlib
+import time
+import uuid
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from photo_store import PHOTO_FIELDS, link_report_photos
+
+
+def sample_report(index: int, photos_per_field: int) -> dict:
+    """A report shaped like the documents get_technician_reports returns"""
+    report = {
+        "id": str(uuid.uuid4()),
+        "unique_link": str(uuid.uuid4()),
+        "technician_id": str(uuid.uuid4()),
+        "technician_name": "tech",
+        "customer_name": f"Customer {index}",
+        "customer_email": f"customer{index}@example.com",
+        "customer_phone": "555-0100",
+        "archived": False,
+        "evaporator_brand": "LENNOX",
+        "evaporator_model_number": "CX35-36B-6F",
+        "evaporator_serial_number": "5823C12345",
+        "evaporator_date_of_manufacture": "March 2023",
+        "evaporator_age": "3 years 7 months",
+        "evaporator_warranty_status": "Active (6 years 5 months remaining)",
+        "evaporator_warranty_details": "Parts: 10-year coverage. Labor: not included.",
+        "condenser_brand": "LENNOX",
+        "condenser_model_number": "XC21-036-230-06",
+        "condenser_serial_number": "5823C54321",
+        "condenser_date_of_manufacture": "March 2023",
+        "condenser_age": "3 years 7 months",
+        "condenser_warranty_status": "Active (6 years 5 months remaining)",
+        "condenser_warranty_details": "Compressor: 10-year warranty.",
+        "condenser_fan_motor": "Normal Operation",
+        "rated_rla": 14.1, "rated_lra": 77.0, "actual_rla": 12.8, "actual_lra": 70.5,
+        "refrigerant_type": "R-410A",
+        "superheat": 10.5, "subcooling": 9.0,
+        "refrigerant_status": "Good",
+        "blower_motor_type": "PSC Motor",
+        "blower_motor_capacitor_rating": 10.0, "blower_motor_capacitor_reading": 9.6,
+        "blower_motor_capacitor_health": "Good", "blower_motor_capacitor_tolerance": 4.0,
+        "condenser_capacitor_herm_rating": 45.0, "condenser_capacitor_herm_reading": 43.2,
+        "condenser_capacitor_fan_rating": 5.0, "condenser_capacitor_fan_reading": 4.8,
+        "condenser_capacitor_health": "Good", "condenser_capacitor_tolerance": 4.0,
+        "return_temp": 75.0, "supply_temp": 57.0, "delta_t": 18.0, "delta_t_status": "Good",
+        "overflow_float_switch": "Normal Operation",
+        "primary_drain": "Flushed and draining normally",
+        "primary_drain_notes": "",
+        "drain_pan_condition": "Good shape",
+        "air_filters": "Filters Replaced (Provided by the technician)",
+        "filters_list": [{"size": "16x25x1", "quantity": "2"}],
+        "evaporator_coil": "Clean",
+        "condenser_coils": "Cleaned with Fresh Water",
+        "air_purifier": "Good", "plenums": "Good condition", "ductwork": "Good condition",
+        "notes": "System running well. Recommended annual maintenance.",
+        "other_repair_recommendations": None,
+        "warnings": [{"type": "delta_t", "severity": "warning", "message": "Delta T is 14.0°F", "part_needed": None}],
+        "performance_score": 92,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "current_version": 1, "edit_count": 0, "revision": index + 1,
+    }
+    for field in PHOTO_FIELDS:
+        report[field] = [hashlib.sha256(f"{index}{field}{n}".encode()).hexdigest() for n in range(photos_per_field)]
+    return link_report_photos(report)
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time report list serialization")
+    parser.add_argument("--reports", type=int, default=1000)
+    parser.add_argument("--photos", type=int, default=4, help="Photos per photo field")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    reports = [sample_report(i, args.photos) for i in range(args.reports)]
+    paths = {
+        "jsonable_encoder + json (FastAPI default)": lambda: JSONResponse(jsonable_encoder(reports)).body,
+        "jsonable_encoder + orjson (router default)": lambda: ORJSONResponse(jsonable_encoder(reports)).body,
+        "orjson on Mongo documents (report reads)": lambda: ORJSONResponse(reports).body,
+    }
+    size = len(ORJSONResponse(reports).body)
+    print(f"{args.reports} reports, {size / (1024 * 1024):.1f} MB of JSON, best of {args.repeat}")
+    baseline = None
+    for name, func in paths.items():
+        elapsed = best_of(args.repeat, func)
+        baseline = baseline or elapsed
+        print(f"  {name:<45} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
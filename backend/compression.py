@@ -0,0 +1,204 @@
+"""Response compression.
+
+CompressionMiddleware negotiates brotli (when the Brotli package is
+installed) or gzip from Accept-Encoding and compresses complete response
+bodies of at least COMPRESS_MIN_BYTES whose type is text, JSON or NDJSON.
+Images are served as-is since their bytes are already compressed. Streaming
+responses (NDJSON batches, Server-Sent Events, photo streams) pass through
+untouched, because buffering them would defeat the point of streaming.
+
+A compressed body gets the weak form of the upstream ETag (W/"..."): it is
+the same content but not the same bytes, and a strong validator must name
+exact bytes (Range requests, for one, rely on that). The routes' ETag checks
+ignore the W/ prefix, so revalidation still ends in a 304.
+
+Public responses that carry an ETag, such as the parts catalog and shared
+report views, are identified by path + query + ETag + encoding. Their compressed
+bodies are kept in an LRU bounded by COMPRESS_CACHE_MB, so a hot response is
+compressed once rather than on every request. Private responses are never
+cached because their ETags aren't unique across users.
+
+Large bodies are compressed in a worker thread (zlib and brotli release the
+GIL) so a multi-megabyte report list doesn't stall the event loop.
+"""
+import gzip
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+COMPRESS_CACHE_MB = float(os.environ.get('COMPRESS_CACHE_MB', '32'))
+# Bodies above this are compressed off the event loop
+THREAD_THRESHOLD = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+
+def weak_etag(etag: str) -> str:
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class Compressor:
+    """Settings, compressed-body cache and counters shared with the middleware"""
+
+    def __init__(self, min_size: int = COMPRESS_MIN_BYTES, gzip_level: int = COMPRESS_GZIP_LEVEL,
+                 brotli_quality: int = COMPRESS_BROTLI_QUALITY,
+                 cache_bytes: int = int(COMPRESS_CACHE_MB * 1024 * 1024)):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+        self.cache_bytes = cache_bytes
+        self.cache_size = 0
+        self._cache: OrderedDict[tuple[str, bytes, str, str], bytes] = OrderedDict()
+        self.stats = {
+            "compressed": 0, "skipped_small": 0, "skipped_type": 0, "streamed": 0,
+            "bytes_in": 0, "bytes_out": 0, "cache_hits": 0, "cache_misses": 0, "cache_evictions": 0,
+        }
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        """Preferred encoding the client accepts (q=0 means refused)"""
+        accepted = {}
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            quality = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[name.strip().lower()] = quality
+        for encoding in self.encodings:
+            if accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return None
+
+    def should_compress(self, headers: Headers, status: int, body: bytes) -> bool:
+        if status in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES) and "+json" not in content_type:
+            self.stats["skipped_type"] += 1
+            return False
+        if len(body) < self.min_size:
+            self.stats["skipped_small"] += 1
+            return False
+        return True
+
+    def _encode(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def compress(self, path: str, headers: Headers, body: bytes, encoding: str,
+                       query: bytes = b"") -> bytes:
+        etag = headers.get("etag")
+        cache_control = headers.get("cache-control", "")
+        key = None
+        if etag and "private" not in cache_control and "no-store" not in cache_control:
+            key = (path, query, etag, encoding)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                self._count(body, cached)
+                return cached
+            self.stats["cache_misses"] += 1
+
+        if len(body) > THREAD_THRESHOLD:
+            compressed = await anyio.to_thread.run_sync(self._encode, body, encoding)
+        else:
+            compressed = self._encode(body, encoding)
+        self._count(body, compressed)
+        if key is not None and len(compressed) <= self.cache_bytes:
+            self._store(key, compressed)
+        return compressed
+
+    def _count(self, body: bytes, compressed: bytes) -> None:
+        self.stats["compressed"] += 1
+        self.stats["bytes_in"] += len(body)
+        self.stats["bytes_out"] += len(compressed)
+
+    def _store(self, key: tuple[str, bytes, str, str], compressed: bytes) -> None:
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self.cache_size -= len(previous)
+        self._cache[key] = compressed
+        self.cache_size += len(compressed)
+        while self.cache_size > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self.cache_size -= len(evicted)
+            self.stats["cache_evictions"] += 1
+
+    def snapshot(self) -> dict:
+        cache_lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        return {
+            **self.stats,
+            "encodings": list(self.encodings),
+            "ratio": round(self.stats["bytes_out"] / self.stats["bytes_in"], 3) if self.stats["bytes_in"] else None,
+            "cache_hit_ratio": round(self.stats["cache_hits"] / cache_lookups, 3) if cache_lookups else None,
+            "cache_entries": len(self._cache),
+            "cache_mb": round(self.cache_size / (1024 * 1024), 2),
+        }
+
+
+class CompressionMiddleware:
+    def __init__(self, app, compressor: Compressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = self.compressor.negotiate(request_headers.get("accept-encoding", ""))
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows whether this is a stream
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if message.get("more_body", False):
+                self.compressor.stats["streamed"] += 1
+                passthrough = True
+            elif encoding is not None and self.compressor.should_compress(headers, start["status"], body):
+                body = await self.compressor.compress(scope["path"], headers, body, encoding,
+                                                      query=scope.get("query_string", b""))
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "etag" in headers:
+                    headers["ETag"] = weak_etag(headers["etag"])
+                message = {"type": "http.response.body", "body": body}
+            elif start["status"] == 304 and "etag" in headers:
+                # Echo the validator in the form the client holds, weak if its copy was compressed
+                weak = weak_etag(headers["etag"])
+                if weak in (tag.strip() for tag in request_headers.get("if-none-match", "").split(",")):
+                    headers["ETag"] = weak
+            if headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                # Also on uncompressed replies, so shared caches keep one copy per encoding
+                headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
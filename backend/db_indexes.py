@@ -0,0 +1,206 @@
+"""MongoDB index declarations.
+
+The server reconciles these at startup (see ensure_indexes). Run this module
+directly to explain the app's hot queries and flag any that would fall back
+to a collection scan:
+
+    python db_indexes.py --check
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# collection -> indexes the app relies on
+INDEXES = {
+    "technicians": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "customers": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "reports": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("unique_link", ASCENDING)], name="unique_link_unique", unique=True),
+        # Technician dashboard: filter by owner/archived, newest first, id as the keyset tiebreaker
+        IndexModel(
+            [("technician_id", ASCENDING), ("archived", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="technician_archived_created",
+        ),
+        # List ETags (count + sum of revisions) are answered from these without touching documents
+        IndexModel(
+            [("technician_id", ASCENDING), ("archived", ASCENDING), ("revision", DESCENDING)],
+            name="technician_archived_revision",
+        ),
+        IndexModel([("id", ASCENDING), ("revision", DESCENDING)], name="id_revision"),
+    ],
+    # A customer's report history: one link per (customer, report), carrying the report's created_at
+    "customer_reports": [
+        IndexModel([("customer_id", ASCENDING), ("report_id", ASCENDING)], name="customer_report_unique", unique=True),
+        # Customer dashboard: newest first, report_id as the keyset tiebreaker; covers the id-only scan
+        IndexModel(
+            [("customer_id", ASCENDING), ("created_at", DESCENDING), ("report_id", DESCENDING)],
+            name="customer_created",
+        ),
+    ],
+    "report_versions": [
+        IndexModel([("report_id", ASCENDING), ("version", ASCENDING)], name="report_version_unique", unique=True),
+    ],
+    "photo_uploads": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Sessions only; PhotoUploads.purge_expired sweeps their staging files by mtime
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "ocr_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Startup recovery and the lease sweeper look jobs up by status
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "ocr_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        # Size-bounded eviction drops the least recently used entries first
+        IndexModel([("last_used_at", ASCENDING)], name="last_used_at"),
+    ],
+}
+
+# Representative queries for --check: (collection, filter, sort)
+HOT_QUERIES = [
+    ("technicians", {"email": "tech@example.com"}, None),
+    ("technicians", {"id": "x"}, None),
+    ("customers", {"email": "customer@example.com"}, None),
+    ("customers", {"id": "x"}, None),
+    ("reports", {"id": "x"}, None),
+    ("reports", {"unique_link": "x"}, None),
+    ("reports", {"technician_id": "x", "archived": {"$ne": True}}, [("created_at", -1), ("id", -1)]),
+    ("reports", {"technician_id": "x"}, [("created_at", -1), ("id", -1)]),
+    ("customer_reports", {"customer_id": "x"}, [("created_at", -1), ("report_id", -1)]),
+    ("report_versions", {"report_id": "x", "version": {"$lte": 4}}, [("version", 1)]),
+    ("photo_uploads", {"id": "x", "owner_id": "y"}, None),
+    ("ocr_jobs", {"id": "x", "owner_id": "y"}, None),
+    ("ocr_jobs", {"status": "running", "lease_expires_at": {"$lt": 0}}, None),
+]
+
+# Options that make two indexes on the same keys different
+_INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _same_index(declared: dict, existing: dict) -> bool:
+    if list(declared["key"].items()) != list(existing["key"]):
+        return False
+    return all(declared.get(option) == existing.get(option) for option in _INDEX_OPTIONS)
+
+
+async def log_index_builds_in_progress(client) -> None:
+    try:
+        ops = await client.admin.aggregate([
+            {"$currentOp": {"allUsers": True}},
+            {"$match": {"$or": [
+                {"command.createIndexes": {"$exists": True}},
+                {"msg": {"$regex": "^Index Build"}},
+            ]}},
+        ]).to_list(None)
+    except OperationFailure as e:
+        logger.debug(f"Can't inspect current operations: {e}")
+        return
+    for op in ops:
+        progress = op.get("progress") or {}
+        logger.info(
+            f"Index build in progress on {op.get('ns')}: "
+            f"{op.get('msg', 'createIndexes')} ({progress.get('done', '?')}/{progress.get('total', '?')})"
+        )
+
+
+async def ensure_indexes(db) -> None:
+    """Create missing indexes and rebuild ones whose definition has drifted"""
+    await log_index_builds_in_progress(db.client)
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        for model in models:
+            declared = model.document
+            name = declared["name"]
+            current = existing.get(name)
+            if current is not None and _same_index(declared, current):
+                continue
+            # Same keys and options under a different name (e.g. created by hand) also count
+            if current is None and any(_same_index(declared, info) for info in existing.values()):
+                continue
+            try:
+                if current is not None:
+                    logger.warning(f"Index {collection_name}.{name} definition changed, rebuilding")
+                    await collection.drop_index(name)
+                logger.info(f"Building index {collection_name}.{name}")
+                await collection.create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicate emails blocking a unique index; keep serving and surface it loudly
+                logger.error(f"Failed to build index {collection_name}.{name}: {e}")
+        declared_names = {model.document["name"] for model in models}
+        for name in existing:
+            if name != "_id_" and name not in declared_names:
+                logger.info(f"Undeclared index {collection_name}.{name} left in place")
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def check_queries(db) -> int:
+    """Explain each hot query and return how many would do a COLLSCAN"""
+    failures = 0
+    for collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        if status == "COLLSCAN":
+            failures += 1
+        print(f"{status:9} {collection_name} {query} sort={sort} plan={' <- '.join(s for s in stages if s)}")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="Flag hot queries that would fall back to COLLSCAN")
+    parser.add_argument("--apply", action="store_true", help="Reconcile indexes now (the server also does this at startup)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.apply:
+            await ensure_indexes(db)
+        if args.check:
+            failures = await check_queries(db)
+            if failures:
+                print(f"{failures} quer{'y' if failures == 1 else 'ies'} would fall back to COLLSCAN")
+                sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
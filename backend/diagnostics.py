@@ -0,0 +1,270 @@
+"""Report diagnostics: capacitor, Delta T and refrigerant checks, warnings and score.
+
+Shared by create, edit and the batch re-scoring job so they can't drift apart.
+All thresholds live in the tables below and are turned into sorted cut-point
+arrays once at import; evaluating a report is a handful of bisects and dict
+lookups, cheap enough to re-score thousands of reports per second.
+"""
+import math
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+# ---- Threshold tables -------------------------------------------------------
+
+# Capacitor % off rated value: (max tolerance inclusive, status)
+CAPACITOR_BANDS = ((6, "Good"), (10, "Warning"), (math.inf, "Critical"))
+
+# Delta T in °F: 15-24 Good, 10-15 Warning, anything else Critical
+DELTA_T_GOOD_RANGE = (15, 24)
+DELTA_T_WARNING_RANGE = (10, 15)  # low inclusive, high exclusive
+
+# Amp draw % off rated: (max tolerance inclusive, status)
+AMP_DRAW_BANDS = ((10, "Good"), (20, "Warning"), (math.inf, "Critical"))
+
+STATUS_PRIORITY = {"Critical": 3, "Warning": 2, "Good": 1}
+
+# Score penalties (score starts at 100, clamped to 0-100)
+# Capacitor: tolerance strictly above the threshold costs the points
+CAPACITOR_PENALTIES = ((6, 10), (10, 20), (15, 30), (20, 40))
+# Delta T: below the low cut or above the high cut costs the points; worst tier wins
+DELTA_T_LOW_PENALTIES = ((10, 25), (12, 15), (15, 8))
+DELTA_T_HIGH_PENALTIES = ((22, 8), (25, 15), (28, 25))
+REFRIGERANT_PENALTIES = {"Critical": 20, "Low": 10}
+PRIMARY_DRAIN_PENALTIES = {"Clogged, needs immediate service": 15}
+DRAIN_PAN_PENALTIES = {
+    "Rusted and should be replaced": 15,
+    "Poor condition": 10,
+    "Fair condition": 5,
+}
+AIR_PURIFIER_PENALTIES = {
+    "Air purifier needs replacement": 10,
+    "UV light needs replacement": 5,
+}
+# System age in years: strictly above the threshold costs the points
+SYSTEM_AGE_PENALTIES = ((12, 5), (15, 10))
+
+# ---- Compiled cut points ----------------------------------------------------
+
+_CAPACITOR_CUTS = [limit for limit, _ in CAPACITOR_BANDS[:-1]]
+_CAPACITOR_STATUSES = [status for _, status in CAPACITOR_BANDS]
+_AMP_DRAW_CUTS = [limit for limit, _ in AMP_DRAW_BANDS[:-1]]
+_AMP_DRAW_STATUSES = [status for _, status in AMP_DRAW_BANDS]
+
+
+def _compile_above(table):
+    # bisect_left(cuts, x) == number of cuts strictly below x
+    return [cut for cut, _ in table], [0] + [points for _, points in table]
+
+
+def _compile_below(table):
+    # bisect_right(cuts, x) == number of cuts at or below x
+    return [cut for cut, _ in table], [points for _, points in table] + [0]
+
+
+_CAPACITOR_PENALTY_CUTS, _CAPACITOR_PENALTY_POINTS = _compile_above(CAPACITOR_PENALTIES)
+_DELTA_T_LOW_CUTS, _DELTA_T_LOW_POINTS = _compile_below(DELTA_T_LOW_PENALTIES)
+_DELTA_T_HIGH_CUTS, _DELTA_T_HIGH_POINTS = _compile_above(DELTA_T_HIGH_PENALTIES)
+_SYSTEM_AGE_CUTS, _SYSTEM_AGE_POINTS = _compile_above(SYSTEM_AGE_PENALTIES)
+
+
+# ---- Individual checks ------------------------------------------------------
+
+def check_capacitor_tolerance(rating: float, reading: float) -> tuple[str, float, bool]:
+    tolerance = abs(rating - reading) / rating * 100
+    status = _CAPACITOR_STATUSES[bisect_left(_CAPACITOR_CUTS, tolerance)]
+    return status, tolerance, status != "Good"
+
+
+def check_delta_t(delta: float) -> str:
+    if DELTA_T_GOOD_RANGE[0] <= delta <= DELTA_T_GOOD_RANGE[1]:
+        return "Good"
+    elif DELTA_T_WARNING_RANGE[0] <= delta < DELTA_T_WARNING_RANGE[1]:
+        return "Warning"
+    else:
+        return "Critical"
+
+
+def check_amp_draw(actual: float, rated: float) -> str:
+    tolerance = abs(actual - rated) / rated * 100
+    return _AMP_DRAW_STATUSES[bisect_left(_AMP_DRAW_CUTS, tolerance)]
+
+
+def calculate_performance_score(data) -> int:
+    """Calculate overall system performance score (0-100)"""
+    score = 100
+    score -= _CAPACITOR_PENALTY_POINTS[bisect_left(_CAPACITOR_PENALTY_CUTS, data.get('capacitor_tolerance', 0))]
+    delta_t = data.get('delta_t', 18)
+    score -= max(
+        _DELTA_T_LOW_POINTS[bisect_right(_DELTA_T_LOW_CUTS, delta_t)],
+        _DELTA_T_HIGH_POINTS[bisect_left(_DELTA_T_HIGH_CUTS, delta_t)],
+    )
+    score -= REFRIGERANT_PENALTIES.get(data.get('refrigerant_status', 'Good'), 0)
+    score -= PRIMARY_DRAIN_PENALTIES.get(data.get('primary_drain'), 0)
+    score -= DRAIN_PAN_PENALTIES.get(data.get('drain_pan_condition', 'Good shape'), 0)
+    score -= AIR_PURIFIER_PENALTIES.get(data.get('air_purifier', 'Good'), 0)
+    score -= _SYSTEM_AGE_POINTS[bisect_left(_SYSTEM_AGE_CUTS, data.get('system_age', 0))]
+    return max(0, min(100, score))
+
+
+# ---- Whole-report evaluation ------------------------------------------------
+
+def build_warnings(blower_status, blower_tolerance, blower_needs_replacement,
+                   herm_tolerance, herm_needs_replacement,
+                   fan_tolerance, fan_needs_replacement,
+                   condenser_status, delta_t, delta_t_status, refrigerant_status) -> list:
+    warnings = []
+    if blower_needs_replacement:
+        warnings.append({
+            "type": "blower_capacitor",
+            "severity": blower_status.lower(),
+            "message": f"Blower motor capacitor reading is {blower_tolerance:.1f}% off from rated value",
+            "part_needed": "capacitor"
+        })
+    if herm_needs_replacement or fan_needs_replacement:
+        cap_message_parts = []
+        if herm_needs_replacement:
+            cap_message_parts.append(f"Herm terminal: {herm_tolerance:.1f}% off")
+        if fan_needs_replacement:
+            cap_message_parts.append(f"Fan terminal: {fan_tolerance:.1f}% off")
+        warnings.append({
+            "type": "condenser_capacitor",
+            "severity": condenser_status.lower(),
+            "message": f"Condenser dual run capacitor - {', '.join(cap_message_parts)}",
+            "part_needed": "capacitor"
+        })
+    if delta_t_status != "Good":
+        warnings.append({
+            "type": "delta_t",
+            "severity": delta_t_status.lower(),
+            "message": f"Delta T is {delta_t:.1f}°F (ideal range: 15-22°F)",
+            "part_needed": None
+        })
+    if refrigerant_status != "Good":
+        warnings.append({
+            "type": "refrigerant",
+            "severity": "warning" if "Low" in refrigerant_status else "critical",
+            "message": f"Refrigerant status: {refrigerant_status}",
+            "part_needed": "refrigerant"
+        })
+    return warnings
+
+
+@dataclass
+class Diagnostics:
+    delta_t: float
+    delta_t_status: str
+    blower_motor_capacitor_health: Optional[str]
+    blower_motor_capacitor_tolerance: Optional[float]
+    condenser_capacitor_health: str
+    condenser_capacitor_tolerance: float
+    warnings: list
+    performance_score: int
+
+    def fields(self) -> dict:
+        """Derived report fields, ready to $set on a report document"""
+        return asdict(self)
+
+
+# Everything evaluate_report reads; a change to any other field can't change the diagnostics
+DIAGNOSTIC_INPUTS = (
+    "return_temp", "supply_temp",
+    "blower_motor_type", "blower_motor_capacitor_rating", "blower_motor_capacitor_reading",
+    "condenser_capacitor_herm_rating", "condenser_capacitor_herm_reading",
+    "condenser_capacitor_fan_rating", "condenser_capacitor_fan_reading",
+    "refrigerant_status", "primary_drain", "drain_pan_condition", "air_purifier",
+)
+# Inputs a report can't be scored without; the ratings must also be non-zero
+REQUIRED_INPUTS = (
+    "return_temp", "supply_temp",
+    "condenser_capacitor_herm_rating", "condenser_capacitor_herm_reading",
+    "condenser_capacitor_fan_rating", "condenser_capacitor_fan_reading",
+)
+# What a missing checklist answer is scored as; older reports predate some of these fields
+INPUT_DEFAULTS = {
+    "refrigerant_status": "Good",
+    "primary_drain": "",
+    "drain_pan_condition": "Good shape",
+    "air_purifier": "Good",
+}
+
+
+class MissingInputs(ValueError):
+    def __init__(self, fields: list):
+        super().__init__(f"Missing or zero: {', '.join(fields)}")
+        self.fields = fields
+
+
+def evaluate_report(data) -> Diagnostics:
+    """Evaluate a MaintenanceReportCreate (or a dict with the same measurement fields).
+
+    Missing checklist answers fall back to INPUT_DEFAULTS; a missing measurement
+    raises MissingInputs.
+    """
+    read = data.get if isinstance(data, dict) else lambda name: getattr(data, name, None)
+
+    def get(name):
+        value = read(name)
+        return INPUT_DEFAULTS.get(name) if value is None else value
+
+    missing = [name for name in REQUIRED_INPUTS
+               if get(name) is None or (name.endswith("_rating") and get(name) == 0)]
+    if missing:
+        raise MissingInputs(missing)
+
+    delta_t = get("return_temp") - get("supply_temp")
+
+    # Blower motor capacitor - only checked for PSC motors with both values entered
+    blower_type = get("blower_motor_type")
+    blower_rating = get("blower_motor_capacitor_rating")
+    blower_reading = get("blower_motor_capacitor_reading")
+    if blower_type == "PSC Motor" and blower_rating and blower_reading:
+        blower_status, blower_tolerance, blower_needs_replacement = check_capacitor_tolerance(blower_rating, blower_reading)
+    else:
+        # ECM Motor - no capacitor needed
+        blower_status, blower_tolerance, blower_needs_replacement = "N/A", 0.0, False
+
+    # Condenser dual run capacitor: Herm and Fan terminals, worst of both
+    herm_status, herm_tolerance, herm_needs_replacement = check_capacitor_tolerance(
+        get("condenser_capacitor_herm_rating"), get("condenser_capacitor_herm_reading")
+    )
+    fan_status, fan_tolerance, fan_needs_replacement = check_capacitor_tolerance(
+        get("condenser_capacitor_fan_rating"), get("condenser_capacitor_fan_reading")
+    )
+    condenser_tolerance = max(herm_tolerance, fan_tolerance)
+    if STATUS_PRIORITY.get(herm_status, 0) >= STATUS_PRIORITY.get(fan_status, 0):
+        condenser_status = herm_status
+    else:
+        condenser_status = fan_status
+
+    delta_t_status = check_delta_t(delta_t)
+    refrigerant_status = get("refrigerant_status")
+
+    warnings = build_warnings(
+        blower_status, blower_tolerance, blower_needs_replacement,
+        herm_tolerance, herm_needs_replacement,
+        fan_tolerance, fan_needs_replacement,
+        condenser_status, delta_t, delta_t_status, refrigerant_status,
+    )
+
+    performance_score = calculate_performance_score({
+        'capacitor_tolerance': max(blower_tolerance, condenser_tolerance),
+        'delta_t': delta_t,
+        'refrigerant_status': refrigerant_status,
+        'primary_drain': get("primary_drain"),
+        'drain_pan_condition': get("drain_pan_condition"),
+        'air_purifier': get("air_purifier"),
+        'system_age': 0  # Age is a free-text string on reports, not scored yet
+    })
+
+    is_psc = blower_type == "PSC Motor"
+    return Diagnostics(
+        delta_t=delta_t,
+        delta_t_status=delta_t_status,
+        blower_motor_capacitor_health=blower_status if is_psc else None,
+        blower_motor_capacitor_tolerance=blower_tolerance if is_psc else None,
+        condenser_capacitor_health=condenser_status,
+        condenser_capacitor_tolerance=condenser_tolerance,
+        warnings=warnings,
+        performance_score=performance_score,
+    )
@@ -0,0 +1,132 @@
+"""CPU-bound image work, run in a process pool so it never blocks the event loop.
+
+Everything submitted to the pool must be a top-level function that takes and
+returns plain bytes/dicts so it can be pickled across the process boundary.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Optional
+
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# name -> (longest side in px, JPEG quality), largest first so each rendition
+# is resampled from the previous one instead of from the original
+RENDITIONS = (
+    ("full", 2048, 85),
+    ("medium", 1024, 80),
+    ("thumb", 320, 70),
+)
+RENDITION_NAMES = tuple(name for name, _, _ in RENDITIONS)
+
+# GPT-4o (high detail) fits an image into 2048x2048 and then scales its short
+# side down to 768px before tiling; pixels beyond that only cost upload time
+VISION_MAX_SIDE = 2048
+VISION_SHORT_SIDE = 768
+VISION_JPEG_QUALITY = 85
+
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '0')) or None  # None = one per CPU
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ImageDecodeError(ValueError):
+    pass
+
+
+def _open_oriented(data: bytes) -> Image.Image:
+    try:
+        img = Image.open(BytesIO(data))
+        img.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageDecodeError(f"Unreadable image: {e}")
+    # Phones store rotation in EXIF; bake it into the pixels before resizing
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def render_renditions(data: bytes) -> dict:
+    """Decode once and return {rendition name: JPEG bytes}"""
+    img = _open_oriented(data)
+    renditions = {}
+    for name, max_side, quality in RENDITIONS:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        renditions[name] = _encode_jpeg(img, quality)
+    return renditions
+
+
+def probe_image(data: bytes) -> None:
+    """Raise ImageDecodeError unless data is an image Pillow can open; far cheaper than rendering it"""
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise ImageDecodeError(f"Unreadable image: {e}")
+
+
+def normalize_for_vision(data: bytes) -> tuple[bytes, dict]:
+    """Orient and downscale to the resolution the vision model uses; returns (JPEG bytes, info)"""
+    try:
+        img = Image.open(BytesIO(data))
+        width, height = img.size
+        scale = min(1.0, VISION_MAX_SIDE / max(width, height), VISION_SHORT_SIDE / min(width, height))
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        # JPEGs can be decoded straight at 1/2, 1/4 or 1/8 scale, far cheaper than a full decode
+        img.draft("RGB", target)
+        img.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageDecodeError(f"Unreadable image: {e}")
+    orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+    if img.size != target:
+        img = img.resize(target, Image.LANCZOS)
+    # Rotate after resizing; exif_transpose keeps the EXIF orientation tag consistent
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    info = {"size_in": f"{width}x{height}", "size_out": f"{img.width}x{img.height}", "bytes_in": len(data)}
+    out = _encode_jpeg(img, VISION_JPEG_QUALITY)
+    if scale == 1.0 and orientation == 1 and len(out) >= len(data):
+        # Already small and upright; re-encoding would only make it bigger
+        out = data
+    info["bytes_out"] = len(out)
+    info["changed"] = out is not data
+    return out, info
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """The shared pool; server.py creates it at startup
+
+    Workers are spawned rather than forked: forking a process that already runs
+    motor's and the executors' threads can copy a held lock into the child and
+    deadlock it.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def run_in_image_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_pool(), func, *args)
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
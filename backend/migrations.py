@@ -0,0 +1,169 @@
+"""One-off data migrations.
+
+Usage (from the backend directory):
+    python migrations.py photos [--dry-run]
+    python migrations.py renditions [--dry-run]
+    python migrations.py report_versions [--dry-run]
+    python migrations.py customer_reports [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from photo_store import (PHOTO_FIELDS, InvalidPhoto, PhotoNotFound, build_renditions, create_photo_store, ingest_photos,
+                         is_photo_hash, prepare_report_photos)
+from report_revisions import next_revision
+from report_versions import from_embedded, save_versions
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger("migrations")
+
+
+async def migrate_photos(db, dry_run: bool = False):
+    """Move inline base64 photos out of report documents into the photo store
+
+    A field is only rewritten once every photo in it is stored. If any of them
+    can't be decoded, the field keeps its legacy values untouched (nothing is
+    ever dropped) and the report is listed at the end for manual review.
+    """
+    store = create_photo_store(db)
+    # Only reports that still hold at least one non-reference photo
+    query = {"$or": [{field: {"$elemMatch": {"$regex": "^(?![0-9a-f]{64}$)"}}} for field in PHOTO_FIELDS]}
+    migrated = 0
+    photos_moved = 0
+    skipped = []
+    async for report in db.reports.find(query, {"_id": 1, "id": 1, **{field: 1 for field in PHOTO_FIELDS}}):
+        updates = {}
+        for field in PHOTO_FIELDS:
+            photos = report.get(field) or []
+            if all(is_photo_hash(photo) for photo in photos):
+                continue
+            refs = {field: list(photos)}
+            try:
+                pending = await prepare_report_photos(store, refs)
+                if not dry_run:
+                    await ingest_photos(store, pending)
+            except InvalidPhoto as e:
+                logger.warning(f"Leaving {field} of report {report.get('id')} unmigrated: {e}")
+                skipped.append(f"{report.get('id')} ({field})")
+                continue
+            updates[field] = refs[field]
+            photos_moved += len(pending)
+        if not updates:
+            continue
+        if not dry_run:
+            # Photo URLs in the API response change, so give clients a new ETag
+            await db.reports.update_one({"_id": report["_id"]}, {"$set": {**updates, "revision": await next_revision(db)}})
+        migrated += 1
+    logger.info(f"{'Would migrate' if dry_run else 'Migrated'} {photos_moved} photos across {migrated} reports")
+    if skipped:
+        logger.warning(f"{len(skipped)} photo fields hold photos that couldn't be decoded and were left as they are: "
+                       f"{', '.join(skipped)}")
+
+
+async def migrate_renditions(db, dry_run: bool = False):
+    """Pre-render renditions for stored photos that don't have them yet
+
+    Otherwise they are rendered on the first GET /api/photos/{hash}/{rendition}.
+    """
+    store = create_photo_store(db)
+    seen = set()
+    rendered = 0
+    async for report in db.reports.find({}, {"_id": 0, **{field: 1 for field in PHOTO_FIELDS}}):
+        for field in PHOTO_FIELDS:
+            for photo in report.get(field) or []:
+                if not is_photo_hash(photo) or photo in seen:
+                    continue
+                seen.add(photo)
+                try:
+                    if await store.get_renditions(photo):
+                        continue
+                    if not dry_run:
+                        await build_renditions(store, photo)
+                except (PhotoNotFound, InvalidPhoto) as e:
+                    logger.warning(f"Skipping photo {photo}: {e!r}")
+                    continue
+                rendered += 1
+    logger.info(f"{'Would render' if dry_run else 'Rendered'} renditions for {rendered} of {len(seen)} photos")
+
+
+async def migrate_report_versions(db, dry_run: bool = False):
+    """Move embedded `versions` arrays out of reports into report_versions as deltas"""
+    migrated = 0
+    async for report in db.reports.find({"versions.0": {"$exists": True}}, {"_id": 1, "id": 1, "versions": 1}):
+        docs = from_embedded(report["id"], report["versions"])
+        if not dry_run:
+            # Upserts, so a run interrupted between these two writes can simply be repeated
+            await save_versions(db, docs)
+            await db.reports.update_one(
+                {"_id": report["_id"]},
+                {"$unset": {"versions": ""}, "$set": {"revision": await next_revision(db)}}
+            )
+        migrated += 1
+    logger.info(f"{'Would migrate' if dry_run else 'Migrated'} version history of {migrated} reports")
+
+
+async def migrate_customer_reports(db, dry_run: bool = False):
+    """Move customers' `report_ids` arrays into the customer_reports link collection"""
+    migrated = 0
+    links = 0
+    async for customer in db.customers.find({"report_ids.0": {"$exists": True}}, {"_id": 1, "id": 1, "report_ids": 1}):
+        added_at = datetime.now(timezone.utc).isoformat()
+        reports = await db.reports.find(
+            {"id": {"$in": customer["report_ids"]}}, {"_id": 0, "id": 1, "created_at": 1}
+        ).to_list(None)
+        # Ids of deleted reports are dropped; listing never showed them anyway
+        requests = [
+            UpdateOne(
+                {"customer_id": customer["id"], "report_id": report["id"]},
+                {"$setOnInsert": {"created_at": report["created_at"], "added_at": added_at}},
+                upsert=True,
+            )
+            for report in reports
+        ]
+        if not dry_run:
+            # Upserts, so a run interrupted between these two writes can simply be repeated
+            if requests:
+                await db.customer_reports.bulk_write(requests, ordered=False)
+            await db.customers.update_one({"_id": customer["_id"]}, {"$unset": {"report_ids": ""}})
+        migrated += 1
+        links += len(requests)
+    logger.info(f"{'Would migrate' if dry_run else 'Migrated'} {links} report links of {migrated} customers")
+
+
+MIGRATIONS = {
+    "photos": migrate_photos,
+    "renditions": migrate_renditions,
+    "report_versions": migrate_report_versions,
+    "customer_reports": migrate_customer_reports,
+}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run a data migration")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await MIGRATIONS[args.migration](client[os.environ['DB_NAME']], dry_run=args.dry_run)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
@@ -0,0 +1,485 @@
+"""Vision OCR for data plates and warranty screenshots.
+
+Prompts, image preparation and response parsing live here so the endpoints in
+server.py stay thin; the provider call itself goes through vision_providers.
+Results are cached in Mongo by image content hash plus prompt version plus
+the request parameters that go into the prompt, so a rescan of the same photo
+(or a retry after a network blip) doesn't pay for another vision call.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from image_processing import ImageDecodeError, normalize_for_vision, run_in_image_pool
+from photo_store import InvalidPhoto, decode_photo_value
+from vision_providers import ResilientVision
+
+logger = logging.getLogger(__name__)
+
+# Bump when a prompt changes so cached results from the old prompt are ignored
+DATA_PLATE_PROMPT_VERSION = "1"
+WARRANTY_PROMPT_VERSION = "1"
+
+OCR_CACHE_TTL = timedelta(days=int(os.environ.get('OCR_CACHE_TTL_DAYS', '30')))
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '5000'))
+
+# Upstream vision calls allowed at once, across all technicians
+OCR_MAX_IN_FLIGHT = int(os.environ.get('OCR_MAX_IN_FLIGHT', '4'))
+# How long a request may wait for a slot before it's turned away with a 429
+OCR_QUEUE_TIMEOUT = float(os.environ.get('OCR_QUEUE_TIMEOUT_SECONDS', '20'))
+# Orient and downscale images before they go upstream (0 to send them as uploaded)
+VISION_NORMALIZE = os.environ.get('VISION_NORMALIZE', '1') != '0'
+
+DATA_PLATE_SYSTEM_MESSAGE = "You are an expert at reading HVAC equipment data plates and extracting information accurately."
+WARRANTY_SYSTEM_MESSAGE = "You are an expert at reading HVAC equipment warranty information from manufacturer websites and extracting detailed coverage information."
+
+
+class OcrResponseError(Exception):
+    """The model answered but not with the JSON we asked for"""
+    pass
+
+
+class QueueTimeout(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"OCR is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+# Seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, math.inf)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (per-bucket counts, not cumulative) for /api/metrics"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "buckets": {("+Inf" if math.isinf(bound) else str(bound)): n for bound, n in zip(self.buckets, self.counts)},
+        }
+
+
+class FairLimiter:
+    """Caps concurrent upstream calls and hands free slots out round-robin per key.
+
+    Each technician gets their own FIFO; when a slot frees up it goes to the
+    next technician in the rotation that has someone waiting, so one person
+    scanning a stack of plates can't starve everyone else.
+    """
+
+    def __init__(self, max_in_flight: int = OCR_MAX_IN_FLIGHT, queue_timeout: float = OCR_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self.queue_wait = Histogram()
+        self.upstream_latency = Histogram()
+        self.rejected = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _retry_after(self) -> int:
+        # Time for the queue ahead to drain at the observed upstream latency
+        per_call = self.upstream_latency.mean or 5.0
+        return max(1, math.ceil((self.waiting + 1) / self.max_in_flight * per_call))
+
+    def _remove(self, key: str, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[key]
+
+    async def acquire(self, key: str) -> None:
+        started = time.perf_counter()
+        if self.in_flight < self.max_in_flight and not self._queues:
+            self.in_flight += 1
+            self.queue_wait.observe(0.0)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us just as the client went away; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._remove(key, waiter)
+            raise
+        if not waiter.done():
+            waiter.cancel()
+            self._remove(key, waiter)
+            self.rejected += 1
+            raise QueueTimeout(self._retry_after())
+        self.queue_wait.observe(time.perf_counter() - started)
+
+    def release(self) -> None:
+        # Hand the slot straight to the next technician in the rotation
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def run(self, key: str, func, *args):
+        """await func(*args) once a slot is free, recording upstream latency"""
+        await self.acquire(key)
+        started = time.perf_counter()
+        try:
+            return await func(*args)
+        finally:
+            self.upstream_latency.observe(time.perf_counter() - started)
+            self.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "waiting_technicians": len(self._queues),
+            "rejected": self.rejected,
+            "queue_timeout_seconds": self.queue_timeout,
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "upstream_latency_seconds": self.upstream_latency.snapshot(),
+        }
+
+
+def data_plate_prompt(equipment_type: str) -> str:
+    return f"""Analyze this HVAC {equipment_type} data plate photo and extract the following information:
+
+1. Brand/Manufacturer name - Look for company logos or names like "LENNOX", "TRANE", "CARRIER", "GOODMAN", etc.
+2. Model Number - May be labeled as "MODEL", "MODEL NO.", "M/N", "MODEL #", or just appear as a product code
+3. Serial Number - May be labeled as "SERIAL", "SERIAL NO.", "S/N", "SERIAL #", or appear as a unique identifier
+4. RLA (Rated Load Amps) - May be labeled as "RLA", "RATED LOAD AMPS", "R.L.A.", or "AMPS"
+5. LRA (Locked Rotor Amps) - May be labeled as "LRA", "LOCKED ROTOR AMPS", "L.R.A.", or "STARTING AMPS"
+
+IMPORTANT NOTES:
+- Data plates may use abbreviations: "M/N" = Model Number, "S/N" = Serial Number
+- Model numbers often contain letters and numbers (e.g., "CBA25UH-048-230-02")
+- Serial numbers are typically numeric or alphanumeric codes (e.g., "1523C65202")
+- RLA is the normal operating amperage (e.g., "18.5" or "18.5A")
+- LRA is the starting/locked rotor amperage, usually higher (e.g., "95" or "95A")
+- Look carefully at all text on the data plate, even if it's in small print
+- The model number is often one of the most prominent codes on the plate
+- Electrical specifications (RLA/LRA) are often in a separate section on the data plate
+
+Please respond ONLY with a JSON object in this exact format (no additional text):
+{{
+    "brand": "manufacturer name",
+    "model_number": "model number",
+    "serial_number": "serial number",
+    "rla": "RLA value (just the number, e.g., 18.5)",
+    "lra": "LRA value (just the number, e.g., 95)"
+}}
+
+If you cannot read a field clearly, use "Not found" as the value.
+Read ALL text carefully and extract the exact values as they appear on the data plate."""
+
+
+def warranty_prompt(brand: str, serial_number: str) -> str:
+    return f"""Analyze this warranty lookup screenshot from {brand} for serial number {serial_number}.
+
+Extract the following warranty information:
+
+1. Equipment Age - Look for:
+   - Manufacture date (e.g., "Manufactured: 05/2015" or "Date of Manufacture: 2015")
+   - Age in years (e.g., "9 years old")
+   - Installation date if shown
+   - Any date reference that indicates when unit was made
+
+2. Warranty Status - Determine if warranty is:
+   - Active with specific years remaining (e.g., "Active (2 years remaining)")
+   - Expired
+   - Calculate remaining years if expiration date is shown
+
+3. Detailed Coverage Information including:
+   - Compressor warranty period and expiration
+   - Heat exchanger warranty period
+   - Parts coverage period and expiration
+   - Labor coverage period (if any) and expiration
+   - Extended warranty information
+   - Specific expiration dates
+   - Registration status
+   - Any special conditions or notes
+
+IMPORTANT:
+- If you see a manufacture date or year, calculate the age: Current year (2024) - Manufacture year = Age
+- If you see warranty expiration dates, calculate years remaining
+- Be specific about coverage periods (e.g., "10 years", "20 years")
+- Include actual dates when visible
+
+Please respond ONLY with a JSON object in this exact format (no additional text):
+{{
+    "age": "X years (Manufactured YYYY)" or "Manufactured: MM/YYYY" or "X years old",
+    "warranty_status": "Active (X years remaining on parts)" or "Expired" or specific status with years,
+    "warranty_details": "Detailed breakdown: Compressor: X-year warranty, expires YYYY. Heat Exchanger: X-year warranty. Parts: X-year coverage, expires YYYY. Labor: [included/not included]. Extended warranty: [yes/no/details]. Special conditions: [any notes]"
+}}
+
+If age or dates are not visible in the screenshot, use "Not shown" for age.
+Be thorough and extract ALL details visible."""
+
+
+def parse_model_json(response: str) -> dict:
+    """Pull the JSON object out of a model reply, tolerating markdown fences"""
+    # Clean the response - remove markdown code blocks if present
+    clean_response = response.strip()
+    if clean_response.startswith("```json"):
+        clean_response = clean_response[7:]
+    if clean_response.startswith("```"):
+        clean_response = clean_response[3:]
+    if clean_response.endswith("```"):
+        clean_response = clean_response[:-3]
+    clean_response = clean_response.strip()
+    try:
+        return json.loads(clean_response)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON Parse Error: {str(e)}, Response: {response}")
+    # Try to extract JSON using regex if direct parsing fails
+    json_match = re.search(r'\{[^}]+\}', response, re.DOTALL)
+    if not json_match:
+        logger.error(f"No JSON found in response: {response}")
+        raise OcrResponseError(f"No valid JSON in OCR response. The AI returned: {response[:200]}")
+    try:
+        return json.loads(json_match.group())
+    except json.JSONDecodeError:
+        logger.error(f"Regex extraction also failed. Full response: {response}")
+        raise OcrResponseError(f"Failed to parse OCR response. The AI returned: {response[:200]}")
+
+
+async def run_vision(vision: ResilientVision, session_prefix: str, system_message: str,
+                     prompt: str, image_base64: str) -> dict:
+    """One vision call: send the image and prompt, return the parsed JSON reply"""
+    response = await vision.complete(session_prefix, system_message, prompt, image_base64)
+    logger.info(f"{session_prefix} raw response: {response}")
+    return parse_model_json(response)
+
+
+class VisionImageStats:
+    """What normalization saves: bytes sent upstream, and end-to-end scan time with and without it"""
+
+    def __init__(self):
+        self.counts = {"normalized": 0, "unchanged": 0, "undecodable": 0, "skipped": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.normalize_seconds = Histogram()
+        # Flip VISION_NORMALIZE to fill the "raw" side and compare
+        self.end_to_end_seconds = {"normalized": Histogram(), "raw": Histogram()}
+
+    def snapshot(self) -> dict:
+        return {
+            **self.counts,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "normalize_seconds": self.normalize_seconds.snapshot(),
+            "end_to_end_seconds": {name: h.snapshot() for name, h in self.end_to_end_seconds.items()},
+        }
+
+
+vision_image_stats = VisionImageStats()
+
+
+async def prepare_vision_image(image_base64: str) -> str:
+    """Decode once in the image pool, orient, downscale to what the model uses and re-encode"""
+    if not VISION_NORMALIZE:
+        vision_image_stats.counts["skipped"] += 1
+        return image_base64
+    try:
+        data, _ = decode_photo_value(image_base64)
+    except InvalidPhoto:
+        vision_image_stats.counts["undecodable"] += 1
+        return image_base64
+    started = time.perf_counter()
+    try:
+        out, info = await run_in_image_pool(normalize_for_vision, data)
+    except ImageDecodeError as e:
+        # Let the model have a go at formats Pillow can't read (e.g. HEIC)
+        logger.warning(f"Vision image left as uploaded: {e}")
+        vision_image_stats.counts["undecodable"] += 1
+        return image_base64
+    elapsed = time.perf_counter() - started
+    vision_image_stats.normalize_seconds.observe(elapsed)
+    vision_image_stats.bytes_in += info["bytes_in"]
+    vision_image_stats.bytes_out += info["bytes_out"]
+    vision_image_stats.counts["normalized" if info["changed"] else "unchanged"] += 1
+    logger.info(
+        f"Vision image {info['size_in']} -> {info['size_out']}, "
+        f"{info['bytes_in']} -> {info['bytes_out']} bytes in {elapsed * 1000:.0f} ms"
+    )
+    if not info["changed"]:
+        return image_base64
+    return base64.b64encode(out).decode()
+
+
+async def scan_image(limiter: FairLimiter, vision: ResilientVision, owner_id: str, session_prefix: str,
+                     system_message: str, prompt: str, image_base64: str) -> dict:
+    """Normalize the image, then make the vision call once the limiter lets us"""
+    # Don't queue behind the limiter for a provider that's known to be down
+    vision.check()
+    started = time.perf_counter()
+    # Done before taking a limiter slot so CPU work never holds up an upstream call
+    vision_image = await prepare_vision_image(image_base64)
+    prepared = time.perf_counter()
+    result = await limiter.run(owner_id, run_vision, vision, session_prefix, system_message, prompt, vision_image)
+    finished = time.perf_counter()
+    vision_image_stats.end_to_end_seconds["normalized" if VISION_NORMALIZE else "raw"].observe(finished - started)
+    logger.info(
+        f"{session_prefix} scan took {finished - started:.2f} s "
+        f"(prepare {(prepared - started) * 1000:.0f} ms, sent {len(vision_image)} of {len(image_base64)} base64 chars)"
+    )
+    return result
+
+
+def image_digest(image_base64: str) -> str:
+    """SHA-256 of the decoded image, so the same photo hashes the same however it was encoded"""
+    try:
+        data, _ = decode_photo_value(image_base64)
+    except InvalidPhoto:
+        data = image_base64.encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(kind: str, prompt_version: str, image_base64: str, **params) -> str:
+    parts = [kind, prompt_version, image_digest(image_base64)]
+    parts += [f"{name}={str(value).strip().lower()}" for name, value in sorted(params.items())]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+@dataclass
+class _Flight:
+    """A model call in progress and how many requests are waiting on it"""
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class OcrCache:
+    """Mongo-backed cache of parsed OCR results.
+
+    Entries expire through a TTL index on expires_at; on top of that the
+    collection is trimmed back to max_entries, least recently used first.
+    """
+
+    def __init__(self, db, max_entries: int = OCR_CACHE_MAX_ENTRIES, ttl: timedelta = OCR_CACHE_TTL):
+        self.collection = db.ocr_cache
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "coalesced": 0}
+        self._in_flight: dict[str, _Flight] = {}
+
+    async def get(self, key: str) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        entry = await self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": now}},
+            {"$set": {"last_used_at": now}, "$inc": {"hits": 1}},
+            projection={"result": 1},
+        )
+        return entry["result"] if entry is not None else None
+
+    async def put(self, key: str, kind: str, result: dict) -> None:
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"_id": key},
+            {
+                "$set": {"kind": kind, "result": result, "last_used_at": now, "expires_at": now + self.ttl},
+                "$setOnInsert": {"created_at": now, "hits": 0},
+            },
+            upsert=True,
+        )
+        await self._evict()
+
+    async def _evict(self) -> None:
+        excess = await self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        stale = await self.collection.find({}, {"_id": 1}).sort("last_used_at", 1).limit(excess).to_list(excess)
+        result = await self.collection.delete_many({"_id": {"$in": [entry["_id"] for entry in stale]}})
+        self.stats["evictions"] += result.deleted_count
+
+    async def get_or_compute(self, key: str, kind: str, compute) -> dict:
+        """Cached result for key, or await compute() once and cache it.
+
+        Identical requests that arrive while the first is still waiting on the
+        model share its result instead of making their own call. The call runs
+        in a task of its own, so the request that started it can go away
+        without taking the others down with it; it's only cancelled once every
+        request waiting on it has. Failures aren't cached.
+        """
+        result = await self.get(key)
+        if result is not None:
+            self.stats["hits"] += 1
+            return result
+        flight = self._in_flight.get(key)
+        if flight is None:
+            self.stats["misses"] += 1
+            flight = self._in_flight[key] = _Flight(asyncio.ensure_future(self._compute(key, kind, compute)))
+        else:
+            self.stats["coalesced"] += 1
+        task = flight.task
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and flight.waiters == 1:
+                task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def _compute(self, key: str, kind: str, compute) -> dict:
+        try:
+            result = await compute()
+            await self.put(key, kind, result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    async def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "entries": await self.collection.estimated_document_count(),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,254 @@
+"""Background OCR jobs.
+
+POST /api/ocr/jobs stores the image in a store of its own (never the report
+photo store, so cleaning up after a job can't remove a report's photo) under a
+key derived from the job id: each job owns its copy and deletes it when it
+finishes, without having to check whether another job still needs it. It then
+records a queued job in the ocr_jobs collection and returns straight away.
+Jobs may also point at an existing report photo, which is only ever read. A
+small pool of worker tasks claims jobs (atomically, so several server
+processes can share the collection), runs the same cached, rate-limited scan
+as the synchronous endpoints and writes the result back. Clients poll the job
+or follow it over Server-Sent Events.
+
+Jobs outlive the process: on startup every queued job, and every running job
+whose lease ran out (its worker died mid-call), is picked up again.
+"""
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from pymongo import ReturnDocument
+
+from ocr import QueueTimeout
+from photo_store import PhotoNotFound, PhotoStore
+from vision_providers import CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+OCR_JOB_WORKERS = int(os.environ.get('OCR_JOB_WORKERS', '4'))
+OCR_JOB_TTL = timedelta(days=int(os.environ.get('OCR_JOB_TTL_DAYS', '7')))
+# A running job whose worker hasn't finished within the lease is assumed dead and retried
+JOB_LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+TERMINAL_STATUSES = ("complete", "failed")
+
+# How often watchers re-read the job (catches updates made by other processes)
+WATCH_POLL_SECONDS = 1.0
+WATCH_HEARTBEAT_SECONDS = 15.0
+
+# kind -> async (image_base64, params, owner_id) -> result dict
+JobHandler = Callable[[str, dict, str], Awaitable[dict]]
+
+
+class JobNotFound(Exception):
+    pass
+
+
+def job_image_key(job_id: str) -> str:
+    """Where a job's uploaded image is kept: hex like a photo hash, but unique to the job"""
+    return hashlib.sha256(f"ocr-job:{job_id}".encode()).hexdigest()
+
+
+class OcrJobs:
+    def __init__(self, db, store: PhotoStore, image_store: PhotoStore, handlers: dict[str, JobHandler],
+                 workers: int = OCR_JOB_WORKERS):
+        self.collection = db.ocr_jobs
+        # Report photos, read-only here
+        self.store = store
+        # Uploaded scan images; content-addressed too, but only OCR jobs reference them
+        self.image_store = image_store
+        self.handlers = handlers
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._changed: dict[str, asyncio.Event] = {}
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "result": job.get("result"),
+            "error": job.get("error"),
+            "attempts": job.get("attempts", 0),
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+
+    async def submit(self, owner_id: str, kind: str, params: dict,
+                     image: Optional[bytes] = None, photo_id: Optional[str] = None) -> dict:
+        """Queue a job for either raw image bytes or an already stored photo"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown OCR job kind: {kind}")
+        job_id = str(uuid.uuid4())
+        if image is not None:
+            photo_id = job_image_key(job_id)
+            # Stored before the job is recorded, so no worker can claim it ahead of its image
+            await self.image_store.put(image, key=photo_id)
+        elif photo_id is None or not await self.store.exists(photo_id):
+            raise ValueError("Photo not found")
+
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": job_id,
+            "owner_id": owner_id,
+            "kind": kind,
+            "params": params,
+            "image_id": photo_id,
+            "image_store": "ocr" if image is not None else "photos",
+            "status": "queued",
+            "attempts": 0,
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "expires_at": now + OCR_JOB_TTL,
+        }
+        await self.collection.insert_one(dict(job))
+        self._queue.put_nowait(job["id"])
+        return self._public(job)
+
+    async def get(self, job_id: str, owner_id: str) -> dict:
+        job = await self.collection.find_one({"id": job_id, "owner_id": owner_id}, {"_id": 0})
+        if not job:
+            raise JobNotFound(job_id)
+        return self._public(job)
+
+    async def watch(self, job_id: str, owner_id: str) -> AsyncIterator[Optional[dict]]:
+        """Yield the job every time it changes until it finishes; None means "still waiting" (heartbeat)"""
+        last = None
+        idle = 0.0
+        while True:
+            # Take the event before reading so an update in between isn't missed
+            changed = self._changed.setdefault(job_id, asyncio.Event())
+            job = await self.get(job_id, owner_id)
+            if job != last:
+                last = job
+                idle = 0.0
+                yield job
+            elif idle >= WATCH_HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield None
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=WATCH_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                idle += WATCH_POLL_SECONDS
+
+    def _notify(self, job_id: str) -> None:
+        changed = self._changed.pop(job_id, None)
+        if changed is not None:
+            changed.set()
+
+    async def _set(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+        await self.collection.update_one({"id": job_id}, {"$set": fields})
+        self._notify(job_id)
+
+    async def start(self) -> None:
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _recover(self) -> None:
+        now = datetime.now(timezone.utc)
+        pending = self.collection.find(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]},
+            {"id": 1},
+        ).sort("created_at", 1)
+        count = 0
+        async for job in pending:
+            self._queue.put_nowait(job["id"])
+            count += 1
+        if count:
+            logger.info(f"Resuming {count} OCR job(s) left over from a previous run")
+
+    async def _sweep(self) -> None:
+        # Requeue jobs whose worker died mid-call without the process restarting
+        while True:
+            await asyncio.sleep(JOB_LEASE.total_seconds() / 2)
+            try:
+                stale = self.collection.find(
+                    {"status": "running", "lease_expires_at": {"$lt": datetime.now(timezone.utc)}}, {"id": 1}
+                )
+                async for job in stale:
+                    logger.warning(f"OCR job {job['id']} lease expired, retrying")
+                    self._queue.put_nowait(job["id"])
+            except Exception as e:
+                logger.error(f"OCR job sweep failed: {str(e)}")
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The sweeper retries it once the lease runs out; keep the worker alive
+                logger.error(f"OCR job {job_id} crashed: {str(e)}")
+
+    async def _process(self, job_id: str) -> None:
+        now = datetime.now(timezone.utc)
+        job = await self.collection.find_one_and_update(
+            {"id": job_id, "$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": "running", "lease_expires_at": now + JOB_LEASE, "updated_at": now.isoformat()},
+                "$inc": {"attempts": 1},
+            },
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            # Finished, or another worker/process claimed it first
+            return
+        self._notify(job_id)
+
+        if job["attempts"] > MAX_ATTEMPTS:
+            await self._finish(job, status="failed", error="Gave up after repeated interruptions")
+            return
+
+        try:
+            data, _ = await self._image_store(job).read(job["image_id"])
+            result = await self.handlers[job["kind"]](base64.b64encode(data).decode(), job["params"], job["owner_id"])
+        except (QueueTimeout, CircuitOpen) as e:
+            # The limiter is saturated or the provider is down; that's back-pressure, not a failure
+            await self._set(job_id, status="queued", attempts=job["attempts"] - 1)
+            asyncio.get_running_loop().call_later(e.retry_after, self._queue.put_nowait, job_id)
+            return
+        except PhotoNotFound:
+            await self._finish(job, status="failed", error="Image is no longer available; submit the scan again")
+            return
+        except Exception as e:
+            logger.error(f"OCR job {job_id} failed: {str(e)}")
+            await self._finish(job, status="failed", error=str(e))
+            return
+        await self._finish(job, status="complete", result=result)
+
+    def _image_store(self, job: dict) -> PhotoStore:
+        # A scan of an existing report photo reads it from the photo store
+        return self.image_store if job["image_store"] == "ocr" else self.store
+
+    async def _finish(self, job: dict, **fields) -> None:
+        await self._set(job["id"], **fields)
+        # The uploaded image belongs to this job alone; report photos are never deleted from here
+        if job["image_store"] == "ocr":
+            await self.image_store.delete(job["image_id"])
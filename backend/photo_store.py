@@ -0,0 +1,484 @@
+"""Content-addressed storage for report photos.
+
+Photos are stored once, keyed by the SHA-256 of their bytes, and reports only
+keep the hex digest as a reference. Two backends share one interface: GridFS
+(the default, lives next to the reports in MongoDB) and a local filesystem
+store that is handy for development and single-box deployments.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from image_processing import RENDITION_NAMES, ImageDecodeError, probe_image, render_renditions, run_in_image_pool
+
+logger = logging.getLogger(__name__)
+
+# Every list-of-photos field on MaintenanceReport
+PHOTO_FIELDS = (
+    "evaporator_photos",
+    "condenser_photos",
+    "refrigerant_photos",
+    "capacitor_photos",
+    "temperature_photos",
+    "drainage_photos",
+    "indoor_air_quality_photos",
+    "general_photos",
+)
+
+PHOTO_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+# Photo URLs handed out by GET /api/photos/{hash}, optionally prefixed with the backend origin
+PHOTO_URL_RE = re.compile(r"(?:^|/)api/photos/(?P<hash>[0-9a-f]{64})$")
+PHOTO_URL_PREFIX = "/api/photos/"
+STREAM_CHUNK_SIZE = 256 * 1024
+# Renditions rendered on demand (photos stored before renditions existed) at once, across all photos
+ON_DEMAND_RENDERS = int(os.environ.get('PHOTO_ON_DEMAND_RENDERS', '2'))
+DATA_URL_RE = re.compile(r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+)?(?:;[^,]*)?;base64,", re.IGNORECASE)
+
+
+class PhotoNotFound(Exception):
+    pass
+
+
+@dataclass
+class PhotoInfo:
+    photo_hash: str
+    length: int
+    content_type: str
+
+
+class InvalidPhoto(ValueError):
+    pass
+
+
+def is_photo_hash(value) -> bool:
+    return isinstance(value, str) and PHOTO_HASH_RE.match(value) is not None
+
+
+def sniff_content_type(data: bytes) -> str:
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return "application/octet-stream"
+
+
+def decode_photo_value(value: str) -> tuple[bytes, str]:
+    """Decode a data URL (or bare base64 string) into raw bytes and a content type"""
+    content_type = None
+    payload = value
+    match = DATA_URL_RE.match(value)
+    if match:
+        content_type = match.group("content_type")
+        payload = value[match.end():]
+    try:
+        data = base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError):
+        raise InvalidPhoto("Photo is not valid base64 data")
+    if not data:
+        raise InvalidPhoto("Photo is empty")
+    return data, content_type or sniff_content_type(data)
+
+
+def photo_url(photo_hash: str, rendition: Optional[str] = None) -> str:
+    if rendition:
+        return f"{PHOTO_URL_PREFIX}{photo_hash}/{rendition}"
+    return f"{PHOTO_URL_PREFIX}{photo_hash}"
+
+
+def photo_ref_from_value(value: str) -> Optional[str]:
+    """Return the hash if the value already points at a stored photo (bare hash or photo URL)"""
+    if is_photo_hash(value):
+        return value
+    match = PHOTO_URL_RE.search(value)
+    return match.group("hash") if match else None
+
+
+class PhotoStore:
+    """Interface shared by the storage backends"""
+
+    async def put(self, data: bytes, content_type: Optional[str] = None, key: Optional[str] = None) -> str:
+        """Store data under its sha256, or under key (64 hex chars) when one is given"""
+        raise NotImplementedError
+
+    async def exists(self, photo_hash: str) -> bool:
+        raise NotImplementedError
+
+    async def read(self, photo_hash: str) -> tuple[bytes, str]:
+        raise NotImplementedError
+
+    async def stat(self, photo_hash: str) -> PhotoInfo:
+        raise NotImplementedError
+
+    def iter_range(self, photo_hash: str, start: int, end: int,
+                   chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yield bytes [start, end] (inclusive) of a stored photo in chunks"""
+        raise NotImplementedError
+
+    async def get_renditions(self, photo_hash: str) -> Optional[dict]:
+        """Return {rendition name: hash} recorded for an original, if any"""
+        raise NotImplementedError
+
+    async def set_renditions(self, photo_hash: str, renditions: dict) -> None:
+        raise NotImplementedError
+
+    async def delete(self, photo_hash: str) -> None:
+        raise NotImplementedError
+
+
+class GridFSPhotoStore(PhotoStore):
+    def __init__(self, db, bucket_name: str = "photos"):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+
+    async def put(self, data: bytes, content_type: Optional[str] = None, key: Optional[str] = None) -> str:
+        photo_hash = key or hashlib.sha256(data).hexdigest()
+        if await self.exists(photo_hash):
+            return photo_hash
+        await self.bucket.upload_from_stream(
+            photo_hash,
+            data,
+            metadata={"content_type": content_type or sniff_content_type(data)},
+        )
+        return photo_hash
+
+    async def exists(self, photo_hash: str) -> bool:
+        return await self.files.find_one({"filename": photo_hash}, {"_id": 1}) is not None
+
+    async def _file_doc(self, photo_hash: str) -> dict:
+        file_doc = await self.files.find_one({"filename": photo_hash}, sort=[("uploadDate", -1)])
+        if not file_doc:
+            raise PhotoNotFound(photo_hash)
+        return file_doc
+
+    async def read(self, photo_hash: str) -> tuple[bytes, str]:
+        file_doc = await self._file_doc(photo_hash)
+        stream = await self.bucket.open_download_stream(file_doc["_id"])
+        data = await stream.read()
+        return data, (file_doc.get("metadata") or {}).get("content_type") or sniff_content_type(data)
+
+    async def stat(self, photo_hash: str) -> PhotoInfo:
+        file_doc = await self._file_doc(photo_hash)
+        content_type = (file_doc.get("metadata") or {}).get("content_type") or "application/octet-stream"
+        return PhotoInfo(photo_hash, file_doc["length"], content_type)
+
+    async def iter_range(self, photo_hash, start, end, chunk_size=STREAM_CHUNK_SIZE):
+        file_doc = await self._file_doc(photo_hash)
+        stream = await self.bucket.open_download_stream(file_doc["_id"])
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await stream.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def get_renditions(self, photo_hash: str) -> Optional[dict]:
+        file_doc = await self.files.find_one({"filename": photo_hash}, {"metadata.renditions": 1})
+        if not file_doc:
+            raise PhotoNotFound(photo_hash)
+        return (file_doc.get("metadata") or {}).get("renditions")
+
+    async def set_renditions(self, photo_hash: str, renditions: dict) -> None:
+        # Kept in the original's GridFS metadata so it travels with the file
+        await self.files.update_many({"filename": photo_hash}, {"$set": {"metadata.renditions": renditions}})
+
+    async def delete(self, photo_hash: str) -> None:
+        async for file_doc in self.files.find({"filename": photo_hash}, {"_id": 1}):
+            await self.bucket.delete(file_doc["_id"])
+
+
+class LocalPhotoStore(PhotoStore):
+    """Filesystem stand-in: <root>/<first two hex chars>/<hash>"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, photo_hash: str) -> Path:
+        if not is_photo_hash(photo_hash):
+            raise PhotoNotFound(photo_hash)
+        return self.root / photo_hash[:2] / photo_hash
+
+    def _write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temp file per write, so concurrent writes of one hash never share it
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    async def put(self, data: bytes, content_type: Optional[str] = None, key: Optional[str] = None) -> str:
+        photo_hash = key or hashlib.sha256(data).hexdigest()
+        path = self._path(photo_hash)
+        if not path.exists():
+            await asyncio.to_thread(self._write, path, data)
+        return photo_hash
+
+    async def exists(self, photo_hash: str) -> bool:
+        try:
+            return self._path(photo_hash).exists()
+        except PhotoNotFound:
+            return False
+
+    async def read(self, photo_hash: str) -> tuple[bytes, str]:
+        path = self._path(photo_hash)
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            raise PhotoNotFound(photo_hash)
+        return data, sniff_content_type(data)
+
+    def _stat(self, path: Path) -> tuple[int, bytes]:
+        with open(path, "rb") as f:
+            return os.fstat(f.fileno()).st_size, f.read(16)
+
+    async def stat(self, photo_hash: str) -> PhotoInfo:
+        try:
+            length, head = await asyncio.to_thread(self._stat, self._path(photo_hash))
+        except FileNotFoundError:
+            raise PhotoNotFound(photo_hash)
+        return PhotoInfo(photo_hash, length, sniff_content_type(head))
+
+    @staticmethod
+    def _read_at(f, offset: int, size: int) -> bytes:
+        f.seek(offset)
+        return f.read(size)
+
+    async def iter_range(self, photo_hash, start, end, chunk_size=STREAM_CHUNK_SIZE):
+        try:
+            f = await asyncio.to_thread(open, self._path(photo_hash), "rb")
+        except FileNotFoundError:
+            raise PhotoNotFound(photo_hash)
+        try:
+            offset = start
+            while offset <= end:
+                chunk = await asyncio.to_thread(self._read_at, f, offset, min(chunk_size, end - offset + 1))
+                if not chunk:
+                    break
+                offset += len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    def _renditions_path(self, photo_hash: str) -> Path:
+        return self._path(photo_hash).with_name(f"{photo_hash}.renditions.json")
+
+    async def get_renditions(self, photo_hash: str) -> Optional[dict]:
+        if not await self.exists(photo_hash):
+            raise PhotoNotFound(photo_hash)
+        try:
+            return json.loads(await asyncio.to_thread(self._renditions_path(photo_hash).read_text))
+        except FileNotFoundError:
+            return None
+
+    async def set_renditions(self, photo_hash: str, renditions: dict) -> None:
+        await asyncio.to_thread(self._write, self._renditions_path(photo_hash), json.dumps(renditions).encode())
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    async def delete(self, photo_hash: str) -> None:
+        try:
+            paths = (self._path(photo_hash), self._renditions_path(photo_hash))
+        except PhotoNotFound:
+            return
+        for path in paths:
+            await asyncio.to_thread(self._unlink, path)
+
+
+def create_photo_store(db, bucket_name: str = "photos") -> PhotoStore:
+    """The configured backend; other buckets (e.g. OCR scratch images) are kept apart from report photos"""
+    backend = os.environ.get("PHOTO_STORE", "gridfs").lower()
+    if backend == "local":
+        root = Path(os.environ.get("PHOTO_STORE_PATH", str(Path(__file__).parent / "photo_data")))
+        if bucket_name != "photos":
+            root = root.with_name(f"{root.name}_{bucket_name}")
+        logger.info(f"Using local photo store at {root}")
+        return LocalPhotoStore(root)
+    if backend != "gridfs":
+        raise ValueError(f"Unknown PHOTO_STORE backend: {backend}")
+    return GridFSPhotoStore(db, bucket_name=bucket_name)
+
+
+async def _render(data: bytes) -> dict[str, bytes]:
+    try:
+        return await run_in_image_pool(render_renditions, data)
+    except ImageDecodeError as e:
+        raise InvalidPhoto(str(e))
+
+
+async def _store_renditions(store: PhotoStore, photo_hash: str, rendered: dict[str, bytes]) -> dict:
+    renditions = {name: await store.put(blob, "image/jpeg") for name, blob in rendered.items()}
+    await store.set_renditions(photo_hash, renditions)
+    return renditions
+
+
+async def build_renditions(store: PhotoStore, photo_hash: str, data: Optional[bytes] = None) -> dict:
+    """Render thumb/medium/full JPEGs for an original in the image pool and store them next to it"""
+    if data is None:
+        data, _ = await store.read(photo_hash)
+    return await _store_renditions(store, photo_hash, await _render(data))
+
+
+async def ingest_photo(store: PhotoStore, data: bytes, content_type: Optional[str] = None) -> str:
+    """Store an original and make sure its renditions exist; returns the original's hash
+
+    The renditions are rendered before anything is stored, which also proves
+    the bytes are an image, so a rejected photo leaves nothing behind. Nothing
+    is ever deleted here: the store is content-addressed and the same bytes
+    may already belong to another report.
+    """
+    photo_hash = hashlib.sha256(data).hexdigest()
+    if await store.exists(photo_hash) and await store.get_renditions(photo_hash):
+        return photo_hash
+    rendered = await _render(data)
+    await store.put(data, content_type)
+    await _store_renditions(store, photo_hash, rendered)
+    return photo_hash
+
+
+async def store_photo(store: PhotoStore, value: str) -> str:
+    """Turn one incoming photo value into a stored reference (its hash)"""
+    photo_hash = photo_ref_from_value(value)
+    if photo_hash:
+        if not await store.exists(photo_hash):
+            raise InvalidPhoto(f"Unknown photo reference: {photo_hash}")
+        return photo_hash
+    data, content_type = decode_photo_value(value)
+    return await ingest_photo(store, data, content_type)
+
+
+async def store_report_photos(store: PhotoStore, report_data: dict) -> dict:
+    """Replace inline photos in every *_photos field with stored references (in place)
+
+    Photos are ingested concurrently so their renditions render in parallel
+    across the image pool.
+    """
+    for field in PHOTO_FIELDS:
+        photos = report_data.get(field)
+        if photos:
+            report_data[field] = list(await asyncio.gather(*(store_photo(store, photo) for photo in photos)))
+    return report_data
+
+
+async def prepare_report_photos(store: PhotoStore, report_data: dict) -> list[tuple[bytes, str]]:
+    """Like store_report_photos, but nothing new is stored yet
+
+    Inline photos are decoded and checked, and the *_photos fields get their
+    hashes (in place). Returns the (bytes, content type) still to be ingested
+    with ingest_photos: callers do that once the write is known to be allowed
+    and before it is made, so a rejected request leaves nothing behind in the
+    store and a stored report never references a missing photo.
+    """
+    pending = {}
+    for field in PHOTO_FIELDS:
+        photos = report_data.get(field)
+        if not photos:
+            continue
+        refs = []
+        for value in photos:
+            photo_hash = photo_ref_from_value(value)
+            if photo_hash:
+                if not await store.exists(photo_hash):
+                    raise InvalidPhoto(f"Unknown photo reference: {photo_hash}")
+            else:
+                data, content_type = decode_photo_value(value)
+                photo_hash = hashlib.sha256(data).hexdigest()
+                pending[photo_hash] = (data, content_type)
+            refs.append(photo_hash)
+        report_data[field] = refs
+    try:
+        await asyncio.gather(*(run_in_image_pool(probe_image, data) for data, _ in pending.values()))
+    except ImageDecodeError as e:
+        raise InvalidPhoto(str(e))
+    return list(pending.values())
+
+
+async def ingest_photos(store: PhotoStore, photos: list[tuple[bytes, str]]) -> None:
+    """Store photos returned by prepare_report_photos; safe to repeat"""
+    await asyncio.gather(*(ingest_photo(store, data, content_type) for data, content_type in photos))
+
+
+_on_demand_slots: Optional[asyncio.Semaphore] = None
+# original hash -> render in progress, so concurrent requests for one photo render it once
+_on_demand_renders: dict[str, asyncio.Future] = {}
+
+
+async def _render_on_demand(store: PhotoStore, photo_hash: str) -> dict:
+    global _on_demand_slots
+    if _on_demand_slots is None:
+        _on_demand_slots = asyncio.Semaphore(ON_DEMAND_RENDERS)
+    async with _on_demand_slots:
+        # Another request may have finished it while this one waited for a slot
+        renditions = await store.get_renditions(photo_hash)
+        if renditions and all(name in renditions for name in RENDITION_NAMES):
+            return renditions
+        return await build_renditions(store, photo_hash)
+
+
+async def resolve_rendition(store: PhotoStore, photo_hash: str, rendition: str) -> str:
+    """Hash of one rendition of an original, rendering it on demand for photos stored before renditions existed
+
+    On-demand renders are coalesced per photo and limited to ON_DEMAND_RENDERS
+    at a time; `python migrations.py renditions` pre-renders them instead.
+    """
+    renditions = await store.get_renditions(photo_hash)
+    if not renditions or rendition not in renditions:
+        render = _on_demand_renders.get(photo_hash)
+        if render is None:
+            render = asyncio.ensure_future(_render_on_demand(store, photo_hash))
+            _on_demand_renders[photo_hash] = render
+            render.add_done_callback(lambda _: _on_demand_renders.pop(photo_hash, None))
+        # Shielded so one client disconnecting doesn't cancel the render others wait on
+        renditions = await asyncio.shield(render)
+    return renditions[rendition]
+
+
+def link_report_photos(report: dict) -> dict:
+    """Rewrite photo references as GET /api/photos/{hash} URLs for API responses (in place)
+
+    Also adds photo_renditions: {field: [{"thumb": url, "medium": url, "full": url}, ...]},
+    parallel to each photo list, so list views can load thumbnails instead of originals.
+    """
+    renditions = {}
+    for field in PHOTO_FIELDS:
+        photos = report.get(field)
+        if not photos:
+            continue
+        # Legacy reports that have not been migrated yet still carry data URLs
+        report[field] = [photo_url(photo) if is_photo_hash(photo) else photo for photo in photos]
+        renditions[field] = [
+            {name: photo_url(photo, name) for name in RENDITION_NAMES} if is_photo_hash(photo) else None
+            for photo in photos
+        ]
+    report["photo_renditions"] = renditions
+    return report
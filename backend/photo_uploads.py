@@ -0,0 +1,217 @@
+"""Resumable chunked photo uploads.
+
+A client initiates a session, PUTs the bytes in order (each PUT carries the
+offset it starts at, so after a dropped connection it asks for the session,
+reads `received` and carries on from there), then finalizes it. Each PUT
+streams its chunk to a file of its own; nothing is held in memory. Only once
+the chunk has claimed its range in the session is it spliced into the
+upload's staging file, so a PUT that loses a race never touches bytes
+another one already had acknowledged. On
+finalize the staged file goes through the normal photo ingest path and the
+session records the resulting photo id (the SHA-256 of the bytes), which can
+then be referenced from MaintenanceReportCreate.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from photo_store import PhotoStore, ingest_photo, photo_url, sniff_content_type
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path(os.environ.get('PHOTO_UPLOAD_DIR', str(Path(__file__).parent / "photo_uploads")))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('PHOTO_UPLOAD_CHUNK_SIZE', str(512 * 1024)))  # suggested to clients
+MAX_UPLOAD_BYTES = int(os.environ.get('PHOTO_UPLOAD_MAX_BYTES', str(25 * 1024 * 1024)))
+UPLOAD_TTL = timedelta(hours=int(os.environ.get('PHOTO_UPLOAD_TTL_HOURS', '24')))
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadConflict(Exception):
+    """Offset doesn't match what the server has, or the session is no longer open"""
+    pass
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def _append(path: Path, data: bytes) -> None:
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def _splice(path: Path, offset: int, chunk_path: Path) -> None:
+    """Copy a chunk file into the staging file at offset"""
+    with open(chunk_path, "rb") as src, open(path, "r+b") as dst:
+        dst.seek(offset)
+        while True:
+            block = src.read(1024 * 1024)
+            if not block:
+                break
+            dst.write(block)
+
+
+class PhotoUploads:
+    def __init__(self, db, store: PhotoStore, upload_dir: Path = UPLOAD_DIR):
+        self.collection = db.photo_uploads
+        self.store = store
+        self.upload_dir = Path(upload_dir)
+        # upload id -> lock held from claiming a range until its chunk is spliced in
+        self._splice_locks: dict[str, asyncio.Lock] = {}
+
+    def _staging_path(self, upload_id: str) -> Path:
+        return self.upload_dir / f"{upload_id}.part"
+
+    def _chunk_path(self, upload_id: str) -> Path:
+        return self.upload_dir / f"{upload_id}.{uuid.uuid4().hex}.chunk"
+
+    @staticmethod
+    def _public(session: dict) -> dict:
+        return {
+            "upload_id": session["id"],
+            "status": session["status"],
+            "size": session.get("size"),
+            "received": session["received"],
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+            "photo_id": session.get("photo_id"),
+            "url": photo_url(session["photo_id"]) if session.get("photo_id") else None,
+        }
+
+    async def initiate(self, owner_id: str, size: Optional[int] = None, content_type: Optional[str] = None) -> dict:
+        if size is not None and size > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge(f"Photo exceeds the {MAX_UPLOAD_BYTES} byte limit")
+        await self.purge_expired()
+        now = datetime.now(timezone.utc)
+        session = {
+            "id": str(uuid.uuid4()),
+            "owner_id": owner_id,
+            "status": "open",
+            "size": size,
+            "content_type": content_type,
+            "received": 0,
+            "created_at": now.isoformat(),
+            "expires_at": now + UPLOAD_TTL,
+        }
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self._staging_path(session["id"]).touch)
+        await self.collection.insert_one(dict(session))
+        return self._public(session)
+
+    async def _get(self, upload_id: str, owner_id: str) -> dict:
+        session = await self.collection.find_one({"id": upload_id, "owner_id": owner_id}, {"_id": 0})
+        if not session:
+            raise UploadNotFound(upload_id)
+        return session
+
+    async def status(self, upload_id: str, owner_id: str) -> dict:
+        return self._public(await self._get(upload_id, owner_id))
+
+    async def write_chunk(self, upload_id: str, owner_id: str, offset: int, body: AsyncIterator[bytes]) -> dict:
+        session = await self._get(upload_id, owner_id)
+        if session["status"] != "open":
+            raise UploadConflict("Upload is already finalized")
+        if offset != session["received"]:
+            raise UploadConflict(f"Expected offset {session['received']}")
+
+        limit = session.get("size") or MAX_UPLOAD_BYTES
+        chunk_path = self._chunk_path(upload_id)
+        position = offset
+        try:
+            async for piece in body:
+                if not piece:
+                    continue
+                if position + len(piece) > limit:
+                    raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+                await asyncio.to_thread(_append, chunk_path, piece)
+                position += len(piece)
+            if position > offset:
+                await self._commit_chunk(upload_id, offset, position, chunk_path)
+        finally:
+            await asyncio.to_thread(chunk_path.unlink, missing_ok=True)
+        session["received"] = position
+        return self._public(session)
+
+    async def _commit_chunk(self, upload_id: str, offset: int, position: int, chunk_path: Path) -> None:
+        lock = self._splice_locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            # Guard on the old offset so two racing PUTs for the same range can't both advance it
+            result = await self.collection.update_one(
+                {"id": upload_id, "status": "open", "received": offset},
+                {"$set": {"received": position}},
+            )
+            if result.matched_count == 0:
+                raise UploadConflict("Upload changed while this chunk was being written")
+            try:
+                await asyncio.to_thread(_splice, self._staging_path(upload_id), offset, chunk_path)
+            except BaseException:
+                # Give the range back so the client can resend it
+                await self.collection.update_one(
+                    {"id": upload_id, "status": "open", "received": position},
+                    {"$set": {"received": offset}},
+                )
+                raise
+
+    async def finalize(self, upload_id: str, owner_id: str) -> dict:
+        session = await self._get(upload_id, owner_id)
+        if session["status"] == "complete":
+            return self._public(session)
+        if session.get("size") is not None and session["received"] != session["size"]:
+            raise UploadConflict(f"Only {session['received']} of {session['size']} bytes received")
+        if session["received"] == 0:
+            raise UploadConflict("No data received")
+
+        path = self._staging_path(upload_id)
+        async with self._splice_locks.setdefault(upload_id, asyncio.Lock()):
+            data = await asyncio.to_thread(path.read_bytes)
+        if len(data) != session["received"]:
+            # A chunk claimed its range but its splice never finished (the worker died)
+            await self.collection.update_one(
+                {"id": upload_id, "status": "open", "received": session["received"]},
+                {"$set": {"received": min(len(data), session["received"])}},
+            )
+            raise UploadConflict("Staged bytes don't match the session; resume from `received`")
+        photo_id = await ingest_photo(self.store, data, session.get("content_type") or sniff_content_type(data))
+
+        await self.collection.update_one(
+            {"id": upload_id},
+            {"$set": {"status": "complete", "photo_id": photo_id}},
+        )
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+        self._splice_locks.pop(upload_id, None)
+        session.update(status="complete", photo_id=photo_id)
+        return self._public(session)
+
+    def _sweep_staging(self, cutoff: float) -> int:
+        """Delete staging and chunk files last written before cutoff (epoch seconds)"""
+        removed = 0
+        if not self.upload_dir.is_dir():
+            return removed
+        for path in self.upload_dir.iterdir():
+            if path.suffix not in (".part", ".chunk"):
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    async def purge_expired(self) -> None:
+        now = datetime.now(timezone.utc)
+        async for session in self.collection.find({"expires_at": {"$lt": now}}, {"id": 1}):
+            await asyncio.to_thread(self._staging_path(session["id"]).unlink, missing_ok=True)
+            self._splice_locks.pop(session["id"], None)
+        await self.collection.delete_many({"expires_at": {"$lt": now}})
+        # The expires_at TTL index also removes sessions on its own, leaving no document to find their
+        # files by. A file untouched for UPLOAD_TTL belongs to a session that has expired either way.
+        removed = await asyncio.to_thread(self._sweep_staging, (now - UPLOAD_TTL).timestamp())
+        if removed:
+            logger.info(f"Removed {removed} abandoned upload staging files")
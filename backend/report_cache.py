@@ -0,0 +1,93 @@
+"""In-process cache of serialized public report views.
+
+Shared report links get opened over and over (the customer, their family,
+the same tab reloaded), so GET /api/reports/view/{unique_link} keeps the
+encoded JSON body in an LRU bounded by REPORT_VIEW_CACHE_MB of payload.
+Anything that changes a report invalidates it by report id.
+
+The cache is per process. Entries also expire after
+REPORT_VIEW_CACHE_TTL_SECONDS so that, with several workers, an edit made
+through another process is picked up within that window.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+REPORT_VIEW_CACHE_MB = float(os.environ.get('REPORT_VIEW_CACHE_MB', '64'))
+REPORT_VIEW_CACHE_TTL = float(os.environ.get('REPORT_VIEW_CACHE_TTL_SECONDS', '60'))
+
+
+class CachedView(NamedTuple):
+    report_id: str
+    body: bytes
+    etag: str
+    stored_at: float
+
+
+class ReportViewCache:
+    def __init__(self, max_bytes: int = int(REPORT_VIEW_CACHE_MB * 1024 * 1024), ttl: float = REPORT_VIEW_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.size = 0
+        # unique_link -> entry, least recently used first
+        self._entries: OrderedDict[str, CachedView] = OrderedDict()
+        self._links: dict[str, str] = {}  # report_id -> unique_link
+        # Bumped by every invalidation; a body read from Mongo before one isn't stored
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "too_large": 0}
+
+    def get(self, unique_link: str) -> Optional[CachedView]:
+        entry = self._entries.get(unique_link)
+        if entry is not None and self.clock() - entry.stored_at >= self.ttl:
+            self._remove(unique_link)
+            entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(unique_link)
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, unique_link: str, report_id: str, body: bytes, etag: str, generation: int) -> None:
+        """Store a body read while self.generation was `generation`"""
+        if generation != self.generation:
+            # An edit landed between the read and now; the body may be stale
+            return
+        if len(body) > self.max_bytes:
+            self.stats["too_large"] += 1
+            return
+        self._remove(unique_link)
+        self._entries[unique_link] = CachedView(report_id, body, etag, self.clock())
+        self._links[report_id] = unique_link
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, report_id: str) -> None:
+        self.generation += 1
+        unique_link = self._links.get(report_id)
+        if unique_link is not None:
+            self._remove(unique_link)
+            self.stats["invalidations"] += 1
+
+    def _remove(self, unique_link: str) -> None:
+        entry = self._entries.pop(unique_link, None)
+        if entry is not None:
+            self.size -= len(entry.body)
+            self._links.pop(entry.report_id, None)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "size_mb": round(self.size / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "ttl_seconds": self.ttl,
+        }
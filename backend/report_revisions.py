@@ -0,0 +1,78 @@
+"""Report revisions and the ETags built from them.
+
+Every write to a report stamps it with a fresh revision from one shared
+counter (the counters collection), so a report's revision changes on every
+write. Revisions are reserved before the write commits, though, so writes
+can land out of revision order: the highest revision in a list says nothing
+about whether an older-numbered write has landed since. A list's ETag is
+therefore its length plus the sum of its revisions, which moves whenever any
+member is written, created or dropped, and still comes out of an index
+without reading the documents.
+
+When a list is a given sequence of reports (a page of a customer's history)
+rather than everything matching a query, ids_etag hashes each report's id
+and revision in order instead. A customer's whole history gets the same
+count + sum from history_etag, which joins the customer_reports links to the
+reports' revisions inside one aggregate.
+
+Reports written before revisions existed count as revision 0.
+"""
+import hashlib
+
+from pymongo import ReturnDocument
+
+COUNTER_ID = "report_revision"
+
+
+async def next_revision(db, count: int = 1) -> int:
+    """Reserve `count` revisions and return the highest; the block is (result - count, result]"""
+    counter = await db.counters.find_one_and_update(
+        {"_id": COUNTER_ID},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return counter["seq"]
+
+
+def report_etag(report: dict) -> str:
+    return f'"{report["id"]}.{report.get("revision", 0)}"'
+
+
+async def list_etag(db, query: dict) -> str:
+    """ETag for the set of reports matching query; covered by an index ending in revision"""
+    stats = await db.reports.aggregate([
+        {"$match": query},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "revision": {"$sum": "$revision"}}},
+    ]).to_list(1)
+    count, revision = (stats[0]["count"], stats[0]["revision"]) if stats else (0, 0)
+    return f'"{count}.{revision}"'
+
+
+async def ids_etag(db, report_ids: list[str]) -> str:
+    """ETag for an ordered list of reports; the revisions come off the id_revision index"""
+    revisions = {
+        report["id"]: report.get("revision", 0)
+        async for report in db.reports.find({"id": {"$in": report_ids}}, {"_id": 0, "id": 1, "revision": 1})
+    }
+    pairs = ",".join(f"{report_id}:{revisions.get(report_id, '-')}" for report_id in report_ids)
+    return f'"{hashlib.sha256(pairs.encode()).hexdigest()[:32]}"'
+
+
+async def history_etag(db, customer_id: str) -> str:
+    """ETag for a customer's whole report history; both sides of the join are index lookups"""
+    stats = await db.customer_reports.aggregate([
+        {"$match": {"customer_id": customer_id}},
+        {"$lookup": {
+            "from": "reports",
+            "let": {"report_id": "$report_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$report_id"]}}},
+                {"$project": {"_id": 0, "revision": 1}},
+            ],
+            "as": "report",
+        }},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "revision": {"$sum": {"$sum": "$report.revision"}}}},
+    ]).to_list(1)
+    count, revision = (stats[0]["count"], stats[0]["revision"]) if stats else (0, 0)
+    return f'"{count}.{revision}"'
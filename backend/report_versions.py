@@ -0,0 +1,192 @@
+"""Report edit history, stored as deltas in the report_versions collection.
+
+Version 1 holds the report's key fields as they were before the first edit;
+every later version holds only a JSON-patch-style list of operations against
+the version before it. A snapshot is rebuilt on demand by replaying patches
+onto the base, so reading a report never drags its history along and an edit
+appends one small document instead of rewriting an array.
+
+Only VERSION_FIELDS are tracked; photos and equipment details are shown from
+the current report.
+
+Reports written before this collection existed carry their history as an
+embedded `versions` array of full snapshots. Reads fall back to it until the
+report_versions migration (or the report's next edit) converts it, and an
+edit saves the converted history before the write that drops the array.
+"""
+from typing import Optional
+
+from pymongo import UpdateOne
+
+# Key metrics and statuses shown when comparing versions. Photos are left out
+# so history stays small.
+VERSION_FIELDS = [
+    "customer_name", "customer_email", "customer_phone",
+    "refrigerant_type", "superheat", "subcooling", "refrigerant_status",
+    "blower_motor_capacitor_health", "blower_motor_capacitor_tolerance",
+    "condenser_capacitor_health", "condenser_capacitor_tolerance",
+    "delta_t", "delta_t_status", "overflow_float_switch",
+    "primary_drain", "drain_pan_condition", "air_filters",
+    "evaporator_coil", "condenser_coils", "air_purifier", "plenums", "ductwork",
+    "performance_score", "warnings",
+]
+
+ORIGINAL_LABEL = "Before Repair"
+
+
+class VersionNotFound(Exception):
+    pass
+
+
+def version_data(report: dict) -> dict:
+    return {field: report[field] for field in VERSION_FIELDS if field in report}
+
+
+def edit_label(version: int) -> str:
+    return ORIGINAL_LABEL if version == 1 else f"After Repair {version - 1}"
+
+
+def diff_fields(before: dict, after: dict) -> list[dict]:
+    """Top-level patch operations turning before into after"""
+    ops = []
+    for field in before:
+        if field not in after:
+            ops.append({"op": "remove", "path": f"/{field}"})
+        elif before[field] != after[field]:
+            ops.append({"op": "replace", "path": f"/{field}", "value": after[field]})
+    for field in after:
+        if field not in before:
+            ops.append({"op": "add", "path": f"/{field}", "value": after[field]})
+    return ops
+
+
+def apply_patch(data: dict, ops: list[dict]) -> dict:
+    result = dict(data)
+    for op in ops:
+        field = op["path"][1:]
+        if op["op"] == "remove":
+            result.pop(field, None)
+        else:
+            result[field] = op["value"]
+    return result
+
+
+def base_version(report_id: str, data: dict, timestamp: str) -> dict:
+    return {"report_id": report_id, "version": 1, "label": ORIGINAL_LABEL, "timestamp": timestamp, "base": data}
+
+
+def delta_version(report_id: str, version: int, before: dict, after: dict, timestamp: str,
+                  label: Optional[str] = None) -> dict:
+    return {
+        "report_id": report_id,
+        "version": version,
+        "label": label or edit_label(version),
+        "timestamp": timestamp,
+        "patch": diff_fields(before, after),
+    }
+
+
+def from_embedded(report_id: str, versions: list[dict]) -> list[dict]:
+    """Convert the old embedded `versions` array (full snapshots) into version documents"""
+    docs = []
+    previous = None
+    for entry in sorted(versions, key=lambda v: v["version"]):
+        data = entry.get("data") or {}
+        if previous is None:
+            docs.append(base_version(report_id, data, entry.get("timestamp")))
+            docs[-1]["label"] = entry.get("label") or ORIGINAL_LABEL
+        else:
+            docs.append(delta_version(report_id, entry["version"], previous, data,
+                                      entry.get("timestamp"), entry.get("label")))
+        previous = data
+    return docs
+
+
+async def save_versions(db, docs: list[dict]) -> None:
+    """Write version documents; rewriting one that already exists is a no-op"""
+    if docs:
+        await db.report_versions.bulk_write([
+            UpdateOne({"report_id": doc["report_id"], "version": doc["version"]}, {"$setOnInsert": doc}, upsert=True)
+            for doc in docs
+        ], ordered=False)
+
+
+async def save_embedded(db, report_id: str, versions: Optional[list] = None) -> None:
+    """Copy a report's embedded `versions` array into report_versions, leaving the array in place
+
+    Pass the array if it was already read; otherwise the report is checked.
+    Must succeed before any write that unsets the array.
+    """
+    if versions is None:
+        report = await db.reports.find_one({"id": report_id, "versions.0": {"$exists": True}}, {"_id": 0, "versions": 1})
+        versions = report["versions"] if report else None
+    if versions:
+        await save_versions(db, from_embedded(report_id, versions))
+
+
+async def record_edit(db, report_id: str, previous: dict, updated: dict, timestamp: str) -> int:
+    """Append the version an edit produced; previous is the report as it was before the edit
+
+    Returns the new version number. An embedded `versions` array on previous
+    must already have been saved with save_embedded.
+    """
+    previous_edits = previous.get("edit_count", 0)
+    new_version = previous_edits + 2  # +2 because version 1 is original
+    previous_data = version_data(previous)
+    if previous_edits == 0 and not previous.get("versions"):
+        # The first edit stores the original report as version 1
+        docs = [base_version(report_id, previous_data, previous.get("created_at"))]
+    else:
+        docs = []
+    docs.append(delta_version(report_id, new_version, previous_data, version_data(updated), timestamp))
+    await save_versions(db, docs)
+    return new_version
+
+
+async def _embedded_docs(db, report_id: str) -> list[dict]:
+    """Version documents for a report whose history is still embedded (not migrated yet)"""
+    report = await db.reports.find_one({"id": report_id, "versions.0": {"$exists": True}}, {"_id": 0, "versions": 1})
+    return from_embedded(report_id, report["versions"]) if report else []
+
+
+async def list_versions(db, report_id: str) -> list[dict]:
+    versions = await db.report_versions.find(
+        {"report_id": report_id},
+        {"_id": 0, "version": 1, "label": 1, "timestamp": 1}
+    ).sort("version", 1).to_list(None)
+    if not versions:
+        versions = [{k: doc[k] for k in ("version", "label", "timestamp")} for doc in await _embedded_docs(db, report_id)]
+    return versions
+
+
+async def load_snapshots(db, report_id: str, *versions: int) -> dict[int, dict]:
+    """Rebuild the requested versions with one read of the chain up to the newest of them"""
+    wanted = set(versions)
+    chain = await db.report_versions.find(
+        {"report_id": report_id, "version": {"$lte": max(wanted)}}, {"_id": 0}
+    ).sort("version", 1).to_list(None)
+    if not chain:
+        chain = [doc for doc in await _embedded_docs(db, report_id) if doc["version"] <= max(wanted)]
+    snapshots = {}
+    data = None
+    for doc in chain:
+        data = dict(doc["base"]) if doc["version"] == 1 else apply_patch(data or {}, doc["patch"])
+        if doc["version"] in wanted:
+            snapshots[doc["version"]] = {
+                "version": doc["version"],
+                "label": doc["label"],
+                "timestamp": doc["timestamp"],
+                "data": data,
+            }
+    missing = wanted - snapshots.keys()
+    if missing:
+        raise VersionNotFound(min(missing))
+    return snapshots
+
+
+def compare(before: dict, after: dict) -> list[dict]:
+    """Field-by-field before/after for the fields that differ"""
+    return [
+        {"field": op["path"][1:], "before": before.get(op["path"][1:]), "after": op.get("value")}
+        for op in diff_fields(before, after)
+    ]
@@ -0,0 +1,309 @@
+"""Bulk re-score historical reports after a threshold change.
+
+Streams reports in _id order with a projection of just the measurement
+fields, evaluates each chunk column-wise with NumPy/pandas using the same
+tables as diagnostics.py, and writes back only the rows whose derived fields
+changed with an unordered bulk_write. Progress is checkpointed by _id, so an
+interrupted run picks up where it stopped; a run that reaches the end clears
+the checkpoint, so the next one (after the next threshold change) starts over.
+
+Usage (from the backend directory):
+    python rescore_reports.py [--chunk-size 2000] [--restart] [--dry-run] [--verify]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from diagnostics import (
+    AIR_PURIFIER_PENALTIES,
+    CAPACITOR_BANDS,
+    CAPACITOR_PENALTIES,
+    DELTA_T_GOOD_RANGE,
+    DELTA_T_HIGH_PENALTIES,
+    DELTA_T_LOW_PENALTIES,
+    DELTA_T_WARNING_RANGE,
+    DRAIN_PAN_PENALTIES,
+    INPUT_DEFAULTS,
+    PRIMARY_DRAIN_PENALTIES,
+    REFRIGERANT_PENALTIES,
+    REQUIRED_INPUTS,
+    build_warnings,
+    evaluate_report,
+)
+from report_revisions import next_revision
+
+logger = logging.getLogger("rescore_reports")
+
+CHECKPOINT_ID = "rescore_reports"
+
+INPUT_FIELDS = [
+    "blower_motor_type",
+    "blower_motor_capacitor_rating",
+    "blower_motor_capacitor_reading",
+    "condenser_capacitor_herm_rating",
+    "condenser_capacitor_herm_reading",
+    "condenser_capacitor_fan_rating",
+    "condenser_capacitor_fan_reading",
+    "return_temp",
+    "supply_temp",
+    "refrigerant_status",
+    "primary_drain",
+    "drain_pan_condition",
+    "air_purifier",
+]
+OUTPUT_FIELDS = [
+    "delta_t",
+    "delta_t_status",
+    "blower_motor_capacitor_health",
+    "blower_motor_capacitor_tolerance",
+    "condenser_capacitor_health",
+    "condenser_capacitor_tolerance",
+    "warnings",
+    "performance_score",
+]
+NUMERIC_FIELDS = [field for field in INPUT_FIELDS if field.endswith(("_rating", "_reading", "_temp"))]
+
+_CAPACITOR_CUTS = np.array([limit for limit, _ in CAPACITOR_BANDS[:-1]], dtype=float)
+_CAPACITOR_STATUSES = np.array([status for _, status in CAPACITOR_BANDS], dtype=object)
+
+
+def _penalty_above(values: np.ndarray, table) -> np.ndarray:
+    cuts = np.array([cut for cut, _ in table], dtype=float)
+    points = np.array([0] + [p for _, p in table])
+    return points[np.searchsorted(cuts, values, side="left")]
+
+
+def _penalty_below(values: np.ndarray, table) -> np.ndarray:
+    cuts = np.array([cut for cut, _ in table], dtype=float)
+    points = np.array([p for _, p in table] + [0])
+    return points[np.searchsorted(cuts, values, side="right")]
+
+
+def _capacitor(rating: np.ndarray, reading: np.ndarray):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tolerance = np.abs(rating - reading) / rating * 100
+    band = np.searchsorted(_CAPACITOR_CUTS, tolerance, side="left")
+    return tolerance, band
+
+
+def score_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Column-wise equivalent of diagnostics.evaluate_report for a chunk of reports"""
+    delta_t = (df["return_temp"] - df["supply_temp"]).to_numpy(dtype=float)
+
+    is_psc = (df["blower_motor_type"] == "PSC Motor").to_numpy()
+    blower_rating = df["blower_motor_capacitor_rating"].fillna(0).to_numpy(dtype=float)
+    blower_reading = df["blower_motor_capacitor_reading"].fillna(0).to_numpy(dtype=float)
+    blower_checked = is_psc & (blower_rating != 0) & (blower_reading != 0)
+    blower_tolerance, blower_band = _capacitor(np.where(blower_checked, blower_rating, 1.0), blower_reading)
+    blower_tolerance = np.where(blower_checked, blower_tolerance, 0.0)
+    blower_status = np.where(blower_checked, _CAPACITOR_STATUSES[blower_band], "N/A")
+
+    herm_tolerance, herm_band = _capacitor(
+        df["condenser_capacitor_herm_rating"].to_numpy(dtype=float),
+        df["condenser_capacitor_herm_reading"].to_numpy(dtype=float),
+    )
+    fan_tolerance, fan_band = _capacitor(
+        df["condenser_capacitor_fan_rating"].to_numpy(dtype=float),
+        df["condenser_capacitor_fan_reading"].to_numpy(dtype=float),
+    )
+    # Bands are ordered by severity, so the worst status is the higher band
+    condenser_status = _CAPACITOR_STATUSES[np.maximum(herm_band, fan_band)]
+    condenser_tolerance = np.maximum(herm_tolerance, fan_tolerance)
+
+    good_low, good_high = DELTA_T_GOOD_RANGE
+    warn_low, warn_high = DELTA_T_WARNING_RANGE
+    delta_t_status = np.select(
+        [(delta_t >= good_low) & (delta_t <= good_high), (delta_t >= warn_low) & (delta_t < warn_high)],
+        ["Good", "Warning"],
+        default="Critical",
+    )
+
+    score = (
+        100
+        - _penalty_above(np.maximum(blower_tolerance, condenser_tolerance), CAPACITOR_PENALTIES)
+        - np.maximum(
+            _penalty_below(delta_t, DELTA_T_LOW_PENALTIES),
+            _penalty_above(delta_t, DELTA_T_HIGH_PENALTIES),
+        )
+        - df["refrigerant_status"].map(REFRIGERANT_PENALTIES).fillna(0).to_numpy()
+        - df["primary_drain"].map(PRIMARY_DRAIN_PENALTIES).fillna(0).to_numpy()
+        - df["drain_pan_condition"].map(DRAIN_PAN_PENALTIES).fillna(0).to_numpy()
+        - df["air_purifier"].map(AIR_PURIFIER_PENALTIES).fillna(0).to_numpy()
+    )
+    score = np.clip(score, 0, 100).astype(int)
+
+    refrigerant_status = df["refrigerant_status"].to_numpy()
+    warnings = [
+        build_warnings(
+            blower_status[i], blower_tolerance[i], blower_status[i] not in ("Good", "N/A"),
+            herm_tolerance[i], herm_band[i] > 0,
+            fan_tolerance[i], fan_band[i] > 0,
+            condenser_status[i], delta_t[i], delta_t_status[i], refrigerant_status[i],
+        )
+        for i in range(len(df))
+    ]
+
+    return pd.DataFrame({
+        "delta_t": delta_t,
+        "delta_t_status": delta_t_status,
+        "blower_motor_capacitor_health": np.where(is_psc, blower_status, None),
+        "blower_motor_capacitor_tolerance": np.where(is_psc, blower_tolerance, None),
+        "condenser_capacitor_health": condenser_status,
+        "condenser_capacitor_tolerance": condenser_tolerance,
+        "warnings": warnings,
+        "performance_score": score,
+    }, index=df.index)
+
+
+def _to_native(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _is_null(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _same(old, new) -> bool:
+    # pandas turns missing values into NaN, which never compares equal
+    if _is_null(old) or _is_null(new):
+        return _is_null(old) and _is_null(new)
+    return old == new
+
+
+def build_updates(docs: list, verify: bool = False) -> tuple[list, int]:
+    """Return ((_id, changed fields) for rows whose derived fields changed, rows skipped)"""
+    df = pd.DataFrame(docs, columns=["_id", *INPUT_FIELDS, *OUTPUT_FIELDS])
+    df[NUMERIC_FIELDS] = df[NUMERIC_FIELDS].apply(pd.to_numeric, errors="coerce")
+    # Missing checklist answers are scored like evaluate_report scores them
+    df[list(INPUT_DEFAULTS)] = df[list(INPUT_DEFAULTS)].fillna(INPUT_DEFAULTS)
+
+    valid = df[list(REQUIRED_INPUTS)].notna().all(axis=1) & \
+        (df["condenser_capacitor_herm_rating"] != 0) & (df["condenser_capacitor_fan_rating"] != 0)
+    skipped = int((~valid).sum())
+    df = df[valid]
+    if df.empty:
+        return [], skipped
+
+    scored = score_frame(df)
+    updates = []
+    new_rows = scored.to_dict("records")
+    old_rows = df[["_id", *OUTPUT_FIELDS]].to_dict("records")
+    for index, new_row, old_row in zip(scored.index, new_rows, old_rows):
+        new_values = {field: _to_native(new_row[field]) for field in OUTPUT_FIELDS}
+        if verify:
+            expected = evaluate_report(docs[index]).fields()
+            if expected != new_values:
+                raise AssertionError(f"Vectorized score drifted from diagnostics for report {docs[index]['_id']}: "
+                                     f"{new_values} != {expected}")
+        changed = {field: value for field, value in new_values.items() if not _same(old_row[field], value)}
+        if changed:
+            updates.append((old_row["_id"], changed))
+    return updates, skipped
+
+
+async def rescore(db, chunk_size: int = 2000, restart: bool = False, dry_run: bool = False, verify: bool = False):
+    checkpoints = db.job_checkpoints
+    checkpoint = None if restart else await checkpoints.find_one({"_id": CHECKPOINT_ID})
+    query = {}
+    if checkpoint and checkpoint.get("last_id") is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+        logger.info(f"Resuming after _id {checkpoint['last_id']}")
+
+    projection = {"revision": 1, **{field: 1 for field in INPUT_FIELDS + OUTPUT_FIELDS}}
+    cursor = db.reports.find(query, projection).sort("_id", 1).batch_size(chunk_size)
+
+    started = time.perf_counter()
+    totals = {"scanned": 0, "updated": 0, "skipped": 0, "conflicts": 0}
+
+    async def flush(docs):
+        chunk_started = time.perf_counter()
+        updates, skipped = build_updates(docs, verify=verify)
+        conflicts = 0
+        if updates and not dry_run:
+            # Each rewritten report gets its own revision so cached copies revalidate.
+            # The revision read doubles as an optimistic lock: a report edited since it
+            # was read isn't overwritten with scores from its old values (the edit
+            # scored it already, and the next run picks it up anyway)
+            read_revisions = {doc["_id"]: doc.get("revision") for doc in docs}
+            last_revision = await next_revision(db, len(updates))
+            first_revision = last_revision - len(updates) + 1
+            result = await db.reports.bulk_write([
+                UpdateOne({"_id": _id, "revision": read_revisions[_id]},
+                          {"$set": {**changed, "revision": first_revision + i}})
+                for i, (_id, changed) in enumerate(updates)
+            ], ordered=False)
+            conflicts = len(updates) - result.matched_count
+        if not dry_run:
+            await checkpoints.update_one(
+                {"_id": CHECKPOINT_ID},
+                {"$set": {"last_id": docs[-1]["_id"], "updated_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        totals["scanned"] += len(docs)
+        totals["updated"] += len(updates) - conflicts
+        totals["skipped"] += skipped
+        totals["conflicts"] += conflicts
+        elapsed = time.perf_counter() - chunk_started
+        logger.info(
+            f"Chunk of {len(docs)}: {len(updates) - conflicts} changed, {skipped} skipped, "
+            f"{conflicts} edited meanwhile, "
+            f"{len(docs) / elapsed:,.0f} reports/s (total {totals['scanned']:,})"
+        )
+
+    docs = []
+    async for doc in cursor:
+        docs.append(doc)
+        if len(docs) >= chunk_size:
+            await flush(docs)
+            docs = []
+    if docs:
+        await flush(docs)
+    if not dry_run:
+        # Finished: the next run rescores everything again
+        await checkpoints.delete_one({"_id": CHECKPOINT_ID})
+
+    elapsed = time.perf_counter() - started
+    rate = totals["scanned"] / elapsed if elapsed else 0
+    logger.info(
+        f"{'Dry run: ' if dry_run else ''}scanned {totals['scanned']:,}, updated {totals['updated']:,}, "
+        f"skipped {totals['skipped']:,}, left {totals['conflicts']:,} edited meanwhile "
+        f"in {elapsed:.1f}s ({rate:,.0f} reports/s)"
+    )
+    return totals
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-score reports with the current diagnostics thresholds")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint and start from the beginning")
+    parser.add_argument("--dry-run", action="store_true", help="Compute changes without writing them")
+    parser.add_argument("--verify", action="store_true", help="Cross-check every row against diagnostics.evaluate_report")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await rescore(client[os.environ['DB_NAME']], chunk_size=args.chunk_size,
+                      restart=args.restart, dry_run=args.dry_run, verify=args.verify)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
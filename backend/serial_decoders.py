@@ -0,0 +1,242 @@
+"""Manufacture date from an HVAC serial number, without asking the model.
+
+Brands are normalized (upper case, letters and digits only) and mapped to a
+decoder family through BRAND_FAMILIES; sister brands built on the same line
+share a family. Each family has one or more decoders, tried in order, each a
+regex compiled once at import plus a small function turning the match into
+(year, month). Add a format with register_decoder().
+
+Formats are the current (roughly 2000s onward) ones published in the
+manufacturers' serial number guides; older plates fall back to the generic
+heuristic and may need manual verification.
+"""
+import re
+from calendar import month_name
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from dateutil.relativedelta import relativedelta
+
+# Equipment is assumed to carry the standard 10-year parts warranty
+WARRANTY_YEARS = 10
+MAX_AGE_YEARS = 50
+
+# Normalized brand -> decoder family
+BRAND_FAMILIES = {
+    "LENNOX": "lennox",
+    "ARMSTRONG": "lennox",
+    "AIREASE": "lennox",
+    "DUCANE": "lennox",
+    "CONCORD": "lennox",
+    "CARRIER": "carrier",
+    "BRYANT": "carrier",
+    "PAYNE": "carrier",
+    "DAYNIGHT": "carrier",
+    "TRANE": "trane",
+    "AMERICANSTANDARD": "trane",
+    "RUNTRU": "trane",
+    "GOODMAN": "goodman",
+    "AMANA": "goodman",
+    "JANITROL": "goodman",
+    "DAIKIN": "goodman",
+    "RHEEM": "rheem",
+    "RUUD": "rheem",
+    "WEATHERKING": "rheem",
+    "YORK": "york",
+    "COLEMAN": "york",
+    "LUXAIRE": "york",
+    "FRASERJOHNSTON": "york",
+    "HEIL": "icp",
+    "TEMPSTAR": "icp",
+    "COMFORTMAKER": "icp",
+    "ARCOAIRE": "icp",
+    "KEEPRITE": "icp",
+    "ICP": "icp",
+}
+
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+_WORD_RE = re.compile(r"[A-Z0-9]+")
+
+# Month letters used by Lennox and York (no I)
+_MONTH_LETTERS = {letter: month for month, letter in enumerate("ABCDEFGHJKLM", start=1)}
+
+
+@dataclass(frozen=True)
+class SerialDecoder:
+    name: str
+    pattern: re.Pattern
+    parse: Callable[[re.Match], Optional[tuple[int, Optional[int]]]]
+
+
+@dataclass
+class SerialDecode:
+    brand_family: Optional[str]
+    decoder: Optional[str]
+    manufacture_year: Optional[int]
+    manufacture_month: Optional[int]
+    date_of_manufacture: Optional[str]
+    estimated_age: Optional[str]
+    warranty_status: str
+
+
+DECODERS: dict[str, list[SerialDecoder]] = {}
+
+
+def register_decoder(family: str, name: str, pattern: str, parse) -> None:
+    DECODERS.setdefault(family, []).append(SerialDecoder(name, re.compile(pattern), parse))
+
+
+def normalize_brand(brand: Optional[str]) -> str:
+    return _NON_ALNUM_RE.sub("", (brand or "").upper())
+
+
+def brand_family(brand: Optional[str]) -> Optional[str]:
+    normalized = normalize_brand(brand)
+    family = BRAND_FAMILIES.get(normalized)
+    if family is None:
+        # OCR often returns the full company name, e.g. "LENNOX INDUSTRIES INC". Only whole
+        # words count, so short names like ICP can't match inside a model string; runs of
+        # words are tried longest first so "AMERICAN STANDARD" is matched as one name.
+        words = _WORD_RE.findall((brand or "").upper())
+        for size in range(len(words), 0, -1):
+            for start in range(len(words) - size + 1):
+                family = BRAND_FAMILIES.get("".join(words[start:start + size]))
+                if family is not None:
+                    return family
+    return family
+
+
+def _year(two_digits: str) -> int:
+    # Two-digit years are this century unless that would be in the future
+    year = 2000 + int(two_digits)
+    return year if year <= date.today().year else year - 100
+
+
+def _month(value: int) -> Optional[int]:
+    return value if 1 <= value <= 12 else None
+
+
+def _week_month(year: int, week: int) -> Optional[int]:
+    if not 1 <= week <= 53:
+        return None
+    return min(12, (date(year, 1, 1) + relativedelta(weeks=week - 1)).month)
+
+
+def _year_month(year_group: int, month_group: int):
+    def parse(match):
+        month = _month(int(match.group(month_group)))
+        return (_year(match.group(year_group)), month) if month else None
+    return parse
+
+
+def _year_week(year_group: int, week_group: int):
+    def parse(match):
+        year = _year(match.group(year_group))
+        month = _week_month(year, int(match.group(week_group)))
+        return (year, month) if month else None
+    return parse
+
+
+def _lennox(match):
+    # Positions 3-4 year, position 5 month letter
+    return _year(match.group(1)), _MONTH_LETTERS.get(match.group(2))
+
+
+def _york(match):
+    # 2004 on: 2nd and 4th characters are the year digits, 3rd the month letter
+    return _year(match.group(1) + match.group(3)), _MONTH_LETTERS[match.group(2)]
+
+
+register_decoder("lennox", "lennox", r"^[0-9A-Z]{2}(\d{2})([A-Z])", _lennox)
+# WWYY + plant letter + sequence, e.g. 2310E12345 = week 23 of 2010
+register_decoder("carrier", "carrier_wwyy", r"^(\d{2})(\d{2})[A-Z]\d{5}$", _year_week(2, 1))
+# 2010 on: YYWW + day digit + sequence, e.g. 13153KB21F = week 15 of 2013
+register_decoder("trane", "trane_yyww", r"^(\d{2})(\d{2})\d[0-9A-Z]{5}$", _year_week(1, 2))
+# YYMM + sequence, e.g. 0901234567 = January 2009
+register_decoder("goodman", "goodman_yymm", r"^(\d{2})(\d{2})\d{6}$", _year_month(1, 2))
+# Plant letter + MMYY + sequence, e.g. W031512345 = March 2015
+register_decoder("rheem", "rheem_mmyy", r"^[A-Z](\d{2})(\d{2})\d{4,}$", _year_month(2, 1))
+register_decoder("york", "york_2004", r"^[A-Z](\d)([A-HJ-M])(\d)\d{6}$", _york)
+# Plant letter + YYWW + sequence, e.g. E091112345 = week 11 of 2009
+register_decoder("icp", "icp_yyww", r"^[A-Z](\d{2})(\d{2})\d{5}$", _year_week(1, 2))
+
+_GENERIC_LEADING_YEAR_RE = re.compile(r"^(\d{2})")
+_GENERIC_FULL_YEAR_RE = re.compile(r"(19\d{2}|20\d{2})")
+
+
+def _generic_year(serial: str) -> Optional[int]:
+    """Heuristics for brands without a decoder"""
+    # Pattern 1: First 2 digits are year
+    match = _GENERIC_LEADING_YEAR_RE.match(serial)
+    if match:
+        year_code = int(match.group(1))
+        if year_code <= 30:
+            return 2000 + year_code
+        elif year_code >= 80:
+            return 1900 + year_code
+    # Pattern 2: Full year format (19XX or 20XX)
+    match = _GENERIC_FULL_YEAR_RE.search(serial)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def _format_span(years: int, months: int, none_left: str) -> str:
+    if years > 0 and months > 0:
+        return f"{years} years {months} months"
+    elif years > 0:
+        return f"{years} years"
+    elif months > 0:
+        return f"{months} months"
+    return none_left
+
+
+def decode_serial(brand: Optional[str], serial_number: Optional[str], now: Optional[datetime] = None) -> SerialDecode:
+    """Manufacture date, age and warranty status for a serial number"""
+    family = brand_family(brand)
+    result = SerialDecode(family, None, None, None, None, None, "Unknown")
+    serial = _NON_ALNUM_RE.sub("", (serial_number or "").upper())
+    if not serial or serial == "NOTFOUND":
+        return result
+
+    decoded = None
+    for decoder in DECODERS.get(family, ()):
+        match = decoder.pattern.match(serial)
+        decoded = decoder.parse(match) if match else None
+        if decoded:
+            result.decoder = decoder.name
+            break
+    if decoded is None:
+        year = _generic_year(serial)
+        if year:
+            result.decoder = "generic"
+            decoded = (year, None)
+
+    result.warranty_status = "Unable to determine - Manual verification needed"
+    if decoded is None:
+        return result
+    year, month = decoded
+    result.manufacture_year, result.manufacture_month = year, month
+    if month:
+        result.date_of_manufacture = f"{month_name[month]} {year}"
+
+    # Default to January if no specific month available
+    manufacture_dt = datetime(year, month or 1, 1)
+    current_dt = now or datetime.now()
+    if manufacture_dt > current_dt:
+        return result
+    age = relativedelta(current_dt, manufacture_dt)
+    # Sanity check (equipment shouldn't be more than 50 years old)
+    if age.years > MAX_AGE_YEARS:
+        return result
+    result.estimated_age = _format_span(age.years, age.months, "Less than 1 month")
+
+    warranty_end_dt = manufacture_dt + relativedelta(years=WARRANTY_YEARS)
+    if warranty_end_dt < current_dt:
+        result.warranty_status = "Expired"
+    else:
+        remaining = relativedelta(warranty_end_dt, current_dt)
+        span = _format_span(remaining.years, remaining.months, "less than 1 month")
+        result.warranty_status = f"Active ({span} remaining)"
+    return result
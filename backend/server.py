@@ -1,22 +1,50 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError, create_model
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import hmac
 import bcrypt
 import jwt
 from passlib.context import CryptContext
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
 import base64
+import hashlib
 import re
 import json
+import orjson
+from photo_store import PHOTO_FIELDS, InvalidPhoto, PhotoNotFound, create_photo_store, decode_photo_value, is_photo_hash, store_report_photos, prepare_report_photos, ingest_photos, link_report_photos, resolve_rendition
+from image_processing import RENDITION_NAMES, get_image_pool, shutdown_image_pool
+from photo_uploads import PhotoUploads, UploadConflict, UploadNotFound, UploadTooLarge
+from db_indexes import ensure_indexes
+from migrations import migrate_customer_reports
+from diagnostics import DIAGNOSTIC_INPUTS, MissingInputs, evaluate_report
+from compression import CompressionMiddleware, Compressor
+from report_cache import ReportViewCache
+from report_revisions import history_etag, ids_etag, list_etag, next_revision, report_etag
+from report_versions import (
+    VERSION_FIELDS, VersionNotFound, compare, list_versions, load_snapshots, record_edit, save_embedded,
+)
+from serial_decoders import decode_serial
+from ocr import (
+    DATA_PLATE_PROMPT_VERSION, DATA_PLATE_SYSTEM_MESSAGE, WARRANTY_PROMPT_VERSION, WARRANTY_SYSTEM_MESSAGE,
+    FairLimiter, OcrCache, OcrResponseError, QueueTimeout, cache_key, data_plate_prompt, scan_image,
+    vision_image_stats, warranty_prompt,
+)
+from vision_providers import CircuitOpen, ResilientVision, VisionTimeout, create_vision_provider
+from ocr_jobs import JobNotFound, OcrJobs
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -26,22 +54,93 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Photo storage (GridFS by default, see photo_store.py)
+photo_store = create_photo_store(db)
+photo_uploads = PhotoUploads(db, photo_store)
+
+OCR_BATCH_MAX_ITEMS = int(os.environ.get('OCR_BATCH_MAX_ITEMS', '10'))
+
+# Parsed OCR results keyed by image hash + prompt version (see ocr.py)
+ocr_cache = OcrCache(db)
+# Caps upstream vision calls and queues technicians fairly behind them
+ocr_limiter = FairLimiter()
+# Vision model behind a deadline and circuit breaker (VISION_PROVIDER=fake to work offline)
+vision = ResilientVision(create_vision_provider())
+# Encoded public report views by unique_link (see report_cache.py)
+report_view_cache = ReportViewCache()
+# gzip/brotli settings, compressed-body cache and counters (see compression.py)
+compressor = Compressor()
+
 # Create the main app
 app = FastAPI()
-api_router = APIRouter(prefix="/api")
+# orjson for every /api response. Endpoints serving documents straight from Mongo
+# return ORJSONResponse themselves, which also skips FastAPI's jsonable_encoder pass
+api_router = APIRouter(prefix="/api", default_response_class=ORJSONResponse)
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes below BCRYPT_ROUNDS are flagged by verify_and_update and rehashed on login
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
 security = HTTPBearer()
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 
+# bcrypt takes ~250ms of CPU per call, so it runs in its own small pool instead
+# of on the event loop. Beyond PASSWORD_HASH_MAX_QUEUE waiting calls we shed
+# load with a 503 rather than let logins pile up behind each other.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '64'))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+# waiting: submitted but not started; running: on a pool thread. Updated from both sides, hence the lock
+password_stats = {"waiting": 0, "running": 0, "max_waiting": 0, "completed": 0, "failed": 0, "rejected": 0}
+password_stats_lock = threading.Lock()
+
+def _run_password_call(func, *args):
+    with password_stats_lock:
+        password_stats["waiting"] -= 1
+        password_stats["running"] += 1
+    try:
+        return func(*args)
+    finally:
+        with password_stats_lock:
+            password_stats["running"] -= 1
+
+async def run_password_task(func, *args):
+    with password_stats_lock:
+        if password_stats["waiting"] >= PASSWORD_HASH_MAX_QUEUE:
+            password_stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
+        password_stats["waiting"] += 1
+        password_stats["max_waiting"] = max(password_stats["max_waiting"], password_stats["waiting"])
+    future = password_executor.submit(_run_password_call, func, *args)
+    try:
+        result = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        if future.cancelled():
+            # Cancelled before a thread picked it up, so _run_password_call never ran
+            with password_stats_lock:
+                password_stats["waiting"] -= 1
+        raise
+    except Exception:
+        with password_stats_lock:
+            password_stats["failed"] += 1
+        raise
+    with password_stats_lock:
+        password_stats["completed"] += 1
+    return result
+
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await run_password_task(pwd_context.hash, password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses outdated parameters"""
+    return await run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)):
     to_encode = data.copy()
@@ -61,8 +160,88 @@ def decode_token(token: str):
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     payload = decode_token(token)
+    if payload.get("scope"):
+        # A narrow token (see create_stream_token) is no login
+        raise HTTPException(status_code=401, detail="Invalid token")
     return payload
 
+optional_security = HTTPBearer(auto_error=False)
+
+# GET /api/metrics exposes pool, cache and provider internals: it needs METRICS_TOKEN as a
+# bearer token, or, when no token is configured, a request from the machine itself. Behind a
+# proxy on the same host every request looks local, so set METRICS_TOKEN there.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+async def require_metrics_access(request: Request,
+                                 credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    if METRICS_TOKEN:
+        if not credentials or not hmac.compare_digest(credentials.credentials, METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Not authenticated")
+    elif not request.client or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Metrics are only served locally")
+
+# EventSource can't send headers, so an OCR job's event stream also takes a token in the
+# URL. URLs end up in logs and history, so that token is minted per job and expires in
+# minutes; the login token is never accepted there
+STREAM_TOKEN_TTL = timedelta(minutes=int(os.environ.get('STREAM_TOKEN_TTL_MINUTES', '2')))
+
+def create_stream_token(user: dict, job_id: str) -> str:
+    return create_access_token({"sub": user["sub"], "type": user.get("type"), "scope": "ocr-stream", "job_id": job_id},
+                               STREAM_TOKEN_TTL)
+
+async def get_stream_user(job_id: str, stream_token: Optional[str] = None,
+                          credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """Like get_current_user, but also accepts the job's ?stream_token="""
+    if credentials:
+        return await get_current_user(credentials)
+    if not stream_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    payload = decode_token(stream_token)
+    if payload.get("scope") != "ocr-stream" or payload.get("job_id") != job_id:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+async def store_photos(data) -> dict:
+    """Write every photo in the payload to the photo store and return {field: [hash, ...]}"""
+    try:
+        return await store_report_photos(photo_store, {field: getattr(data, field) or [] for field in PHOTO_FIELDS})
+    except InvalidPhoto as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def parse_range_header(range_header: str, length: int) -> Optional[tuple[int, int]]:
+    """Parse a single "bytes=start-end" range; returns None if it can't be satisfied"""
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", range_header)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else length - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, length - int(match.group(2)))
+        end = length - 1
+    end = min(end, length - 1)
+    if start > end:
+        return None
+    return start, end
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+# Report JSON may be stored but must be revalidated; the ETag makes that a cheap 304
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+# Enough of a report to build its ETag (and check its owner) without loading it
+REVISION_PROJECTION = {"_id": 0, "id": 1, "revision": 1, "technician_id": 1}
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
 # Models
 class TechnicianRegister(BaseModel):
     username: str
@@ -96,7 +275,6 @@ class Customer(BaseModel):
     name: str
     email: EmailStr
     password_hash: str
-    report_ids: List[str] = Field(default_factory=list)
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class MaintenanceReportCreate(BaseModel):
@@ -111,7 +289,7 @@ class MaintenanceReportCreate(BaseModel):
     evaporator_age: Optional[str] = ""
     evaporator_warranty_status: str
     evaporator_warranty_details: Optional[str] = ""
-    evaporator_photos: Optional[List[str]] = Field(default_factory=list)  # Base64 encoded images
+    evaporator_photos: Optional[List[str]] = Field(default_factory=list)  # Photo ids from /api/photos/uploads (base64 data URLs still accepted)
     # Condenser Details
     condenser_brand: str
     condenser_model_number: str
@@ -120,7 +298,7 @@ class MaintenanceReportCreate(BaseModel):
     condenser_age: Optional[str] = ""
     condenser_warranty_status: str
     condenser_warranty_details: Optional[str] = ""
-    condenser_photos: Optional[List[str]] = Field(default_factory=list)  # Base64 encoded images
+    condenser_photos: Optional[List[str]] = Field(default_factory=list)  # Photo ids from /api/photos/uploads (base64 data URLs still accepted)
     condenser_fan_motor: str = "Normal Operation"  # "Normal Operation", "Motor Vibration", "Blade Vibration", "Inoperative"
     rated_rla: Optional[float] = None  # Rated Load Amps
     rated_lra: Optional[float] = None  # Locked Rotor Amps
@@ -160,6 +338,13 @@ class MaintenanceReportCreate(BaseModel):
     notes: Optional[str] = None
     other_repair_recommendations: Optional[str] = None
 
+# PATCH body: any subset of the create fields, validated with the same types
+MaintenanceReportPatch = create_model(
+    "MaintenanceReportPatch",
+    __config__=ConfigDict(extra="forbid"),
+    **{name: (Optional[field.annotation], None) for name, field in MaintenanceReportCreate.model_fields.items()}
+)
+
 class MaintenanceReport(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -237,8 +422,13 @@ class MaintenanceReport(BaseModel):
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     # Versioning fields for edit history
     current_version: int = 1  # 1-4 (original + 3 edits)
+    # Bumped from a shared counter on every write; ETags are built from it (see report_revisions.py)
+    revision: int = 0
     edit_count: int = 0  # 0-3 edits allowed
-    versions: List[dict] = Field(default_factory=list)  # Stores all versions with timestamps
+
+class PhotoUploadInit(BaseModel):
+    size: Optional[int] = None  # total bytes, if known up front
+    content_type: Optional[str] = None
 
 class Part(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -249,117 +439,6 @@ class Part(BaseModel):
     price: float
     image_url: Optional[str] = None
 
-# Helper function to calculate system age from serial number
-def calculate_system_age(serial_number: str) -> Optional[int]:
-    # Simple logic: assume first 4 digits or letters indicate year
-    # This is a simplified version - real implementation would vary by manufacturer
-    try:
-        year_code = serial_number[:4]
-        if year_code.isdigit():
-            year = int(year_code)
-            if 1990 <= year <= datetime.now().year:
-                return datetime.now().year - year
-    except:
-        pass
-    return None
-
-# Tolerance checking functions
-def check_capacitor_tolerance(rating: float, reading: float) -> tuple[str, float, bool]:
-    tolerance = abs(rating - reading) / rating * 100
-    needs_replacement = False
-    
-    if tolerance <= 6:
-        status = "Good"
-    elif tolerance <= 10:
-        status = "Warning"
-        needs_replacement = True
-    else:
-        status = "Critical"
-        needs_replacement = True
-    
-    return status, tolerance, needs_replacement
-
-def check_delta_t(delta: float) -> str:
-    # Delta T thresholds:
-    # 15°F to 24°F = Normal (Good)
-    # 10°F to 14°F = Yellow warning (Warning)
-    # Below 10°F = Red warning (Critical)
-    if 15 <= delta <= 24:
-        return "Good"
-    elif 10 <= delta < 15:
-        return "Warning"
-    else:
-        return "Critical"
-
-def check_amp_draw(actual: float, rated: float) -> str:
-    tolerance = abs(actual - rated) / rated * 100
-    if tolerance <= 10:
-        return "Good"
-    elif tolerance <= 20:
-        return "Warning"
-    else:
-        return "Critical"
-
-def calculate_performance_score(data) -> int:
-    """Calculate overall system performance score (0-100)"""
-    score = 100
-    
-    # Capacitor health impact (max -40 points)
-    cap_tolerance = data.get('capacitor_tolerance', 0)
-    if cap_tolerance > 20:
-        score -= 40  # Critical - extremely low readings
-    elif cap_tolerance > 15:
-        score -= 30  # Very bad
-    elif cap_tolerance > 10:
-        score -= 20  # Bad - needs replacement
-    elif cap_tolerance > 6:
-        score -= 10  # Minor issue
-    
-    # Delta T impact (max -25 points)
-    delta_t = data.get('delta_t', 18)
-    if delta_t < 10 or delta_t > 28:
-        score -= 25  # Critical
-    elif delta_t < 12 or delta_t > 25:
-        score -= 15  # Warning
-    elif delta_t < 15 or delta_t > 22:
-        score -= 8   # Minor issue
-    
-    # Refrigerant status impact (max -20 points)
-    ref_status = data.get('refrigerant_status', 'Good')
-    if ref_status == 'Critical':
-        score -= 20
-    elif ref_status == 'Low':
-        score -= 10
-    
-    # Primary drain impact (max -15 points)
-    if data.get('primary_drain') == 'Clogged, needs immediate service':
-        score -= 15
-    
-    # Drain pan condition impact (max -15 points)
-    drain_pan = data.get('drain_pan_condition', 'Good shape')
-    if drain_pan == 'Rusted and should be replaced':
-        score -= 15
-    elif drain_pan == 'Poor condition':
-        score -= 10
-    elif drain_pan == 'Fair condition':
-        score -= 5
-    
-    # Air purifier impact (max -10 points)
-    air_purifier = data.get('air_purifier', 'Good')
-    if air_purifier == 'Air purifier needs replacement':
-        score -= 10
-    elif air_purifier == 'UV light needs replacement':
-        score -= 5
-    
-    # System age impact (max -10 points bonus for newer systems)
-    system_age = data.get('system_age', 0)
-    if system_age > 15:
-        score -= 10
-    elif system_age > 12:
-        score -= 5
-    
-    return max(0, min(100, score))
-
 # Routes
 @api_router.post("/auth/technician/register")
 async def register_technician(data: TechnicianRegister):
@@ -372,7 +451,7 @@ async def register_technician(data: TechnicianRegister):
     technician = Technician(
         username=data.username,
         email=data.email,
-        password_hash=hash_password(data.password)
+        password_hash=await hash_password(data.password)
     )
     
     await db.technicians.insert_one(technician.model_dump())
@@ -391,8 +470,15 @@ async def register_technician(data: TechnicianRegister):
 @api_router.post("/auth/technician/login")
 async def login_technician(data: TechnicianLogin):
     technician = await db.technicians.find_one({"email": data.email})
-    if not technician or not verify_password(data.password, technician["password_hash"]):
+    if not technician:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    valid, new_hash = await verify_password(data.password, technician["password_hash"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current bcrypt cost; upgrade it while we have the plaintext
+        await db.technicians.update_one({"id": technician["id"]}, {"$set": {"password_hash": new_hash}})
     
     token = create_access_token({"sub": technician["id"], "email": technician["email"], "type": "technician"})
     
@@ -414,7 +500,7 @@ async def register_customer(data: CustomerRegister):
     customer = Customer(
         name=data.name,
         email=data.email,
-        password_hash=hash_password(data.password)
+        password_hash=await hash_password(data.password)
     )
     
     await db.customers.insert_one(customer.model_dump())
@@ -433,8 +519,15 @@ async def register_customer(data: CustomerRegister):
 @api_router.post("/auth/customer/login")
 async def login_customer(data: CustomerLogin):
     customer = await db.customers.find_one({"email": data.email})
-    if not customer or not verify_password(data.password, customer["password_hash"]):
+    if not customer:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    valid, new_hash = await verify_password(data.password, customer["password_hash"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current bcrypt cost; upgrade it while we have the plaintext
+        await db.customers.update_one({"id": customer["id"]}, {"$set": {"password_hash": new_hash}})
     
     token = create_access_token({"sub": customer["id"], "email": customer["email"], "type": "customer"})
     
@@ -457,99 +550,16 @@ async def create_report(data: MaintenanceReportCreate, user: dict = Depends(get_
     if not technician:
         raise HTTPException(status_code=404, detail="Technician not found")
     
-    # Calculate derived values
-    delta_t = data.return_temp - data.supply_temp
+    # Capacitor, Delta T and refrigerant checks, warnings and score
+    diagnostics = evaluate_report(data)
     
-    # Check tolerances for capacitors
-    # Blower motor capacitor - only check if PSC Motor
-    if data.blower_motor_type == "PSC Motor" and data.blower_motor_capacitor_rating and data.blower_motor_capacitor_reading:
-        blower_capacitor_status, blower_capacitor_tolerance, blower_capacitor_needs_replacement = check_capacitor_tolerance(
-            data.blower_motor_capacitor_rating, data.blower_motor_capacitor_reading
-        )
-    else:
-        # ECM Motor - no capacitor needed
-        blower_capacitor_status = "N/A"
-        blower_capacitor_tolerance = 0.0
-        blower_capacitor_needs_replacement = False
-    
-    # Check both Herm and Fan capacitor readings
-    herm_capacitor_status, herm_capacitor_tolerance, herm_capacitor_needs_replacement = check_capacitor_tolerance(
-        data.condenser_capacitor_herm_rating, data.condenser_capacitor_herm_reading
-    )
-    fan_capacitor_status, fan_capacitor_tolerance, fan_capacitor_needs_replacement = check_capacitor_tolerance(
-        data.condenser_capacitor_fan_rating, data.condenser_capacitor_fan_reading
-    )
-    
-    # Use the worst status for overall condenser capacitor health
-    condenser_capacitor_needs_replacement = herm_capacitor_needs_replacement or fan_capacitor_needs_replacement
-    condenser_capacitor_tolerance = max(herm_capacitor_tolerance, fan_capacitor_tolerance)
-    
-    # Determine overall condenser capacitor status (worst of both)
-    status_priority = {"Critical": 3, "Warning": 2, "Good": 1}
-    if status_priority.get(herm_capacitor_status, 0) >= status_priority.get(fan_capacitor_status, 0):
-        condenser_capacitor_status = herm_capacitor_status
-    else:
-        condenser_capacitor_status = fan_capacitor_status
-    
-    delta_t_status = check_delta_t(delta_t)
-    
-    # Build warnings list
-    warnings = []
-    if blower_capacitor_needs_replacement:
-        warnings.append({
-            "type": "blower_capacitor",
-            "severity": blower_capacitor_status.lower(),
-            "message": f"Blower motor capacitor reading is {blower_capacitor_tolerance:.1f}% off from rated value",
-            "part_needed": "capacitor"
-        })
-    
-    if condenser_capacitor_needs_replacement:
-        # Build detailed message for condenser capacitor
-        cap_message_parts = []
-        if herm_capacitor_needs_replacement:
-            cap_message_parts.append(f"Herm terminal: {herm_capacitor_tolerance:.1f}% off")
-        if fan_capacitor_needs_replacement:
-            cap_message_parts.append(f"Fan terminal: {fan_capacitor_tolerance:.1f}% off")
-        
-        warnings.append({
-            "type": "condenser_capacitor",
-            "severity": condenser_capacitor_status.lower(),
-            "message": f"Condenser dual run capacitor - {', '.join(cap_message_parts)}",
-            "part_needed": "capacitor"
-        })
-    
-    if delta_t_status != "Good":
-        warnings.append({
-            "type": "delta_t",
-            "severity": delta_t_status.lower(),
-            "message": f"Delta T is {delta_t:.1f}°F (ideal range: 15-22°F)",
-            "part_needed": None
-        })
-    
-    if data.refrigerant_status != "Good":
-        warnings.append({
-            "type": "refrigerant",
-            "severity": "warning" if "Low" in data.refrigerant_status else "critical",
-            "message": f"Refrigerant status: {data.refrigerant_status}",
-            "part_needed": "refrigerant"
-        })
-    
-    # Calculate performance score (use worst capacitor tolerance)
-    worst_capacitor_tolerance = max(blower_capacitor_tolerance, condenser_capacitor_tolerance)
-    score_data = {
-        'capacitor_tolerance': worst_capacitor_tolerance,
-        'delta_t': delta_t,
-        'refrigerant_status': data.refrigerant_status,
-        'primary_drain': data.primary_drain,
-        'drain_pan_condition': data.drain_pan_condition,
-        'air_purifier': data.air_purifier,
-        'system_age': 0  # Age is now string format, will be handled separately
-    }
-    performance_score = calculate_performance_score(score_data)
+    # Move photos into the photo store; the report only keeps their hashes
+    photos = await store_photos(data)
     
     # Create report
     report = MaintenanceReport(
         technician_id=technician["id"],
+        revision=await next_revision(db),
         technician_name=technician["username"],
         customer_name=data.customer_name,
         customer_email=data.customer_email,
@@ -561,7 +571,7 @@ async def create_report(data: MaintenanceReportCreate, user: dict = Depends(get_
         evaporator_age=data.evaporator_age,
         evaporator_warranty_status=data.evaporator_warranty_status,
         evaporator_warranty_details=data.evaporator_warranty_details or "",
-        evaporator_photos=data.evaporator_photos or [],
+        evaporator_photos=photos["evaporator_photos"],
         condenser_brand=data.condenser_brand,
         condenser_model_number=data.condenser_model_number,
         condenser_serial_number=data.condenser_serial_number,
@@ -569,7 +579,7 @@ async def create_report(data: MaintenanceReportCreate, user: dict = Depends(get_
         condenser_age=data.condenser_age,
         condenser_warranty_status=data.condenser_warranty_status,
         condenser_warranty_details=data.condenser_warranty_details or "",
-        condenser_photos=data.condenser_photos or [],
+        condenser_photos=photos["condenser_photos"],
         condenser_fan_motor=data.condenser_fan_motor,
         rated_rla=data.rated_rla,
         rated_lra=data.rated_lra,
@@ -579,29 +589,29 @@ async def create_report(data: MaintenanceReportCreate, user: dict = Depends(get_
         superheat=data.superheat,
         subcooling=data.subcooling,
         refrigerant_status=data.refrigerant_status,
-        refrigerant_photos=data.refrigerant_photos or [],
+        refrigerant_photos=photos["refrigerant_photos"],
         blower_motor_type=data.blower_motor_type,
         blower_motor_capacitor_rating=data.blower_motor_capacitor_rating,
         blower_motor_capacitor_reading=data.blower_motor_capacitor_reading,
-        blower_motor_capacitor_health=blower_capacitor_status if data.blower_motor_type == "PSC Motor" else None,
-        blower_motor_capacitor_tolerance=blower_capacitor_tolerance if data.blower_motor_type == "PSC Motor" else None,
+        blower_motor_capacitor_health=diagnostics.blower_motor_capacitor_health,
+        blower_motor_capacitor_tolerance=diagnostics.blower_motor_capacitor_tolerance,
         condenser_capacitor_herm_rating=data.condenser_capacitor_herm_rating,
         condenser_capacitor_herm_reading=data.condenser_capacitor_herm_reading,
         condenser_capacitor_fan_rating=data.condenser_capacitor_fan_rating,
         condenser_capacitor_fan_reading=data.condenser_capacitor_fan_reading,
-        condenser_capacitor_health=condenser_capacitor_status,
-        condenser_capacitor_tolerance=condenser_capacitor_tolerance,
-        capacitor_photos=data.capacitor_photos or [],
+        condenser_capacitor_health=diagnostics.condenser_capacitor_health,
+        condenser_capacitor_tolerance=diagnostics.condenser_capacitor_tolerance,
+        capacitor_photos=photos["capacitor_photos"],
         return_temp=data.return_temp,
         supply_temp=data.supply_temp,
-        delta_t=delta_t,
-        delta_t_status=delta_t_status,
-        temperature_photos=data.temperature_photos or [],
+        delta_t=diagnostics.delta_t,
+        delta_t_status=diagnostics.delta_t_status,
+        temperature_photos=photos["temperature_photos"],
         overflow_float_switch=data.overflow_float_switch,
         primary_drain=data.primary_drain,
         primary_drain_notes=data.primary_drain_notes,
         drain_pan_condition=data.drain_pan_condition,
-        drainage_photos=data.drainage_photos or [],
+        drainage_photos=photos["drainage_photos"],
         air_filters=data.air_filters,
         filters_list=data.filters_list or [],
         evaporator_coil=data.evaporator_coil,
@@ -609,12 +619,12 @@ async def create_report(data: MaintenanceReportCreate, user: dict = Depends(get_
         air_purifier=data.air_purifier,
         plenums=data.plenums,
         ductwork=data.ductwork,
-        indoor_air_quality_photos=data.indoor_air_quality_photos or [],
-        general_photos=data.general_photos or [],
+        indoor_air_quality_photos=photos["indoor_air_quality_photos"],
+        general_photos=photos["general_photos"],
         notes=data.notes,
         other_repair_recommendations=data.other_repair_recommendations,
-        warnings=warnings,
-        performance_score=performance_score
+        warnings=diagnostics.warnings,
+        performance_score=diagnostics.performance_score
     )
     
     await db.reports.insert_one(report.model_dump())
@@ -625,111 +635,29 @@ async def create_report(data: MaintenanceReportCreate, user: dict = Depends(get_
         "message": "Report created successfully"
     }
 
-@api_router.put("/reports/{report_id}/edit")
-async def edit_report(report_id: str, data: MaintenanceReportCreate, user: dict = Depends(get_current_user)):
-    if user.get("type") != "technician":
-        raise HTTPException(status_code=403, detail="Only technicians can edit reports")
-    
-    # Get the existing report
-    existing_report = await db.reports.find_one({"id": report_id})
+async def raise_edit_rejected(report_id: str, user: dict):
+    """Work out why a guarded edit matched nothing; only runs on the failure path"""
+    existing_report = await db.reports.find_one({"id": report_id}, {"technician_id": 1})
     if not existing_report:
         raise HTTPException(status_code=404, detail="Report not found")
-    
-    # Verify the technician is the creator
     if existing_report["technician_id"] != user["sub"]:
         raise HTTPException(status_code=403, detail="Only the report creator can edit this report")
+    raise HTTPException(status_code=400, detail="Maximum edit limit (3) reached for this report")
+
+@api_router.put("/reports/{report_id}/edit")
+async def edit_report(report_id: str, data: MaintenanceReportCreate, user: dict = Depends(get_current_user)):
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can edit reports")
     
-    # Check edit limit
-    if existing_report.get("edit_count", 0) >= 3:
-        raise HTTPException(status_code=400, detail="Maximum edit limit (3) reached for this report")
-    
-    # Calculate derived values (same as create_report)
-    delta_t = data.return_temp - data.supply_temp
-    
-    # Check tolerances for capacitors
-    # For blower motor capacitor (PSC Motor only)
-    if data.blower_motor_type == "PSC Motor":
-        blower_capacitor_status, blower_capacitor_tolerance, blower_capacitor_needs_replacement = check_capacitor_tolerance(
-            data.blower_motor_capacitor_rating, data.blower_motor_capacitor_reading
-        )
-    else:
-        blower_capacitor_status = "N/A"
-        blower_capacitor_tolerance = 0.0
-        blower_capacitor_needs_replacement = False
-    
-    # Check both Herm and Fan capacitor readings
-    herm_capacitor_status, herm_capacitor_tolerance, herm_capacitor_needs_replacement = check_capacitor_tolerance(
-        data.condenser_capacitor_herm_rating, data.condenser_capacitor_herm_reading
-    )
-    fan_capacitor_status, fan_capacitor_tolerance, fan_capacitor_needs_replacement = check_capacitor_tolerance(
-        data.condenser_capacitor_fan_rating, data.condenser_capacitor_fan_reading
-    )
-    
-    # Use the worst status for overall condenser capacitor health
-    condenser_capacitor_needs_replacement = herm_capacitor_needs_replacement or fan_capacitor_needs_replacement
-    condenser_capacitor_tolerance = max(herm_capacitor_tolerance, fan_capacitor_tolerance)
+    # Capacitor, Delta T and refrigerant checks, warnings and score (same engine as create_report)
+    diagnostics = evaluate_report(data)
     
-    # Determine overall condenser capacitor status (worst of both)
-    status_priority = {"Critical": 3, "Warning": 2, "Good": 1}
-    if status_priority.get(herm_capacitor_status, 0) >= status_priority.get(fan_capacitor_status, 0):
-        condenser_capacitor_status = herm_capacitor_status
-    else:
-        condenser_capacitor_status = fan_capacitor_status
-    
-    delta_t_status = check_delta_t(delta_t)
-    
-    # Build warnings list
-    warnings = []
-    if blower_capacitor_needs_replacement:
-        warnings.append({
-            "type": "blower_capacitor",
-            "severity": blower_capacitor_status.lower(),
-            "message": f"Blower motor capacitor reading is {blower_capacitor_tolerance:.1f}% off from rated value",
-            "part_needed": "capacitor"
-        })
-    
-    if condenser_capacitor_needs_replacement:
-        cap_message_parts = []
-        if herm_capacitor_needs_replacement:
-            cap_message_parts.append(f"Herm terminal: {herm_capacitor_tolerance:.1f}% off")
-        if fan_capacitor_needs_replacement:
-            cap_message_parts.append(f"Fan terminal: {fan_capacitor_tolerance:.1f}% off")
-        
-        warnings.append({
-            "type": "condenser_capacitor",
-            "severity": condenser_capacitor_status.lower(),
-            "message": f"Condenser dual run capacitor - {', '.join(cap_message_parts)}",
-            "part_needed": "capacitor"
-        })
-    
-    if delta_t_status != "Good":
-        warnings.append({
-            "type": "delta_t",
-            "severity": delta_t_status.lower(),
-            "message": f"Delta T is {delta_t:.1f}°F (ideal range: 15-22°F)",
-            "part_needed": None
-        })
-    
-    if data.refrigerant_status != "Good":
-        warnings.append({
-            "type": "refrigerant",
-            "severity": "warning" if "Low" in data.refrigerant_status else "critical",
-            "message": f"Refrigerant status: {data.refrigerant_status}",
-            "part_needed": "refrigerant"
-        })
-    
-    # Calculate performance score
-    worst_capacitor_tolerance = max(blower_capacitor_tolerance, condenser_capacitor_tolerance)
-    score_data = {
-        'capacitor_tolerance': worst_capacitor_tolerance,
-        'delta_t': delta_t,
-        'refrigerant_status': data.refrigerant_status,
-        'primary_drain': data.primary_drain,
-        'drain_pan_condition': data.drain_pan_condition,
-        'air_purifier': data.air_purifier,
-        'system_age': 0
-    }
-    performance_score = calculate_performance_score(score_data)
+    # Inline photos are checked and hashed here; nothing is stored until the edit is known to be allowed
+    photos = {field: getattr(data, field) or [] for field in PHOTO_FIELDS}
+    try:
+        new_photos = await prepare_report_photos(photo_store, photos)
+    except InvalidPhoto as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Create updated report data
     updated_report_data = {
@@ -743,7 +671,7 @@ async def edit_report(report_id: str, data: MaintenanceReportCreate, user: dict
         "evaporator_age": data.evaporator_age,
         "evaporator_warranty_status": data.evaporator_warranty_status,
         "evaporator_warranty_details": data.evaporator_warranty_details or "",
-        "evaporator_photos": data.evaporator_photos or [],
+        "evaporator_photos": photos["evaporator_photos"],
         "condenser_brand": data.condenser_brand,
         "condenser_model_number": data.condenser_model_number,
         "condenser_serial_number": data.condenser_serial_number,
@@ -751,7 +679,7 @@ async def edit_report(report_id: str, data: MaintenanceReportCreate, user: dict
         "condenser_age": data.condenser_age,
         "condenser_warranty_status": data.condenser_warranty_status,
         "condenser_warranty_details": data.condenser_warranty_details or "",
-        "condenser_photos": data.condenser_photos or [],
+        "condenser_photos": photos["condenser_photos"],
         "condenser_fan_motor": data.condenser_fan_motor,
         "rated_rla": data.rated_rla,
         "rated_lra": data.rated_lra,
@@ -761,29 +689,29 @@ async def edit_report(report_id: str, data: MaintenanceReportCreate, user: dict
         "superheat": data.superheat,
         "subcooling": data.subcooling,
         "refrigerant_status": data.refrigerant_status,
-        "refrigerant_photos": data.refrigerant_photos or [],
+        "refrigerant_photos": photos["refrigerant_photos"],
         "blower_motor_type": data.blower_motor_type,
         "blower_motor_capacitor_rating": data.blower_motor_capacitor_rating,
         "blower_motor_capacitor_reading": data.blower_motor_capacitor_reading,
-        "blower_motor_capacitor_health": blower_capacitor_status if data.blower_motor_type == "PSC Motor" else None,
-        "blower_motor_capacitor_tolerance": blower_capacitor_tolerance if data.blower_motor_type == "PSC Motor" else None,
+        "blower_motor_capacitor_health": diagnostics.blower_motor_capacitor_health,
+        "blower_motor_capacitor_tolerance": diagnostics.blower_motor_capacitor_tolerance,
         "condenser_capacitor_herm_rating": data.condenser_capacitor_herm_rating,
         "condenser_capacitor_herm_reading": data.condenser_capacitor_herm_reading,
         "condenser_capacitor_fan_rating": data.condenser_capacitor_fan_rating,
         "condenser_capacitor_fan_reading": data.condenser_capacitor_fan_reading,
-        "condenser_capacitor_health": condenser_capacitor_status,
-        "condenser_capacitor_tolerance": condenser_capacitor_tolerance,
-        "capacitor_photos": data.capacitor_photos or [],
+        "condenser_capacitor_health": diagnostics.condenser_capacitor_health,
+        "condenser_capacitor_tolerance": diagnostics.condenser_capacitor_tolerance,
+        "capacitor_photos": photos["capacitor_photos"],
         "return_temp": data.return_temp,
         "supply_temp": data.supply_temp,
-        "delta_t": delta_t,
-        "delta_t_status": delta_t_status,
-        "temperature_photos": data.temperature_photos or [],
+        "delta_t": diagnostics.delta_t,
+        "delta_t_status": diagnostics.delta_t_status,
+        "temperature_photos": photos["temperature_photos"],
         "overflow_float_switch": data.overflow_float_switch,
         "primary_drain": data.primary_drain,
         "primary_drain_notes": data.primary_drain_notes,
         "drain_pan_condition": data.drain_pan_condition,
-        "drainage_photos": data.drainage_photos or [],
+        "drainage_photos": photos["drainage_photos"],
         "air_filters": data.air_filters,
         "filters_list": data.filters_list or [],
         "evaporator_coil": data.evaporator_coil,
@@ -791,111 +719,259 @@ async def edit_report(report_id: str, data: MaintenanceReportCreate, user: dict
         "air_purifier": data.air_purifier,
         "plenums": data.plenums,
         "ductwork": data.ductwork,
-        "indoor_air_quality_photos": data.indoor_air_quality_photos or [],
-        "general_photos": data.general_photos or [],
+        "indoor_air_quality_photos": photos["indoor_air_quality_photos"],
+        "general_photos": photos["general_photos"],
         "notes": data.notes,
         "other_repair_recommendations": data.other_repair_recommendations,
-        "warnings": warnings,
-        "performance_score": performance_score,
+        "warnings": diagnostics.warnings,
+        "performance_score": diagnostics.performance_score,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
     
-    # Store lightweight version data - only key metrics, no photos
-    # This prevents MongoDB document size limit issues (16MB)
-    # Only store essential fields for version comparison
-    essential_fields = ["customer_name", "customer_email", "customer_phone",
-                       "refrigerant_type", "superheat", "subcooling", "refrigerant_status",
-                       "blower_motor_capacitor_health", "blower_motor_capacitor_tolerance",
-                       "condenser_capacitor_health", "condenser_capacitor_tolerance",
-                       "delta_t", "delta_t_status", "overflow_float_switch",
-                       "primary_drain", "drain_pan_condition", "air_filters",
-                       "evaporator_coil", "condenser_coils", "air_purifier", "plenums", "ductwork",
-                       "performance_score", "warnings"]
-    
-    versions = existing_report.get("versions", [])
-    if len(versions) == 0:
-        # This is the first edit, so store the original report as version 1 (only essential fields)
-        original_version = {
-            "version": 1,
-            "label": "Before Repair",
-            "timestamp": existing_report.get("created_at"),
-            "data": {k: v for k, v in existing_report.items() if k in essential_fields}
-        }
-        versions.append(original_version)
-    
-    # Add new version (only essential fields)
-    new_version_number = existing_report.get("edit_count", 0) + 2  # +2 because version 1 is original
-    version_data = {k: v for k, v in updated_report_data.items() if k in essential_fields}
-    new_version = {
-        "version": new_version_number,
-        "label": f"After Repair {new_version_number - 1}",
-        "timestamp": updated_report_data["timestamp"],
-        "data": version_data
+    # One atomic round trip. The filter enforces ownership and the edit limit, so two
+    # concurrent edits can't both pass the check (the pipeline form needs MongoDB 4.2+).
+    # $literal keeps user text such as "$120 quote" from being read as a field path;
+    # photo fields are only replaced when the edit carries photos
+    update_fields = {k: v for k, v in updated_report_data.items() if not k.endswith('_photos') or v}
+    edit_count = {"$ifNull": ["$edit_count", 0]}
+    guard = {
+        "id": report_id,
+        "technician_id": user["sub"],
+        "$or": [{"edit_count": {"$lt": 3}}, {"edit_count": {"$exists": False}}]
     }
-    versions.append(new_version)
     
-    # Update the report
-    # Split updates to handle large photo arrays and avoid MongoDB document size limit
-    # First, update all non-photo fields
-    update_data_without_photos = {k: v for k, v in updated_report_data.items() 
-                                   if not k.endswith('_photos')}
+    if new_photos:
+        # New photos are stored before the write so the report never points at one that
+        # isn't there. Checking the guard first means only an edit that loses a race with
+        # another one can leave them unreferenced (the store is content-addressed, so
+        # nothing is deleted on that path)
+        if not await db.reports.find_one(guard, {"_id": 1}):
+            await raise_edit_rejected(report_id, user)
+        try:
+            await ingest_photos(photo_store, new_photos)
+        except InvalidPhoto as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    revision = await next_revision(db)
+    # The pre-edit document is needed for the version delta, so the write returns it and
+    # the updated document is rebuilt from it: the update is fully determined by the request
+    previous = await db.reports.find_one_and_update(
+        guard,
+        [{"$set": {
+            **{k: {"$literal": v} for k, v in update_fields.items()},
+            "current_version": {"$add": [edit_count, 2]},  # +2 because version 1 is original
+            "edit_count": {"$add": [edit_count, 1]},
+            "revision": revision
+        }}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous is None:
+        await raise_edit_rejected(report_id, user)
+    report_view_cache.invalidate(report_id)
+    
+    previous_edits = previous.get("edit_count", 0)
+    report = {**previous, **update_fields, "current_version": previous_edits + 2,
+              "edit_count": previous_edits + 1, "revision": revision}
+    if previous.get("versions"):
+        # Reports written before report_versions carry their history embedded. It is saved
+        # before the array is dropped, so a failure in between leaves it in place
+        await save_embedded(db, report_id, previous["versions"])
+        await db.reports.update_one({"id": report_id, "revision": revision}, {"$unset": {"versions": ""}})
+        report.pop("versions")
+    new_version = await record_edit(db, report_id, previous, report, updated_report_data["timestamp"])
     
-    update_result = await db.reports.update_one(
+    return {
+        "report_id": report_id,
+        "message": "Report updated successfully",
+        "current_version": new_version,
+        "edit_count": new_version - 1,
+        "report": link_report_photos(report)
+    }
+
+@api_router.patch("/reports/{report_id}")
+async def patch_report(report_id: str, data: MaintenanceReportPatch, user: dict = Depends(get_current_user)):
+    """Update only the fields sent; counts as an edit and records a version like PUT"""
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can edit reports")
+    
+    changes = data.model_dump(exclude_unset=True)
+    required = [k for k, v in changes.items() if v is None and MaintenanceReportCreate.model_fields[k].is_required()]
+    if required:
+        raise HTTPException(status_code=400, detail=f"Fields can't be cleared: {', '.join(required)}")
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    # Same normalization as PUT
+    for field in ("evaporator_warranty_details", "condenser_warranty_details"):
+        if field in changes:
+            changes[field] = changes[field] or ""
+    if "filters_list" in changes:
+        changes["filters_list"] = changes["filters_list"] or []
+    
+    report = await db.reports.find_one(
         {"id": report_id},
-        {
-            "$set": {
-                **update_data_without_photos,
-                "current_version": new_version_number,
-                "edit_count": existing_report.get("edit_count", 0) + 1,
-                "versions": versions
-            }
-        }
+        {"_id": 0, "technician_id": 1, "created_at": 1, "edit_count": 1, "versions": 1,
+         **{field: 1 for field in {*VERSION_FIELDS, *DIAGNOSTIC_INPUTS, *changes}}}
     )
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if report["technician_id"] != user["sub"]:
+        raise HTTPException(status_code=403, detail="Only the report creator can edit this report")
+    edit_count = report.get("edit_count", 0)
+    if edit_count >= 3:
+        raise HTTPException(status_code=400, detail="Maximum edit limit (3) reached for this report")
     
-    # Then, update photo fields separately if they exist
-    # This prevents the update command from being too large
-    photo_fields = {
-        "evaporator_photos": data.evaporator_photos or [],
-        "condenser_photos": data.condenser_photos or [],
-        "refrigerant_photos": data.refrigerant_photos or [],
-        "capacitor_photos": data.capacitor_photos or [],
-        "temperature_photos": data.temperature_photos or [],
-        "drainage_photos": data.drainage_photos or [],
-        "indoor_air_quality_photos": data.indoor_air_quality_photos or [],
-        "general_photos": data.general_photos or []
-    }
+    # Only photo fields that were sent count; a field sent empty clears it
+    try:
+        new_photos = await prepare_report_photos(photo_store, changes)
+    except InvalidPhoto as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Only update photo fields that have data to avoid unnecessary operations
-    for field_name, photos in photo_fields.items():
-        if photos and len(photos) > 0:
-            await db.reports.update_one(
-                {"id": report_id},
-                {"$set": {field_name: photos}}
-            )
+    updates = {k: v for k, v in changes.items() if report.get(k) != v}
+    if any(field in updates for field in DIAGNOSTIC_INPUTS):
+        try:
+            diagnostics = evaluate_report({**report, **updates})
+        except MissingInputs as e:
+            # Older reports can lack a measurement; the edit has to supply it
+            raise HTTPException(status_code=400, detail=f"Include in this edit: {', '.join(e.fields)}")
+        updates.update({k: v for k, v in diagnostics.fields().items() if report.get(k) != v})
+    
+    # New photos are stored before the write so the report never points at one that isn't
+    # there. The owner and edit limit were checked above, so only an edit that loses the
+    # race below (409) leaves them unreferenced; the store is content-addressed, so
+    # nothing is deleted on that path
+    try:
+        await ingest_photos(photo_store, new_photos)
+    except InvalidPhoto as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not updates:
+        return {
+            "report_id": report_id,
+            "message": "No changes",
+            "current_version": edit_count + 1,
+            "edit_count": edit_count
+        }
+    updates["timestamp"] = datetime.now(timezone.utc).isoformat()
+    
+    # The edit count we read doubles as an optimistic lock: any edit in between
+    # bumps it, and diagnostics computed from the values read here would be stale
+    update = {"$set": {**updates, "current_version": edit_count + 2, "revision": await next_revision(db)},
+              "$inc": {"edit_count": 1}}
+    if report.get("versions"):
+        # Saved before the write that drops it
+        await save_embedded(db, report_id, report["versions"])
+        update["$unset"] = {"versions": ""}
+    result = await db.reports.update_one(
+        {"id": report_id, "edit_count": edit_count if edit_count else {"$in": [0, None]}},
+        update
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Report was changed by another edit, reload and try again")
+    report_view_cache.invalidate(report_id)
     
-    if update_result.modified_count == 0:
-        raise HTTPException(status_code=500, detail="Failed to update report")
+    new_version = await record_edit(db, report_id, report, {**report, **updates}, updates["timestamp"])
     
     return {
         "report_id": report_id,
         "message": "Report updated successfully",
-        "current_version": new_version_number,
-        "edit_count": existing_report.get("edit_count", 0) + 1
+        "current_version": new_version,
+        "edit_count": new_version - 1,
+        "updated_fields": sorted(k for k in updates if k != "timestamp")
     }
 
 @api_router.get("/reports/view/{unique_link}")
-async def get_report_by_link(unique_link: str):
-    report = await db.reports.find_one({"unique_link": unique_link}, {"_id": 0})
+async def get_report_by_link(unique_link: str, request: Request):
+    cached = report_view_cache.get(unique_link)
+    if cached is not None:
+        body, etag = cached.body, cached.etag
+    else:
+        if request.headers.get("if-none-match"):
+            # Check the client's copy before loading the whole document
+            current = await db.reports.find_one({"unique_link": unique_link}, REVISION_PROJECTION)
+            if current and etag_matches(request.headers.get("if-none-match"), report_etag(current)):
+                return not_modified(report_etag(current), "no-cache")
+        generation = report_view_cache.generation
+        report = await db.reports.find_one({"unique_link": unique_link}, {"_id": 0})
+        if not report:
+            raise HTTPException(status_code=404, detail="Report not found")
+        etag = report_etag(report)
+        body = ORJSONResponse(link_report_photos(report)).body
+        report_view_cache.put(unique_link, report["id"], body, etag, generation)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, "no-cache")
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+# Version history by report id is for the report's technician and the customers who
+# added it to their history. The share page reads it by link, without past contact details
+PRIVATE_VERSION_FIELDS = ("customer_email", "customer_phone")
+
+async def check_report_access(report_id: str, user: dict):
+    report = await db.reports.find_one({"id": report_id}, {"_id": 0, "technician_id": 1})
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
-    return report
+    if user.get("type") == "technician":
+        allowed = report["technician_id"] == user["sub"]
+    else:
+        allowed = await db.customer_reports.find_one({"customer_id": user["sub"], "report_id": report_id},
+                                                     {"_id": 1}) is not None
+    if not allowed:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+async def shared_report_id(unique_link: str) -> str:
+    report = await db.reports.find_one({"unique_link": unique_link}, {"_id": 0, "id": 1})
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report["id"]
+
+async def load_version(report_id: str, version: int) -> dict:
+    try:
+        snapshots = await load_snapshots(db, report_id, version)
+    except VersionNotFound:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return snapshots[version]
+
+@api_router.get("/reports/{report_id}/versions")
+async def get_report_versions(report_id: str, user: dict = Depends(get_current_user)):
+    await check_report_access(report_id, user)
+    return await list_versions(db, report_id)
+
+@api_router.get("/reports/{report_id}/versions/{version}")
+async def get_report_version(report_id: str, version: int, user: dict = Depends(get_current_user)):
+    await check_report_access(report_id, user)
+    return await load_version(report_id, version)
+
+@api_router.get("/reports/{report_id}/versions/{a}/diff/{b}")
+async def diff_report_versions(report_id: str, a: int, b: int, user: dict = Depends(get_current_user)):
+    await check_report_access(report_id, user)
+    try:
+        snapshots = await load_snapshots(db, report_id, a, b)
+    except VersionNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Version {e.args[0]} not found")
+    return {
+        "report_id": report_id,
+        "from": {k: snapshots[a][k] for k in ("version", "label", "timestamp")},
+        "to": {k: snapshots[b][k] for k in ("version", "label", "timestamp")},
+        "changes": compare(snapshots[a]["data"], snapshots[b]["data"]),
+    }
+
+@api_router.get("/reports/view/{unique_link}/versions")
+async def get_shared_report_versions(unique_link: str):
+    return await list_versions(db, await shared_report_id(unique_link))
+
+@api_router.get("/reports/view/{unique_link}/versions/{version}")
+async def get_shared_report_version(unique_link: str, version: int):
+    snapshot = await load_version(await shared_report_id(unique_link), version)
+    data = {k: v for k, v in snapshot["data"].items() if k not in PRIVATE_VERSION_FIELDS}
+    return {**snapshot, "data": data}
 
 @api_router.get("/reports/edit/{report_id}")
-async def get_report_for_edit(report_id: str, user: dict = Depends(get_current_user)):
+async def get_report_for_edit(report_id: str, request: Request, user: dict = Depends(get_current_user)):
     if user.get("type") != "technician":
         raise HTTPException(status_code=403, detail="Only technicians can access this endpoint")
     
-    report = await db.reports.find_one({"id": report_id}, {"_id": 0})
+    # A conditional request only needs owner and revision until it turns out to be stale
+    conditional = bool(request.headers.get("if-none-match"))
+    report = await db.reports.find_one({"id": report_id}, REVISION_PROJECTION if conditional else {"_id": 0})
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
@@ -903,7 +979,12 @@ async def get_report_for_edit(report_id: str, user: dict = Depends(get_current_u
     if report["technician_id"] != user["sub"]:
         raise HTTPException(status_code=403, detail="Only the report creator can edit this report")
     
-    return report
+    etag = report_etag(report)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    if conditional:
+        report = await db.reports.find_one({"id": report_id}, {"_id": 0})
+    return ORJSONResponse(link_report_photos(report), headers={"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL})
 
 @api_router.put("/reports/{report_id}/archive")
 async def toggle_archive_report(report_id: str, user: dict = Depends(get_current_user)):
@@ -922,8 +1003,9 @@ async def toggle_archive_report(report_id: str, user: dict = Depends(get_current
     new_archived_status = not report.get("archived", False)
     await db.reports.update_one(
         {"id": report_id},
-        {"$set": {"archived": new_archived_status}}
+        {"$set": {"archived": new_archived_status, "revision": await next_revision(db)}}
     )
+    report_view_cache.invalidate(report_id)
     
     return {
         "report_id": report_id,
@@ -931,149 +1013,478 @@ async def toggle_archive_report(report_id: str, user: dict = Depends(get_current
         "message": f"Report {'archived' if new_archived_status else 'unarchived'} successfully"
     }
 
+# Fields returned by the dashboard list view; everything else (photos,
+# measurements) is only fetched on drill-down
+REPORT_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "unique_link": 1,
+    "technician_name": 1,
+    "customer_name": 1,
+    "customer_email": 1,
+    "customer_phone": 1,
+    "evaporator_brand": 1,
+    "condenser_brand": 1,
+    "performance_score": 1,
+    "warnings_count": {"$size": {"$ifNull": ["$warnings", []]}},
+    "created_at": 1,
+    "archived": 1,
+    "edit_count": 1,
+    "current_version": 1,
+}
+MAX_PAGE_SIZE = 200
+# Reports per cursor round trip in ?stream=ndjson mode; full reports run to ~10 KB each
+REPORT_STREAM_BATCH_SIZE = int(os.environ.get('REPORT_STREAM_BATCH_SIZE', '50'))
+
+def encode_cursor(report: dict) -> str:
+    raw = json.dumps([report["created_at"], report["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        created_at, report_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(created_at), str(report_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def apply_cursor(query: dict, cursor: Optional[str], id_field: str = "id") -> dict:
+    """Keyset condition for the (created_at desc, id desc) sort order"""
+    if not cursor:
+        return query
+    created_at, report_id = decode_cursor(cursor)
+    return {
+        "$and": [
+            query,
+            {"$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, id_field: {"$lt": report_id}},
+            ]},
+        ]
+    }
+
+async def fetch_report_page(query: dict, projection: dict, limit: int, cursor: Optional[str]) -> dict:
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    reports = await db.reports.find(
+        apply_cursor(query, cursor),
+        projection
+    ).sort([("created_at", -1), ("id", -1)]).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        next_cursor = encode_cursor(reports[-1])
+    return {"reports": reports, "next_cursor": next_cursor}
+
+def check_stream_mode(stream: Optional[str]) -> bool:
+    if stream not in (None, "ndjson"):
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson'")
+    return stream == "ndjson"
+
+def stream_reports(query: dict, projection: dict, headers: dict, link_photos: bool = True,
+                   json_array: bool = False) -> StreamingResponse:
+    """Every matching report, newest first, one JSON document per line
+    
+    The cursor is read batch by batch, so memory stays flat however many reports
+    match, and nothing is cut off at a fixed count. With json_array the same
+    documents are written out as one JSON array instead.
+    """
+    async def lines():
+        cursor = db.reports.find(query, projection).sort([("created_at", -1), ("id", -1)])
+        cursor.batch_size(REPORT_STREAM_BATCH_SIZE)
+        separator = b"[" if json_array else b""
+        try:
+            async for report in cursor:
+                line = orjson.dumps(link_report_photos(report) if link_photos else report)
+                if json_array:
+                    yield separator + line
+                    separator = b","
+                else:
+                    yield line + b"\n"
+        finally:
+            await cursor.close()
+        if json_array:
+            yield b"[]" if separator == b"[" else b"]"
+    media_type = "application/json" if json_array else "application/x-ndjson"
+    return StreamingResponse(lines(), media_type=media_type, headers=headers)
+
+def parse_timestamp(value: Optional[str], name: str) -> Optional[str]:
+    """An ISO 8601 bound, normalized to the UTC form created_at is stored in"""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 timestamp")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
 @api_router.get("/reports")
 async def get_technician_reports(
+    request: Request,
     user: dict = Depends(get_current_user),
-    include_archived: bool = False
+    include_archived: bool = False,
+    archived: Optional[bool] = None,
+    q: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    view: str = "full",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: Optional[str] = None
 ):
     if user.get("type") != "technician":
         raise HTTPException(status_code=403, detail="Access denied")
+    streaming = check_stream_mode(stream)
+    if view not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="view must be 'full' or 'summary'")
     
-    # Build query filter
+    # Build query filter. Filters run here rather than in the browser so they cover
+    # every report, not just the pages loaded so far
     query = {"technician_id": user["sub"]}
-    if not include_archived:
+    if archived is not None:
+        query["archived"] = True if archived else {"$ne": True}
+    elif not include_archived:
         query["archived"] = {"$ne": True}  # Exclude archived reports by default
-    
-    reports = await db.reports.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    
-    return reports
+    if q:
+        # Substring match on name or email; scoped to the technician's reports by the index
+        pattern = {"$regex": re.escape(q.strip()), "$options": "i"}
+        query["$or"] = [{"customer_name": pattern}, {"customer_email": pattern}]
+    created = {}
+    if created_from:
+        created["$gte"] = parse_timestamp(created_from, "created_from")
+    if created_to:
+        created["$lt"] = parse_timestamp(created_to, "created_to")
+    if created:
+        query["created_at"] = created
+    
+    etag = await list_etag(db, query)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    headers = {"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL}
+    
+    projection = REPORT_SUMMARY_PROJECTION if view == "summary" else {"_id": 0}
+    # Streaming mode: every report, one per line (limit and cursor don't apply)
+    if streaming:
+        return stream_reports(query, projection, headers, link_photos=view == "full")
+    # Paged with an opaque keyset cursor; summary mode always is
+    if view == "summary" or limit is not None or cursor:
+        page = await fetch_report_page(query, projection, limit or 50, cursor)
+        if view == "full":
+            page["reports"] = [link_report_photos(report) for report in page["reports"]]
+        return ORJSONResponse(page, headers=headers)
+    
+    # Unpaged full view, as before: a plain array, now of every report rather than
+    # the first 1000, written straight off the cursor
+    return stream_reports(query, projection, headers, json_array=True)
 
 @api_router.post("/customer/add-report/{unique_link}")
 async def add_report_to_customer(unique_link: str, user: dict = Depends(get_current_user)):
     if user.get("type") != "customer":
         raise HTTPException(status_code=403, detail="Access denied")
     
-    report = await db.reports.find_one({"unique_link": unique_link})
+    report = await db.reports.find_one({"unique_link": unique_link}, {"_id": 0, "id": 1, "created_at": 1})
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    # Add report to customer's history
-    await db.customers.update_one(
-        {"id": user["sub"]},
-        {"$addToSet": {"report_ids": report["id"]}}
+    # Add report to customer's history; adding it twice is a no-op
+    await db.customer_reports.update_one(
+        {"customer_id": user["sub"], "report_id": report["id"]},
+        {"$setOnInsert": {"created_at": report["created_at"], "added_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
     )
     
     return {"message": "Report added to your history"}
 
+# A customer's history, newest report first; answered from the customer_created index
+CUSTOMER_REPORTS_SORT = [("created_at", -1), ("report_id", -1)]
+
+async def fetch_reports_in_order(report_ids: list[str]) -> list[dict]:
+    reports = await db.reports.find({"id": {"$in": report_ids}}, {"_id": 0}).to_list(len(report_ids))
+    by_id = {report["id"]: report for report in reports}
+    return [link_report_photos(by_id[report_id]) for report_id in report_ids if report_id in by_id]
+
+async def iter_customer_reports(customer_id: str, limit: Optional[int] = None):
+    """A customer's reports in history order, read off the link cursor one batch at a time"""
+    links = db.customer_reports.find({"customer_id": customer_id}, {"_id": 0, "report_id": 1, "created_at": 1})
+    links = links.sort(CUSTOMER_REPORTS_SORT)
+    if limit:
+        links = links.limit(limit)
+    links.batch_size(REPORT_STREAM_BATCH_SIZE)
+    batch = []
+    try:
+        async for link in links:
+            batch.append(link["report_id"])
+            if len(batch) >= REPORT_STREAM_BATCH_SIZE:
+                for report in await fetch_reports_in_order(batch):
+                    yield report
+                batch = []
+        if batch:
+            for report in await fetch_reports_in_order(batch):
+                yield report
+    finally:
+        await links.close()
+
 @api_router.get("/customer/reports")
-async def get_customer_reports(user: dict = Depends(get_current_user)):
+async def get_customer_reports(
+    request: Request,
+    user: dict = Depends(get_current_user),
+    stream: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
     if user.get("type") != "customer":
         raise HTTPException(status_code=403, detail="Access denied")
+    streaming = check_stream_mode(stream)
     
-    customer = await db.customers.find_one({"id": user["sub"]})
+    customer = await db.customers.find_one({"id": user["sub"]}, {"_id": 1})
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    reports = await db.reports.find(
-        {"id": {"$in": customer.get("report_ids", [])}},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    
-    return reports
+    # Paged mode: {"reports": [...], "next_cursor": ...} with an opaque keyset cursor
+    if (limit is not None or cursor) and not streaming:
+        limit = max(1, min(limit or 50, MAX_PAGE_SIZE))
+        links = await db.customer_reports.find(
+            apply_cursor({"customer_id": user["sub"]}, cursor, id_field="report_id"),
+            {"_id": 0, "report_id": 1, "created_at": 1}
+        ).sort(CUSTOMER_REPORTS_SORT).to_list(limit + 1)
+        next_cursor = None
+        if len(links) > limit:
+            links = links[:limit]
+            next_cursor = encode_cursor({"created_at": links[-1]["created_at"], "id": links[-1]["report_id"]})
+        report_ids = [link["report_id"] for link in links]
+        etag = await ids_etag(db, report_ids)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag, PRIVATE_CACHE_CONTROL)
+        return ORJSONResponse({"reports": await fetch_reports_in_order(report_ids), "next_cursor": next_cursor},
+                              headers={"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL})
+    
+    etag = await history_etag(db, user["sub"])
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    headers = {"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL}
+    if streaming:
+        async def lines():
+            async for report in iter_customer_reports(user["sub"]):
+                yield orjson.dumps(report) + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+    # Unpaged array, as before (first 1000)
+    return ORJSONResponse([report async for report in iter_customer_reports(user["sub"], limit=1000)], headers=headers)
+
+async def stream_photo(photo_hash: str, request: Request):
+    try:
+        info = await photo_store.stat(photo_hash)
+    except PhotoNotFound:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    # Photos are content-addressed, so the hash is a strong ETag and the bytes never change
+    headers = {
+        "ETag": f'"{photo_hash}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    start, end = 0, info.length - 1
+    status_code = 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and info.length > 0 and (not if_range or if_range.strip() == headers["ETag"]):
+        byte_range = parse_range_header(range_header, info.length)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{info.length}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.length}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        photo_store.iter_range(photo_hash, start, end),
+        status_code=status_code,
+        media_type=info.content_type,
+        headers=headers,
+    )
+
+# Resumable photo uploads: initiate, PUT chunks at ?offset=N, then complete to get a photo id
+@api_router.post("/photos/uploads")
+async def initiate_photo_upload(data: PhotoUploadInit, user: dict = Depends(get_current_user)):
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can upload photos")
+    try:
+        return await photo_uploads.initiate(user["sub"], size=data.size, content_type=data.content_type)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@api_router.get("/photos/uploads/{upload_id}")
+async def get_photo_upload(upload_id: str, user: dict = Depends(get_current_user)):
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can upload photos")
+    try:
+        return await photo_uploads.status(upload_id, user["sub"])
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+@api_router.put("/photos/uploads/{upload_id}")
+async def upload_photo_chunk(upload_id: str, request: Request, offset: int = 0, user: dict = Depends(get_current_user)):
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can upload photos")
+    try:
+        return await photo_uploads.write_chunk(upload_id, user["sub"], offset, request.stream())
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@api_router.post("/photos/uploads/{upload_id}/complete")
+async def complete_photo_upload(upload_id: str, user: dict = Depends(get_current_user)):
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can upload photos")
+    try:
+        return await photo_uploads.finalize(upload_id, user["sub"])
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except InvalidPhoto as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/photos/{photo_hash}")
+async def get_photo(photo_hash: str, request: Request):
+    if not is_photo_hash(photo_hash):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    return await stream_photo(photo_hash, request)
+
+@api_router.get("/photos/{photo_hash}/{rendition}")
+async def get_photo_rendition(photo_hash: str, rendition: str, request: Request):
+    if not is_photo_hash(photo_hash) or rendition not in RENDITION_NAMES:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    try:
+        rendition_hash = await resolve_rendition(photo_store, photo_hash, rendition)
+    except PhotoNotFound:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    except InvalidPhoto:
+        # Original isn't a decodable image; serve it as-is
+        rendition_hash = photo_hash
+    return await stream_photo(rendition_hash, request)
+
+# Static for the life of the process, so encode it (and its ETag) once
+PARTS_CATALOG = [
+    {
+        "id": "cap-20-440",
+        "name": "Run Capacitor 20µF 440V",
+        "category": "capacitor",
+        "description": "Dual run capacitor for residential AC units",
+        "price": 24.99,
+        "image_url": "/images/capacitor.jpg"
+    },
+    {
+        "id": "cap-35-440",
+        "name": "Run Capacitor 35µF 440V",
+        "category": "capacitor",
+        "description": "Heavy-duty capacitor for larger AC systems",
+        "price": 29.99,
+        "image_url": "/images/capacitor.jpg"
+    },
+    {
+        "id": "cap-45-440",
+        "name": "Run Capacitor 45µF 440V",
+        "category": "capacitor",
+        "description": "High-capacity run capacitor",
+        "price": 34.99,
+        "image_url": "/images/capacitor.jpg"
+    },
+    {
+        "id": "ref-r410a",
+        "name": "R-410A Refrigerant 25lb Cylinder",
+        "category": "refrigerant",
+        "description": "Puron refrigerant for modern AC systems",
+        "price": 189.99,
+        "image_url": "/images/refrigerant.jpg"
+    },
+    {
+        "id": "ref-r22",
+        "name": "R-22 Refrigerant 30lb Cylinder",
+        "category": "refrigerant",
+        "description": "Freon for older AC systems",
+        "price": 499.99,
+        "image_url": "/images/refrigerant.jpg"
+    },
+    {
+        "id": "filter-16x25",
+        "name": "MERV 11 Air Filter 16x25x1",
+        "category": "filter",
+        "description": "High-efficiency pleated air filter",
+        "price": 12.99,
+        "image_url": "/images/filter.jpg"
+    },
+    {
+        "id": "filter-20x25",
+        "name": "MERV 11 Air Filter 20x25x1",
+        "category": "filter",
+        "description": "High-efficiency pleated air filter",
+        "price": 14.99,
+        "image_url": "/images/filter.jpg"
+    },
+    {
+        "id": "coil-cleaner",
+        "name": "Professional Coil Cleaner Concentrate",
+        "category": "maintenance",
+        "description": "Heavy-duty coil cleaning solution",
+        "price": 24.99,
+        "image_url": "/images/cleaner.jpg"
+    },
+    {
+        "id": "contactor-30a",
+        "name": "30A Contactor Relay",
+        "category": "electrical",
+        "description": "Single pole contactor for AC units",
+        "price": 19.99,
+        "image_url": "/images/contactor.jpg"
+    },
+    {
+        "id": "thermostat-wifi",
+        "name": "Smart WiFi Thermostat",
+        "category": "control",
+        "description": "Programmable smart thermostat with app control",
+        "price": 149.99,
+        "image_url": "/images/thermostat.jpg"
+    }
+]
+PARTS_CATALOG_BODY = ORJSONResponse(PARTS_CATALOG).body
+PARTS_CATALOG_ETAG = f'"{hashlib.sha256(PARTS_CATALOG_BODY).hexdigest()[:32]}"'
 
 @api_router.get("/parts")
-async def get_parts_catalog():
-    parts = [
-        {
-            "id": "cap-20-440",
-            "name": "Run Capacitor 20µF 440V",
-            "category": "capacitor",
-            "description": "Dual run capacitor for residential AC units",
-            "price": 24.99,
-            "image_url": "/images/capacitor.jpg"
-        },
-        {
-            "id": "cap-35-440",
-            "name": "Run Capacitor 35µF 440V",
-            "category": "capacitor",
-            "description": "Heavy-duty capacitor for larger AC systems",
-            "price": 29.99,
-            "image_url": "/images/capacitor.jpg"
-        },
-        {
-            "id": "cap-45-440",
-            "name": "Run Capacitor 45µF 440V",
-            "category": "capacitor",
-            "description": "High-capacity run capacitor",
-            "price": 34.99,
-            "image_url": "/images/capacitor.jpg"
-        },
-        {
-            "id": "ref-r410a",
-            "name": "R-410A Refrigerant 25lb Cylinder",
-            "category": "refrigerant",
-            "description": "Puron refrigerant for modern AC systems",
-            "price": 189.99,
-            "image_url": "/images/refrigerant.jpg"
-        },
-        {
-            "id": "ref-r22",
-            "name": "R-22 Refrigerant 30lb Cylinder",
-            "category": "refrigerant",
-            "description": "Freon for older AC systems",
-            "price": 499.99,
-            "image_url": "/images/refrigerant.jpg"
-        },
-        {
-            "id": "filter-16x25",
-            "name": "MERV 11 Air Filter 16x25x1",
-            "category": "filter",
-            "description": "High-efficiency pleated air filter",
-            "price": 12.99,
-            "image_url": "/images/filter.jpg"
-        },
-        {
-            "id": "filter-20x25",
-            "name": "MERV 11 Air Filter 20x25x1",
-            "category": "filter",
-            "description": "High-efficiency pleated air filter",
-            "price": 14.99,
-            "image_url": "/images/filter.jpg"
-        },
-        {
-            "id": "coil-cleaner",
-            "name": "Professional Coil Cleaner Concentrate",
-            "category": "maintenance",
-            "description": "Heavy-duty coil cleaning solution",
-            "price": 24.99,
-            "image_url": "/images/cleaner.jpg"
-        },
-        {
-            "id": "contactor-30a",
-            "name": "30A Contactor Relay",
-            "category": "electrical",
-            "description": "Single pole contactor for AC units",
-            "price": 19.99,
-            "image_url": "/images/contactor.jpg"
-        },
-        {
-            "id": "thermostat-wifi",
-            "name": "Smart WiFi Thermostat",
-            "category": "control",
-            "description": "Programmable smart thermostat with app control",
-            "price": 149.99,
-            "image_url": "/images/thermostat.jpg"
-        }
-    ]
-    return parts
+async def get_parts_catalog(request: Request):
+    cache_control = "public, max-age=3600"
+    if etag_matches(request.headers.get("if-none-match"), PARTS_CATALOG_ETAG):
+        return not_modified(PARTS_CATALOG_ETAG, cache_control)
+    return Response(content=PARTS_CATALOG_BODY, media_type="application/json",
+                    headers={"ETag": PARTS_CATALOG_ETAG, "Cache-Control": cache_control})
 
 @api_router.get("/")
 async def root():
     return {"message": "AC Maintenance Report API"}
 
+@api_router.get("/metrics", dependencies=[Depends(require_metrics_access)])
+async def get_metrics():
+    return {
+        "password_hashing": {
+            **password_stats,
+            "workers": PASSWORD_HASH_WORKERS,
+            "max_queue": PASSWORD_HASH_MAX_QUEUE,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        },
+        "ocr_cache": await ocr_cache.snapshot(),
+        "ocr_limiter": ocr_limiter.snapshot(),
+        "vision_provider": vision.snapshot(),
+        "vision_images": vision_image_stats.snapshot(),
+        "report_view_cache": report_view_cache.snapshot(),
+        "compression": compressor.snapshot(),
+    }
+
 # OCR Data Plate Scanning
 class DataPlateOCRRequest(BaseModel):
     image_base64: str
@@ -1099,360 +1510,269 @@ class WarrantyOCRResponse(BaseModel):
     warranty_status: str
     warranty_details: str
 
+class SerialDecodeRequest(BaseModel):
+    brand: str
+    serial_number: str
+
+class SerialDecodeResponse(BaseModel):
+    brand_family: Optional[str] = None
+    decoder: Optional[str] = None
+    manufacture_year: Optional[int] = None
+    manufacture_month: Optional[int] = None
+    date_of_manufacture: Optional[str] = None
+    estimated_age: Optional[str] = None
+    warranty_status: str
+
+class OcrJobCreate(BaseModel):
+    kind: str  # "data_plate" or "warranty"
+    image_base64: Optional[str] = None
+    photo_id: Optional[str] = None  # or a photo already uploaded through /api/photos/uploads
+    params: dict = {}  # the rest of the matching scan request: equipment_type, or brand and serial_number
+
+class OcrBatchItem(OcrJobCreate):
+    id: Optional[str] = None  # echoed back so the client can match results to images
+
+class OcrBatchRequest(BaseModel):
+    items: List[OcrBatchItem]
+
+async def scan_warranty_image(request: WarrantyOCRRequest, owner_id: str) -> WarrantyOCRResponse:
+    """Read a warranty lookup screenshot (cached, and queued fairly behind other technicians)"""
+    key = cache_key("warranty", WARRANTY_PROMPT_VERSION, request.image_base64,
+                    brand=request.brand, serial_number=request.serial_number)
+    data = await ocr_cache.get_or_compute(key, "warranty", lambda: scan_image(
+        ocr_limiter, vision, owner_id, "warranty-ocr", WARRANTY_SYSTEM_MESSAGE,
+        warranty_prompt(request.brand, request.serial_number), request.image_base64,
+    ))
+
+    return WarrantyOCRResponse(
+        age=data.get("age"),
+        warranty_status=data.get("warranty_status", "Unknown"),
+        warranty_details=data.get("warranty_details", "Not found")
+    )
+
+async def scan_data_plate_image(request: DataPlateOCRRequest, owner_id: str) -> DataPlateOCRResponse:
+    """Read a data plate photo (cached, and queued fairly) and work out age and warranty from the serial"""
+    # Only the raw extraction is cached; age and warranty depend on today's date
+    key = cache_key("data_plate", DATA_PLATE_PROMPT_VERSION, request.image_base64,
+                    equipment_type=request.equipment_type)
+    data = await ocr_cache.get_or_compute(key, "data_plate", lambda: scan_image(
+        ocr_limiter, vision, owner_id, "ocr", DATA_PLATE_SYSTEM_MESSAGE,
+        data_plate_prompt(request.equipment_type), request.image_base64,
+    ))
+
+    # Age and warranty from the serial number (see serial_decoders.py)
+    serial = decode_serial(data.get("brand"), data.get("serial_number"))
+
+    return DataPlateOCRResponse(
+        brand=data.get("brand", "Not found"),
+        model_number=data.get("model_number", "Not found"),
+        serial_number=data.get("serial_number", "Not found"),
+        date_of_manufacture=serial.date_of_manufacture,
+        estimated_age=serial.estimated_age,
+        warranty_status=serial.warranty_status,
+        rla=data.get("rla", "Not found") if data.get("rla") != "Not found" else None,
+        lra=data.get("lra", "Not found") if data.get("lra") != "Not found" else None
+    )
+
 @api_router.post("/ocr/scan-warranty", response_model=WarrantyOCRResponse)
-async def scan_warranty(request: WarrantyOCRRequest):
+async def scan_warranty(request: WarrantyOCRRequest, user: dict = Depends(get_current_user)):
     """
     Extract warranty information from manufacturer warranty lookup screenshot using AI Vision
     """
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can scan warranties")
+    
     try:
-        # Get API key from environment
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        # Initialize LLM Chat with OpenAI Vision
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"warranty-ocr-{uuid.uuid4()}",
-            system_message="You are an expert at reading HVAC equipment warranty information from manufacturer websites and extracting detailed coverage information."
-        ).with_model("openai", "gpt-4o")
-        
-        # Create image content
-        image_content = ImageContent(image_base64=request.image_base64)
-        
-        # Create user message with specific instructions
-        user_message = UserMessage(
-            text=f"""Analyze this warranty lookup screenshot from {request.brand} for serial number {request.serial_number}.
-
-Extract the following warranty information:
-
-1. Equipment Age - Look for:
-   - Manufacture date (e.g., "Manufactured: 05/2015" or "Date of Manufacture: 2015")
-   - Age in years (e.g., "9 years old")
-   - Installation date if shown
-   - Any date reference that indicates when unit was made
-   
-2. Warranty Status - Determine if warranty is:
-   - Active with specific years remaining (e.g., "Active (2 years remaining)")
-   - Expired
-   - Calculate remaining years if expiration date is shown
-   
-3. Detailed Coverage Information including:
-   - Compressor warranty period and expiration
-   - Heat exchanger warranty period
-   - Parts coverage period and expiration
-   - Labor coverage period (if any) and expiration
-   - Extended warranty information
-   - Specific expiration dates
-   - Registration status
-   - Any special conditions or notes
-
-IMPORTANT:
-- If you see a manufacture date or year, calculate the age: Current year (2024) - Manufacture year = Age
-- If you see warranty expiration dates, calculate years remaining
-- Be specific about coverage periods (e.g., "10 years", "20 years")
-- Include actual dates when visible
-
-Please respond ONLY with a JSON object in this exact format (no additional text):
-{{
-    "age": "X years (Manufactured YYYY)" or "Manufactured: MM/YYYY" or "X years old",
-    "warranty_status": "Active (X years remaining on parts)" or "Expired" or specific status with years,
-    "warranty_details": "Detailed breakdown: Compressor: X-year warranty, expires YYYY. Heat Exchanger: X-year warranty. Parts: X-year coverage, expires YYYY. Labor: [included/not included]. Extended warranty: [yes/no/details]. Special conditions: [any notes]"
-}}
-
-If age or dates are not visible in the screenshot, use "Not shown" for age.
-Be thorough and extract ALL details visible.""",
-            file_contents=[image_content]
-        )
-        
-        # Send message and get response
-        response = await chat.send_message(user_message)
-        
-        # Log the raw response for debugging
-        logging.info(f"Warranty OCR Raw Response: {response}")
-        
-        # Parse the JSON response
-        try:
-            # Clean the response - remove markdown code blocks if present
-            clean_response = response.strip()
-            if clean_response.startswith("```json"):
-                clean_response = clean_response[7:]
-            if clean_response.startswith("```"):
-                clean_response = clean_response[3:]
-            if clean_response.endswith("```"):
-                clean_response = clean_response[:-3]
-            clean_response = clean_response.strip()
-            
-            logging.info(f"Warranty OCR Cleaned Response: {clean_response}")
-            data = json.loads(clean_response)
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON Parse Error: {str(e)}, Response: {response}")
-            # Try to extract JSON using regex if direct parsing fails
-            json_match = re.search(r'\{[^}]+\}', response, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    logging.error(f"Regex extraction also failed. Full response: {response}")
-                    raise HTTPException(status_code=500, detail="Failed to parse warranty OCR response")
-            else:
-                logging.error(f"No JSON found in response: {response}")
-                raise HTTPException(status_code=500, detail="No valid JSON in warranty OCR response")
-        
-        return WarrantyOCRResponse(
-            age=data.get("age"),
-            warranty_status=data.get("warranty_status", "Unknown"),
-            warranty_details=data.get("warranty_details", "Not found")
-        )
+        return await scan_warranty_image(request, user["sub"])
         
+    except QueueTimeout as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except VisionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except OcrResponseError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         logging.error(f"Warranty OCR Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Warranty OCR processing failed: {str(e)}")
 
 @api_router.post("/ocr/scan-data-plate", response_model=DataPlateOCRResponse)
-async def scan_data_plate(request: DataPlateOCRRequest):
+async def scan_data_plate(request: DataPlateOCRRequest, user: dict = Depends(get_current_user)):
     """
     Extract HVAC equipment information from data plate photo using AI Vision
     """
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can scan data plates")
+    
     try:
-        # Get API key from environment
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        # Initialize LLM Chat with OpenAI Vision
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"ocr-{uuid.uuid4()}",
-            system_message="You are an expert at reading HVAC equipment data plates and extracting information accurately."
-        ).with_model("openai", "gpt-4o")
-        
-        # Create image content
-        image_content = ImageContent(image_base64=request.image_base64)
-        
-        # Create user message with specific instructions
-        user_message = UserMessage(
-            text=f"""Analyze this HVAC {request.equipment_type} data plate photo and extract the following information:
-
-1. Brand/Manufacturer name - Look for company logos or names like "LENNOX", "TRANE", "CARRIER", "GOODMAN", etc.
-2. Model Number - May be labeled as "MODEL", "MODEL NO.", "M/N", "MODEL #", or just appear as a product code
-3. Serial Number - May be labeled as "SERIAL", "SERIAL NO.", "S/N", "SERIAL #", or appear as a unique identifier
-4. RLA (Rated Load Amps) - May be labeled as "RLA", "RATED LOAD AMPS", "R.L.A.", or "AMPS"
-5. LRA (Locked Rotor Amps) - May be labeled as "LRA", "LOCKED ROTOR AMPS", "L.R.A.", or "STARTING AMPS"
-
-IMPORTANT NOTES:
-- Data plates may use abbreviations: "M/N" = Model Number, "S/N" = Serial Number
-- Model numbers often contain letters and numbers (e.g., "CBA25UH-048-230-02")
-- Serial numbers are typically numeric or alphanumeric codes (e.g., "1523C65202")
-- RLA is the normal operating amperage (e.g., "18.5" or "18.5A")
-- LRA is the starting/locked rotor amperage, usually higher (e.g., "95" or "95A")
-- Look carefully at all text on the data plate, even if it's in small print
-- The model number is often one of the most prominent codes on the plate
-- Electrical specifications (RLA/LRA) are often in a separate section on the data plate
-
-Please respond ONLY with a JSON object in this exact format (no additional text):
-{{
-    "brand": "manufacturer name",
-    "model_number": "model number",
-    "serial_number": "serial number",
-    "rla": "RLA value (just the number, e.g., 18.5)",
-    "lra": "LRA value (just the number, e.g., 95)"
-}}
-
-If you cannot read a field clearly, use "Not found" as the value.
-Read ALL text carefully and extract the exact values as they appear on the data plate.""",
-            file_contents=[image_content]
-        )
-        
-        # Send message and get response
-        response = await chat.send_message(user_message)
-        
-        # Log the raw response for debugging
-        logging.info(f"OCR Raw Response: {response}")
-        
-        # Parse the JSON response
-        try:
-            # Clean the response - remove markdown code blocks if present
-            clean_response = response.strip()
-            if clean_response.startswith("```json"):
-                clean_response = clean_response[7:]
-            if clean_response.startswith("```"):
-                clean_response = clean_response[3:]
-            if clean_response.endswith("```"):
-                clean_response = clean_response[:-3]
-            clean_response = clean_response.strip()
-            
-            logging.info(f"OCR Cleaned Response: {clean_response}")
-            data = json.loads(clean_response)
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON Parse Error: {str(e)}, Response: {response}")
-            # Try to extract JSON using regex if direct parsing fails
-            json_match = re.search(r'\{[^}]+\}', response, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    logging.error(f"Regex extraction also failed. Full response: {response}")
-                    raise HTTPException(status_code=500, detail=f"Failed to parse OCR response. The AI returned: {response[:200]}")
-            else:
-                logging.error(f"No JSON found in response: {response}")
-                raise HTTPException(status_code=500, detail=f"No valid JSON in OCR response. The AI returned: {response[:200]}")
-        
-        # Manufacturer-specific serial number parsing
-        def parse_lennox_serial(serial):
-            """
-            Lennox format:
-            - Positions 3-4: Year (e.g., 23 = 2023)
-            - Position 5: Month letter (A=Jan, B=Feb, C=Mar, etc.)
-            """
-            if len(serial) >= 5:
-                try:
-                    year_code = int(serial[2:4])  # Positions 3-4 (0-indexed: [2:4])
-                    month_letter = serial[4].upper()  # Position 5 (0-indexed: [4])
-                    
-                    # Convert 2-digit year to 4-digit
-                    if year_code <= 30:
-                        year = 2000 + year_code
-                    else:
-                        year = 1900 + year_code
-                    
-                    # Month mapping (note: no 'I' in the sequence)
-                    month_map = {
-                        'A': 'January', 'B': 'February', 'C': 'March', 'D': 'April',
-                        'E': 'May', 'F': 'June', 'G': 'July', 'H': 'August',
-                        'J': 'September', 'K': 'October', 'L': 'November', 'M': 'December'
-                    }
-                    month_name = month_map.get(month_letter, 'Unknown')
-                    
-                    return year, f"{month_name} {year}"
-                except (ValueError, IndexError):
-                    return None, None
-            return None, None
-        
-        def parse_generic_serial(serial):
-            """Generic parsing for other manufacturers"""
-            # Pattern 1: First 2 digits are year
-            if len(serial) >= 2 and serial[:2].isdigit():
-                year_code = int(serial[:2])
-                if year_code <= 30:
-                    return 2000 + year_code, None
-                elif year_code >= 80:
-                    return 1900 + year_code, None
-            
-            # Pattern 2: Full year format (19XX or 20XX)
-            year_match = re.search(r'(19\d{2}|20\d{2})', serial)
-            if year_match:
-                return int(year_match.group(0)), None
-            
-            return None, None
-        
-        # Calculate age and warranty from serial number
-        estimated_age = None
-        warranty_status = "Unknown"
-        manufacture_date = None
-        
-        serial_number = data.get("serial_number", "")
-        brand = data.get("brand", "").upper()
-        
-        if serial_number and serial_number != "Not found":
-            manufacture_year = None
-            
-            # Use manufacturer-specific parsing
-            if "LENNOX" in brand:
-                manufacture_year, manufacture_date = parse_lennox_serial(serial_number)
-            else:
-                # Use generic parsing for other brands
-                manufacture_year, _ = parse_generic_serial(serial_number)
-            
-            # Calculate age and warranty if we found a year
-            if manufacture_year:
-                # Create manufacture date for calculation
-                # Default to January if no specific month available
-                manufacture_month = 1
-                if manufacture_date:
-                    # Extract month number from manufacture_date like "March 2023"
-                    month_names = {
-                        'january': 1, 'february': 2, 'march': 3, 'april': 4,
-                        'may': 5, 'june': 6, 'july': 7, 'august': 8,
-                        'september': 9, 'october': 10, 'november': 11, 'december': 12
-                    }
-                    for month_name, month_num in month_names.items():
-                        if month_name in manufacture_date.lower():
-                            manufacture_month = month_num
-                            break
-                
-                # Calculate precise age in years and months
-                from dateutil.relativedelta import relativedelta
-                manufacture_dt = datetime(manufacture_year, manufacture_month, 1)
-                current_dt = datetime.now()
-                age_delta = relativedelta(current_dt, manufacture_dt)
-                
-                years = age_delta.years
-                months = age_delta.months
-                
-                # Sanity check (equipment shouldn't be more than 50 years old or in the future)
-                if 0 <= years <= 50:
-                    # Format age string
-                    if years > 0 and months > 0:
-                        estimated_age = f"{years} years {months} months"
-                    elif years > 0:
-                        estimated_age = f"{years} years"
-                    elif months > 0:
-                        estimated_age = f"{months} months"
-                    else:
-                        estimated_age = "Less than 1 month"
-                    
-                    # Calculate warranty (assuming 10-year standard warranty)
-                    # Calculate warranty end date
-                    warranty_end_dt = manufacture_dt + relativedelta(years=10)
-                    warranty_remaining = relativedelta(warranty_end_dt, current_dt)
-                    
-                    remaining_years = warranty_remaining.years
-                    remaining_months = warranty_remaining.months
-                    
-                    # Check if warranty has expired
-                    if warranty_end_dt < current_dt:
-                        warranty_status = "Expired"
-                    else:
-                        # Format warranty remaining string
-                        if remaining_years > 0 and remaining_months > 0:
-                            warranty_status = f"Active ({remaining_years} years {remaining_months} months remaining)"
-                        elif remaining_years > 0:
-                            warranty_status = f"Active ({remaining_years} years remaining)"
-                        elif remaining_months > 0:
-                            warranty_status = f"Active ({remaining_months} months remaining)"
-                        else:
-                            warranty_status = "Active (less than 1 month remaining)"
-                else:
-                    estimated_age = None
-                    warranty_status = "Unable to determine - Manual verification needed"
-            else:
-                warranty_status = "Unable to determine - Manual verification needed"
-        
-        return DataPlateOCRResponse(
-            brand=data.get("brand", "Not found"),
-            model_number=data.get("model_number", "Not found"),
-            serial_number=data.get("serial_number", "Not found"),
-            date_of_manufacture=manufacture_date,
-            estimated_age=estimated_age,
-            warranty_status=warranty_status,
-            rla=data.get("rla", "Not found") if data.get("rla") != "Not found" else None,
-            lra=data.get("lra", "Not found") if data.get("lra") != "Not found" else None
-        )
+        return await scan_data_plate_image(request, user["sub"])
         
+    except QueueTimeout as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except VisionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except OcrResponseError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         logging.error(f"OCR Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
 
+@api_router.post("/serial/decode", response_model=SerialDecodeResponse)
+async def decode_serial_number(request: SerialDecodeRequest):
+    """Age and warranty straight from brand + serial number, no vision call"""
+    return SerialDecodeResponse(**asdict(decode_serial(request.brand, request.serial_number)))
+
+# OCR scan kinds shared by background jobs and batches: kind -> request model, handler
+OCR_REQUESTS = {
+    "data_plate": DataPlateOCRRequest,
+    "warranty": WarrantyOCRRequest,
+}
+
+async def run_data_plate_job(image_base64: str, params: dict, owner_id: str) -> dict:
+    result = await scan_data_plate_image(DataPlateOCRRequest(image_base64=image_base64, **params), owner_id)
+    return result.model_dump()
+
+async def run_warranty_job(image_base64: str, params: dict, owner_id: str) -> dict:
+    result = await scan_warranty_image(WarrantyOCRRequest(image_base64=image_base64, **params), owner_id)
+    return result.model_dump()
+
+OCR_HANDLERS = {
+    "data_plate": run_data_plate_job,
+    "warranty": run_warranty_job,
+}
+
+def validate_ocr_scan(scan: OcrJobCreate) -> tuple[dict, Optional[bytes]]:
+    """Check a scan's kind, params and image; returns (cleaned params, decoded image bytes or None for photo_id)"""
+    request_model = OCR_REQUESTS.get(scan.kind)
+    if request_model is None:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(OCR_REQUESTS)}")
+    if "image_base64" in scan.params:
+        raise HTTPException(status_code=400, detail="Send the image as image_base64 or photo_id, not in params")
+    try:
+        params = request_model(image_base64="", **scan.params).model_dump(exclude={"image_base64"})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    
+    image = None
+    if scan.image_base64:
+        try:
+            image, _ = decode_photo_value(scan.image_base64)
+        except InvalidPhoto as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif not scan.photo_id:
+        raise HTTPException(status_code=400, detail="image_base64 or photo_id is required")
+    elif not is_photo_hash(scan.photo_id):
+        raise HTTPException(status_code=400, detail="Invalid photo id")
+    return params, image
+
+# Background OCR jobs (see ocr_jobs.py); uploaded scan images live in their own bucket
+ocr_jobs = OcrJobs(db, photo_store, create_photo_store(db, bucket_name="ocr_images"), OCR_HANDLERS)
+
+@api_router.post("/ocr/jobs", status_code=202)
+async def create_ocr_job(job: OcrJobCreate, user: dict = Depends(get_current_user)):
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can scan equipment")
+    
+    params, image = validate_ocr_scan(job)
+    try:
+        created = await ocr_jobs.submit(user["sub"], job.kind, params, image=image, photo_id=job.photo_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    # For following the job over /events?stream_token=
+    return {**created, "stream_token": create_stream_token(user, created["job_id"])}
+
+@api_router.get("/ocr/jobs/{job_id}")
+async def get_ocr_job(job_id: str, user: dict = Depends(get_current_user)):
+    try:
+        return await ocr_jobs.get(job_id, user["sub"])
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+
+@api_router.get("/ocr/jobs/{job_id}/events")
+async def stream_ocr_job(job_id: str, user: dict = Depends(get_stream_user)):
+    """Server-Sent Events: one event per status change, named after the status, until the job finishes"""
+    try:
+        await ocr_jobs.get(job_id, user["sub"])
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    
+    async def events():
+        async for job in ocr_jobs.watch(job_id, user["sub"]):
+            if job is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.post("/ocr/batch")
+async def scan_batch(batch: OcrBatchRequest, user: dict = Depends(get_current_user)):
+    """
+    Scan several images at once (e.g. both data plates and the warranty screenshot).
+    Streams one NDJSON line per image as each finishes, so the whole batch takes
+    about as long as its slowest scan.
+    """
+    if user.get("type") != "technician":
+        raise HTTPException(status_code=403, detail="Only technicians can scan equipment")
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="No images to scan")
+    if len(batch.items) > OCR_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {OCR_BATCH_MAX_ITEMS} images per batch")
+    
+    # Validate everything up front so a bad item fails the request before anything streams
+    scans = []
+    for item in batch.items:
+        params, _ = validate_ocr_scan(item)
+        if not item.image_base64 and not await photo_store.exists(item.photo_id):
+            raise HTTPException(status_code=404, detail=f"Photo {item.photo_id} not found")
+        scans.append((item, params))
+    
+    async def run_scan(index: int, item: OcrBatchItem, params: dict) -> dict:
+        line = {"index": index, "id": item.id, "kind": item.kind}
+        try:
+            image_base64 = item.image_base64
+            if not image_base64:
+                data, _ = await photo_store.read(item.photo_id)
+                image_base64 = base64.b64encode(data).decode()
+            # Each scan still goes through the cache and the global OCR limiter
+            line.update(ok=True, result=await OCR_HANDLERS[item.kind](image_base64, params, user["sub"]))
+        except (QueueTimeout, CircuitOpen) as e:
+            line.update(ok=False, error=str(e), retry_after=e.retry_after)
+        except Exception as e:
+            logging.error(f"Batch OCR Error ({item.kind}): {str(e)}")
+            line.update(ok=False, error=f"OCR processing failed: {str(e)}")
+        return line
+    
+    async def results():
+        tasks = [asyncio.create_task(run_scan(index, item, params)) for index, (item, params) in enumerate(scans)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # Client went away: don't keep paying for scans nobody will read
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware, compressor=compressor)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 logging.basicConfig(
@@ -1461,6 +1781,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Index reconciliation failed: {str(e)}")
+
+@app.on_event("startup")
+async def backfill_customer_reports():
+    # Customers from before customer_reports still keep their history in a report_ids
+    # array; move it over before serving, since history is only read from the links.
+    # Once done this is a single empty query, and the upserts make it safe to repeat
+    try:
+        await migrate_customer_reports(db)
+    except Exception as e:
+        logger.error(f"Customer report backfill failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_image_pool():
+    # Created before any request needs it rather than lazily mid-traffic
+    get_image_pool()
+
+@app.on_event("startup")
+async def start_ocr_jobs():
+    await ocr_jobs.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await ocr_jobs.stop()
     client.close()
+    shutdown_image_pool()
+    password_executor.shutdown(wait=False)
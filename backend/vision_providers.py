@@ -0,0 +1,239 @@
+"""Vision model providers and the resilience layer in front of them.
+
+VISION_PROVIDER picks the backend: "llmchat" (default, GPT-4o through
+LlmChat) or "fake", a local canned responder for working offline and for
+exercising timeouts and failures (VISION_FAKE_LATENCY_MS,
+VISION_FAKE_FAILURE_RATE).
+
+ResilientVision wraps whichever provider is configured with:
+- a deadline per call (VISION_TIMEOUT_SECONDS), covering hedges too;
+- a circuit breaker that, after VISION_BREAKER_FAILURES consecutive failures,
+  fails fast for VISION_BREAKER_RESET_SECONDS before letting one trial call
+  through;
+- optional hedging (VISION_HEDGE=1): if a call is still running past the p95
+  of recent latencies, a second identical request is sent and whichever
+  answers first wins.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+VISION_PROVIDER = os.environ.get('VISION_PROVIDER', 'llmchat')
+VISION_TIMEOUT = float(os.environ.get('VISION_TIMEOUT_SECONDS', '45'))
+VISION_BREAKER_FAILURES = int(os.environ.get('VISION_BREAKER_FAILURES', '5'))
+VISION_BREAKER_RESET = float(os.environ.get('VISION_BREAKER_RESET_SECONDS', '30'))
+VISION_HEDGE = os.environ.get('VISION_HEDGE', '0') == '1'
+# Hedge only once there are enough latencies for a meaningful p95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+class VisionTimeout(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Vision provider is failing, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class VisionProvider:
+    name = "base"
+
+    async def complete(self, session_prefix: str, system_message: str, prompt: str, image_base64: str) -> str:
+        """Send one image and prompt, return the model's raw text reply"""
+        raise NotImplementedError
+
+
+class LlmChatProvider(VisionProvider):
+    name = "llmchat"
+
+    async def complete(self, session_prefix, system_message, prompt, image_base64):
+        # Imported here so the fake provider and the resilience layer work without the vendor SDK
+        from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+
+        api_key = os.environ.get('EMERGENT_LLM_KEY')
+        if not api_key:
+            raise RuntimeError("API key not configured")
+        chat = LlmChat(
+            api_key=api_key,
+            session_id=f"{session_prefix}-{uuid.uuid4()}",
+            system_message=system_message,
+        ).with_model("openai", "gpt-4o")
+        return await chat.send_message(UserMessage(
+            text=prompt,
+            file_contents=[ImageContent(image_base64=image_base64)],
+        ))
+
+
+class FakeVisionProvider(VisionProvider):
+    """Canned replies in the shape the prompts ask for; no network"""
+    name = "fake"
+
+    DATA_PLATE_REPLY = {
+        "brand": "LENNOX",
+        "model_number": "XC21-036-230-06",
+        "serial_number": "5823C12345",
+        "rla": "14.1",
+        "lra": "77",
+    }
+    WARRANTY_REPLY = {
+        "age": "Manufactured: 03/2023",
+        "warranty_status": "Active (6 years remaining on parts)",
+        "warranty_details": "Compressor: 10-year warranty. Parts: 10-year coverage. Labor: not included.",
+    }
+
+    def __init__(self, latency_ms: Optional[float] = None, failure_rate: Optional[float] = None):
+        self.latency = (latency_ms if latency_ms is not None
+                        else float(os.environ.get('VISION_FAKE_LATENCY_MS', '200'))) / 1000
+        self.failure_rate = (failure_rate if failure_rate is not None
+                             else float(os.environ.get('VISION_FAKE_FAILURE_RATE', '0')))
+
+    async def complete(self, session_prefix, system_message, prompt, image_base64):
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Fake provider failure")
+        reply = self.WARRANTY_REPLY if "warranty" in prompt.lower() else self.DATA_PLATE_REPLY
+        return f"```json\n{json.dumps(reply)}\n```"
+
+
+PROVIDERS = {
+    "llmchat": LlmChatProvider,
+    "fake": FakeVisionProvider,
+}
+
+
+def create_vision_provider(name: str = VISION_PROVIDER) -> VisionProvider:
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"VISION_PROVIDER must be one of: {', '.join(PROVIDERS)}")
+
+
+class ResilientVision:
+    def __init__(self, provider: VisionProvider, timeout: float = VISION_TIMEOUT,
+                 failure_threshold: int = VISION_BREAKER_FAILURES, reset_after: float = VISION_BREAKER_RESET,
+                 hedge: bool = VISION_HEDGE):
+        self.provider = provider
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.hedge = hedge
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"calls": 0, "failures": 0, "timeouts": 0, "short_circuited": 0, "hedges": 0, "hedge_wins": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def check(self) -> None:
+        """Raise CircuitOpen if calls are currently being refused"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            self.stats["short_circuited"] += 1
+            remaining = self.reset_after - (time.monotonic() - self.opened_at)
+            raise CircuitOpen(max(1, math.ceil(remaining)))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def _record_success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        if self.opened_at is not None:
+            logger.info(f"Vision provider {self.provider.name} recovered, closing circuit")
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def _record_failure(self) -> None:
+        self.stats["failures"] += 1
+        self.consecutive_failures += 1
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.error(f"Vision provider {self.provider.name} failed {self.consecutive_failures} times in a row, "
+                             f"opening circuit for {self.reset_after:.0f}s")
+            # A failed trial call re-opens it for another full period
+            self.opened_at = time.monotonic()
+
+    async def complete(self, session_prefix: str, system_message: str, prompt: str, image_base64: str) -> str:
+        self.check()
+        trial = self.state == "half_open"
+        if trial:
+            self._trial_in_flight = True
+        self.stats["calls"] += 1
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self._hedged(session_prefix, system_message, prompt, image_base64), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self._record_failure()
+            raise VisionTimeout(f"Vision provider didn't answer within {self.timeout:.0f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record_failure()
+            raise
+        finally:
+            if trial:
+                self._trial_in_flight = False
+        self._record_success(time.perf_counter() - started)
+        return response
+
+    async def _hedged(self, *args) -> str:
+        primary = asyncio.create_task(self.provider.complete(*args))
+        delay = self.hedge_delay()
+        if delay is None:
+            return await primary
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.stats["hedges"] += 1
+                tasks.add(asyncio.create_task(self.provider.complete(*args)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Also covers the primary when the hedge won or the deadline hit
+            primary.cancel()
+
+    def snapshot(self) -> dict:
+        delay = self.hedge_delay()
+        return {
+            **self.stats,
+            "provider": self.provider.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "timeout_seconds": self.timeout,
+            "hedge_after_seconds": round(delay, 3) if delay is not None else None,
+        }
@@ -1087,8 +1087,13 @@ class ACMaintenanceAPITester:
                 self.log_result("Report Edit Functionality", False, "Refrigerant status was not updated")
                 return False
             
-            # Verify version history exists
-            versions = edited_report.get('versions', [])
+            # Verify version history exists (kept in report_versions, not on the report)
+            versions_response = requests.get(f"{self.base_url}/reports/{report_id}/versions", headers=headers)
+            if versions_response.status_code != 200:
+                self.log_result("Report Edit Functionality", False, f"Failed to fetch version history: {versions_response.status_code}")
+                return False
+            
+            versions = versions_response.json()
             if len(versions) != 2:
                 self.log_result("Report Edit Functionality", False, f"Expected 2 versions, got {len(versions)}")
                 return False
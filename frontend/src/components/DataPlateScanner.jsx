@@ -1,14 +1,15 @@
-import React, { useState, useRef } from 'react';
+import React, { useState, useRef, useContext } from 'react';
 import { Button } from './ui/button';
 import { Camera, Upload, X, Loader2, CheckCircle } from 'lucide-react';
 import { toast } from 'sonner';
-import axios from 'axios';
-import { API } from '../App';
+import { API, AuthContext } from '../App';
+import { runOcrJob } from '@/lib/ocrJobs';
 
 const DataPlateScanner = ({ equipmentType, onDataExtracted }) => {
   const [scanning, setScanning] = useState(false);
   const [preview, setPreview] = useState(null);
   const fileInputRef = useRef(null);
+  const { token } = useContext(AuthContext);
 
   const handleFileSelect = async (event) => {
     const file = event.target.files[0];
@@ -34,13 +35,8 @@ const DataPlateScanner = ({ equipmentType, onDataExtracted }) => {
         const base64String = reader.result.split(',')[1]; // Remove data:image/...;base64, prefix
 
         try {
-          // Send to OCR endpoint
-          const response = await axios.post(`${API}/ocr/scan-data-plate`, {
-            image_base64: base64String,
-            equipment_type: equipmentType
-          });
-
-          const data = response.data;
+          // Queue the scan as a background job and wait for its result
+          const data = await runOcrJob(API, token, 'data_plate', base64String, { equipment_type: equipmentType });
 
           // Check if data was successfully extracted
           if (data.brand === "Not found" && data.model_number === "Not found" && data.serial_number === "Not found") {
@@ -72,7 +68,12 @@ const DataPlateScanner = ({ equipmentType, onDataExtracted }) => {
 
         } catch (error) {
           console.error('OCR Error:', error);
-          toast.error('Failed to scan data plate. Please try again.');
+          if (error.response?.status === 429) {
+            const retryAfter = error.response.headers['retry-after'];
+            toast.error(`Scanner is busy. Please try again in ${retryAfter || 'a few'} seconds.`);
+          } else {
+            toast.error('Failed to scan data plate. Please try again.');
+          }
           setPreview(null);
         } finally {
           setScanning(false);
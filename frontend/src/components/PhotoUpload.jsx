@@ -1,10 +1,16 @@
-import React, { useState } from 'react';
+import React, { useState, useContext } from 'react';
+import axios from 'axios';
 import { Button } from '@/components/ui/button';
 import { Camera, Upload, X } from 'lucide-react';
 import { toast } from 'sonner';
+import { photoSrc } from '@/lib/utils';
+import { API, AuthContext } from '../App';
+
+const MAX_CHUNK_RETRIES = 5;
 
 const PhotoUpload = ({ photos, onChange, label, maxPhotos = 5 }) => {
   const [previews, setPreviews] = useState(photos || []);
+  const { token } = useContext(AuthContext);
 
   // Function to compress and resize image
   const compressImage = (file) => {
@@ -62,6 +68,41 @@ const PhotoUpload = ({ photos, onChange, label, maxPhotos = 5 }) => {
     });
   };
 
+  // Upload through the resumable session API so a dropped connection only
+  // costs the current chunk; returns the stored photo's URL
+  const uploadPhoto = async (dataUrl) => {
+    const blob = await (await fetch(dataUrl)).blob();
+    const headers = { Authorization: `Bearer ${token}` };
+    const { data: session } = await axios.post(
+      `${API}/photos/uploads`,
+      { size: blob.size, content_type: blob.type },
+      { headers }
+    );
+    const uploadUrl = `${API}/photos/uploads/${session.upload_id}`;
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < blob.size) {
+      try {
+        const { data } = await axios.put(
+          `${uploadUrl}?offset=${offset}`,
+          blob.slice(offset, offset + session.chunk_size),
+          { headers: { ...headers, 'Content-Type': 'application/octet-stream' } }
+        );
+        offset = data.received;
+        retries = 0;
+      } catch (error) {
+        if (++retries > MAX_CHUNK_RETRIES) throw error;
+        // Resume from whatever the server actually has
+        const { data } = await axios.get(uploadUrl, { headers });
+        offset = data.received;
+      }
+    }
+
+    const { data: done } = await axios.post(`${uploadUrl}/complete`, null, { headers });
+    return done.url;
+  };
+
   const handleFileChange = async (e) => {
     const files = Array.from(e.target.files);
     
@@ -71,7 +112,7 @@ const PhotoUpload = ({ photos, onChange, label, maxPhotos = 5 }) => {
     }
 
     // Process files sequentially to avoid memory issues
-    const loadingToast = toast.loading(`Compressing ${files.length} image(s)...`);
+    const loadingToast = toast.loading(`Uploading ${files.length} image(s)...`);
     
     try {
       for (const file of files) {
@@ -81,10 +122,11 @@ const PhotoUpload = ({ photos, onChange, label, maxPhotos = 5 }) => {
           continue;
         }
 
-        // Compress the image
+        // Compress the image, then upload it on its own
         const compressedBase64 = await compressImage(file);
+        const photoUrl = await uploadPhoto(compressedBase64);
         
-        const newPreviews = [...previews, compressedBase64];
+        const newPreviews = [...previews, photoUrl];
         setPreviews(newPreviews);
         onChange(newPreviews);
       }
@@ -118,7 +160,7 @@ const PhotoUpload = ({ photos, onChange, label, maxPhotos = 5 }) => {
           {previews.map((photo, index) => (
             <div key={index} className="relative group">
               <img
-                src={photo}
+                src={photoSrc(photo, 'thumb')}
                 alt={`Preview ${index + 1}`}
                 className="w-full h-32 object-cover rounded-lg border-2 border-gray-200"
               />
@@ -1,14 +1,15 @@
-import React, { useState, useRef } from 'react';
+import React, { useState, useRef, useContext } from 'react';
 import { Button } from './ui/button';
 import { Camera, Upload, X, Loader2, CheckCircle, ExternalLink } from 'lucide-react';
 import { toast } from 'sonner';
-import axios from 'axios';
-import { API } from '../App';
+import { API, AuthContext } from '../App';
+import { runOcrJob } from '@/lib/ocrJobs';
 
 const WarrantyScanner = ({ brand, serialNumber, onWarrantyExtracted }) => {
   const [scanning, setScanning] = useState(false);
   const [preview, setPreview] = useState(null);
   const fileInputRef = useRef(null);
+  const { token } = useContext(AuthContext);
 
   // Manufacturer warranty lookup URLs
   const warrantyLookupUrls = {
@@ -56,14 +57,8 @@ const WarrantyScanner = ({ brand, serialNumber, onWarrantyExtracted }) => {
         const base64String = reader.result.split(',')[1]; // Remove data:image/...;base64, prefix
 
         try {
-          // Send to warranty OCR endpoint
-          const response = await axios.post(`${API}/ocr/scan-warranty`, {
-            image_base64: base64String,
-            brand: brand,
-            serial_number: serialNumber
-          });
-
-          const data = response.data;
+          // Queue the scan as a background job and wait for its result
+          const data = await runOcrJob(API, token, 'warranty', base64String, { brand: brand, serial_number: serialNumber });
 
           // Check if data was successfully extracted
           if (!data.warranty_details || data.warranty_details === "Not found") {
@@ -90,7 +85,12 @@ const WarrantyScanner = ({ brand, serialNumber, onWarrantyExtracted }) => {
 
         } catch (error) {
           console.error('Warranty OCR Error:', error);
-          toast.error('Failed to extract warranty info. Please try again.');
+          if (error.response?.status === 429) {
+            const retryAfter = error.response.headers['retry-after'];
+            toast.error(`Scanner is busy. Please try again in ${retryAfter || 'a few'} seconds.`);
+          } else {
+            toast.error('Failed to extract warranty info. Please try again.');
+          }
           setPreview(null);
         } finally {
           setScanning(false);
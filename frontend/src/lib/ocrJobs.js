@@ -0,0 +1,81 @@
+import axios from 'axios';
+
+const POLL_INTERVAL_MS = 1500;
+const MAX_WAIT_MS = 3 * 60 * 1000;
+
+// Submit an OCR job and resolve with its result once it finishes. Follows the
+// job over Server-Sent Events and falls back to polling if the stream drops
+// (flaky mobile connections), so a lost connection never loses the scan.
+export async function runOcrJob(api, token, kind, imageBase64, params) {
+  const headers = { Authorization: `Bearer ${token}` };
+  const { data: job } = await axios.post(`${api}/ocr/jobs`, {
+    kind,
+    image_base64: imageBase64,
+    params,
+  }, { headers });
+
+  const finished = await followJob(api, token, job);
+  if (finished.status === 'failed') {
+    throw new Error(finished.error || 'OCR job failed');
+  }
+  return finished.result;
+}
+
+function followJob(api, token, { job_id: jobId, stream_token: streamToken }) {
+  return new Promise((resolve, reject) => {
+    const deadline = Date.now() + MAX_WAIT_MS;
+    let settled = false;
+    let source = null;
+
+    const settle = (job) => {
+      if (settled) return;
+      settled = true;
+      if (source) source.close();
+      resolve(job);
+    };
+
+    const poll = async () => {
+      while (!settled) {
+        if (Date.now() > deadline) {
+          settled = true;
+          reject(new Error('Timed out waiting for OCR result'));
+          return;
+        }
+        try {
+          const { data: job } = await axios.get(`${api}/ocr/jobs/${jobId}`, {
+            headers: { Authorization: `Bearer ${token}` }
+          });
+          if (job.status === 'complete' || job.status === 'failed') {
+            settle(job);
+            return;
+          }
+        } catch (error) {
+          if (error.response?.status === 404) {
+            settled = true;
+            reject(error);
+            return;
+          }
+          // Network blip: keep polling until the deadline
+        }
+        await new Promise((r) => setTimeout(r, POLL_INTERVAL_MS));
+      }
+    };
+
+    if (typeof EventSource === 'undefined') {
+      poll();
+      return;
+    }
+
+    // EventSource can't send the Authorization header; the job's own short-lived
+    // stream token goes in the URL instead of the login token
+    source = new EventSource(`${api}/ocr/jobs/${jobId}/events?stream_token=${encodeURIComponent(streamToken)}`);
+    const onDone = (event) => settle(JSON.parse(event.data));
+    source.addEventListener('complete', onDone);
+    source.addEventListener('failed', onDone);
+    source.onerror = () => {
+      source.close();
+      source = null;
+      poll();
+    };
+  });
+}
@@ -4,3 +4,14 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Stored report photos come back from the API as "/api/photos/<hash>" paths;
+// point them at the backend origin, optionally at a smaller server-side
+// rendition ("thumb" or "medium"). Data URLs (unsaved uploads) pass through.
+export function photoSrc(photo, rendition) {
+  if (typeof photo === "string" && photo.startsWith("/api/")) {
+    const path = rendition ? `${photo}/${rendition}` : photo;
+    return `${process.env.REACT_APP_BACKEND_URL}${path}`;
+  }
+  return photo;
+}
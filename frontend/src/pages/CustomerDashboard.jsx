@@ -11,6 +11,8 @@ const CustomerDashboard = () => {
   const { user, token, logout } = useContext(AuthContext);
   const [reports, setReports] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (!user || !token) {
@@ -20,12 +22,15 @@ const CustomerDashboard = () => {
     fetchReports();
   }, [user, token, navigate]);
 
-  const fetchReports = async () => {
+  // Newest first, one page at a time; older pages load on "Load more"
+  const fetchReports = async (cursor = null) => {
     try {
       const response = await axios.get(`${API}/customer/reports`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: { limit: 50, cursor }
       });
-      setReports(response.data);
+      setReports(prev => cursor ? [...prev, ...response.data.reports] : response.data.reports);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to load reports');
     } finally {
@@ -33,6 +38,12 @@ const CustomerDashboard = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchReports(nextCursor);
+    setLoadingMore(false);
+  };
+
   const handleLogout = () => {
     logout();
     navigate('/');
@@ -154,6 +165,18 @@ const CustomerDashboard = () => {
                   </div>
                 );
               })}
+              {nextCursor && (
+                <div className="text-center">
+                  <Button
+                    variant="outline"
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    data-testid="load-more-reports-btn"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more reports'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -165,7 +188,7 @@ const CustomerDashboard = () => {
             <div className="grid sm:grid-cols-3 gap-4">
               <div className="p-4 rounded-lg bg-gradient-to-br from-blue-50 to-cyan-50">
                 <p className="text-sm text-blue-700 mb-1">Total Inspections</p>
-                <p className="text-3xl font-bold text-blue-900">{reports.length}</p>
+                <p className="text-3xl font-bold text-blue-900">{reports.length}{nextCursor ? '+' : ''}</p>
               </div>
               <div className="p-4 rounded-lg bg-gradient-to-br from-green-50 to-blue-50">
                 <p className="text-sm text-blue-700 mb-1">Latest Health Score</p>
@@ -1,4 +1,4 @@
-import React, { useState, useContext, useEffect } from 'react';
+import React, { useState, useContext, useEffect, useRef } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
 import axios from 'axios';
 import { Button } from '@/components/ui/button';
@@ -21,6 +21,7 @@ const EditReport = () => {
   const [loading, setLoading] = useState(true);
   const [loadingSubmit, setLoadingSubmit] = useState(false);
   const [editInfo, setEditInfo] = useState(null);
+  const initialPayload = useRef({});
   const [formData, setFormData] = useState({
     customer_name: '',
     customer_email: '',
@@ -100,7 +101,7 @@ const EditReport = () => {
       });
       
       // Pre-fill form with existing data
-      setFormData({
+      const initialData = {
         customer_name: report.customer_name || '',
         customer_email: report.customer_email || '',
         customer_phone: report.customer_phone || '',
@@ -157,7 +158,10 @@ const EditReport = () => {
         general_photos: report.general_photos || [],
         notes: report.notes || '',
         other_repair_recommendations: report.other_repair_recommendations || ''
-      });
+      };
+      setFormData(initialData);
+      // What the form held on load, so submit can send only what changed
+      initialPayload.current = buildPayload(initialData);
       
       setLoading(false);
     } catch (error) {
@@ -166,6 +170,22 @@ const EditReport = () => {
     }
   };
 
+  const buildPayload = (data) => ({
+    ...data,
+    superheat: parseFloat(data.superheat),
+    subcooling: parseFloat(data.subcooling),
+    blower_motor_capacitor_rating: data.blower_motor_type === 'PSC Motor' ? parseFloat(data.blower_motor_capacitor_rating) : null,
+    blower_motor_capacitor_reading: data.blower_motor_type === 'PSC Motor' ? parseFloat(data.blower_motor_capacitor_reading) : null,
+    condenser_capacitor_herm_rating: parseFloat(data.condenser_capacitor_herm_rating),
+    condenser_capacitor_herm_reading: parseFloat(data.condenser_capacitor_herm_reading),
+    condenser_capacitor_fan_rating: parseFloat(data.condenser_capacitor_fan_rating),
+    condenser_capacitor_fan_reading: parseFloat(data.condenser_capacitor_fan_reading),
+    return_temp: parseFloat(data.return_temp),
+    supply_temp: parseFloat(data.supply_temp),
+    evaporator_age: data.evaporator_age || "",
+    condenser_age: data.condenser_age || ""
+  });
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -178,23 +198,16 @@ const EditReport = () => {
     setLoadingSubmit(true);
 
     try {
-      const payload = {
-        ...formData,
-        superheat: parseFloat(formData.superheat),
-        subcooling: parseFloat(formData.subcooling),
-        blower_motor_capacitor_rating: formData.blower_motor_type === 'PSC Motor' ? parseFloat(formData.blower_motor_capacitor_rating) : null,
-        blower_motor_capacitor_reading: formData.blower_motor_type === 'PSC Motor' ? parseFloat(formData.blower_motor_capacitor_reading) : null,
-        condenser_capacitor_herm_rating: parseFloat(formData.condenser_capacitor_herm_rating),
-        condenser_capacitor_herm_reading: parseFloat(formData.condenser_capacitor_herm_reading),
-        condenser_capacitor_fan_rating: parseFloat(formData.condenser_capacitor_fan_rating),
-        condenser_capacitor_fan_reading: parseFloat(formData.condenser_capacitor_fan_reading),
-        return_temp: parseFloat(formData.return_temp),
-        supply_temp: parseFloat(formData.supply_temp),
-        evaporator_age: formData.evaporator_age || "",
-        condenser_age: formData.condenser_age || ""
-      };
+      const payload = buildPayload(formData);
+      const changes = Object.fromEntries(
+        Object.entries(payload).filter(([key, value]) => JSON.stringify(value) !== JSON.stringify(initialPayload.current[key]))
+      );
+      if (Object.keys(changes).length === 0) {
+        toast.info('No changes to save');
+        return;
+      }
 
-      const response = await axios.put(`${API}/reports/${reportId}/edit`, payload, {
+      const response = await axios.patch(`${API}/reports/${reportId}`, changes, {
         headers: { Authorization: `Bearer ${token}` }
       });
 
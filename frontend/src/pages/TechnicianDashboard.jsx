@@ -14,22 +14,50 @@ const TechnicianDashboard = () => {
   const [viewFilter, setViewFilter] = useState('all'); // 'all', 'active', 'archived'
   const [searchQuery, setSearchQuery] = useState('');
   const [dateFilter, setDateFilter] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (!user || !token) {
       navigate('/technician/login');
-      return;
     }
-    fetchReports();
   }, [user, token, navigate]);
 
-  const fetchReports = async () => {
+  // Filters are applied by the API so they cover every report, not just the
+  // pages loaded so far; typing in the search box waits for a pause
+  useEffect(() => {
+    if (!user || !token) return;
+    const timer = setTimeout(() => fetchReports(), searchQuery ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [user, token, viewFilter, searchQuery, dateFilter]);
+
+  const filterParams = () => {
+    const params = { q: searchQuery.trim() || undefined };
+    if (viewFilter === 'all') {
+      params.include_archived = true;
+    } else {
+      params.archived = viewFilter === 'archived';
+    }
+    if (dateFilter) {
+      // The picked day in the browser's time zone
+      const start = new Date(`${dateFilter}T00:00:00`);
+      const end = new Date(start);
+      end.setDate(end.getDate() + 1);
+      params.created_from = start.toISOString();
+      params.created_to = end.toISOString();
+    }
+    return params;
+  };
+
+  // Summaries one page at a time; older pages load on "Load more"
+  const fetchReports = async (cursor = null) => {
     try {
-      // Always fetch all reports (both active and archived)
-      const response = await axios.get(`${API}/reports?include_archived=true`, {
-        headers: { Authorization: `Bearer ${token}` }
+      const response = await axios.get(`${API}/reports`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { ...filterParams(), view: 'summary', limit: 200, cursor }
       });
-      setReports(response.data);
+      setReports(prev => cursor ? [...prev, ...response.data.reports] : response.data.reports);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to load reports');
     } finally {
@@ -37,6 +65,12 @@ const TechnicianDashboard = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchReports(nextCursor);
+    setLoadingMore(false);
+  };
+
   const toggleArchive = async (reportId, currentArchiveStatus) => {
     try {
       const response = await axios.put(
@@ -51,26 +85,7 @@ const TechnicianDashboard = () => {
     }
   };
 
-  // Filter reports based on view filter, search, and date
-  const filteredReports = reports.filter(report => {
-    // Filter by view selection
-    let matchesViewFilter = true;
-    if (viewFilter === 'active') {
-      matchesViewFilter = report.archived !== true;
-    } else if (viewFilter === 'archived') {
-      matchesViewFilter = report.archived === true;
-    }
-    // 'all' shows everything, so no filter needed
-    
-    const matchesSearch = !searchQuery || 
-      report.customer_name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      report.customer_email.toLowerCase().includes(searchQuery.toLowerCase());
-    
-    const matchesDate = !dateFilter || 
-      new Date(report.created_at).toLocaleDateString() === new Date(dateFilter).toLocaleDateString();
-    
-    return matchesViewFilter && matchesSearch && matchesDate;
-  });
+  const filtersActive = viewFilter !== 'all' || searchQuery || dateFilter;
 
   const copyLink = async (uniqueLink) => {
     const link = `${window.location.origin}/report/${uniqueLink}`;
@@ -191,7 +206,7 @@ const TechnicianDashboard = () => {
             {(searchQuery || dateFilter) && (
               <div className="mt-3 flex items-center gap-2">
                 <span className="text-sm text-gray-600">
-                  Showing {filteredReports.length} of {reports.length} reports
+                  Showing {reports.length}{nextCursor ? '+' : ''} matching reports
                 </span>
                 <Button
                   variant="ghost"
@@ -212,15 +227,15 @@ const TechnicianDashboard = () => {
             <div className="glass rounded-xl p-8 text-center">
               <p className="text-blue-700">Loading reports...</p>
             </div>
-          ) : filteredReports.length === 0 ? (
+          ) : reports.length === 0 ? (
             <div className="glass rounded-xl p-8 text-center">
               <FileText className="w-16 h-16 text-blue-300 mx-auto mb-4" />
               <p className="text-blue-700 mb-4">
-                {reports.length === 0 
+                {!filtersActive
                   ? "No reports yet. Create your first report to get started!" 
                   : "No reports match your search criteria."}
               </p>
-              {reports.length === 0 && (
+              {!filtersActive && (
                 <Button
                   onClick={() => navigate('/technician/create-report')}
                   className="bg-blue-600 hover:bg-blue-700 text-white"
@@ -232,7 +247,7 @@ const TechnicianDashboard = () => {
             </div>
           ) : (
             <div className="grid gap-4">
-              {filteredReports.map((report) => (
+              {reports.map((report) => (
                 <div key={report.id} className="glass rounded-xl p-4 hover:shadow-lg transition-shadow" data-testid={`report-${report.id}`}>
                   <div className="flex justify-between items-center gap-4">
                     <div className="flex items-center gap-4 flex-1 min-w-0">
@@ -300,6 +315,18 @@ const TechnicianDashboard = () => {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <div className="text-center">
+                  <Button
+                    variant="outline"
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    data-testid="load-more-reports-btn"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more reports'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </div>
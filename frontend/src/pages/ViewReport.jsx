@@ -7,6 +7,7 @@ import { toast } from 'sonner';
 import { API } from '../App';
 import PerformanceGauge from '@/components/PerformanceGauge';
 import MetricInfoModal from '@/components/MetricInfoModal';
+import { photoSrc } from '@/lib/utils';
 
 const ViewReport = () => {
   const { uniqueLink } = useParams();
@@ -18,6 +19,7 @@ const ViewReport = () => {
   const [metricModalOpen, setMetricModalOpen] = useState(false);
   const [selectedVersion, setSelectedVersion] = useState(null);
   const [displayData, setDisplayData] = useState(null);
+  const [versions, setVersions] = useState([]);
   const [photoModalOpen, setPhotoModalOpen] = useState(false);
   const [selectedPhotos, setSelectedPhotos] = useState([]);
   const [photoModalTitle, setPhotoModalTitle] = useState('');
@@ -48,6 +50,9 @@ const ViewReport = () => {
       // Set initial version - show current version by default
       setSelectedVersion(response.data.current_version || 1);
       setDisplayData(response.data);
+      if (response.data.current_version > 1) {
+        fetchVersions();
+      }
     } catch (error) {
       toast.error('Report not found');
     } finally {
@@ -55,6 +60,17 @@ const ViewReport = () => {
     }
   };
 
+  // Version list only; each version's data is fetched when it's selected.
+  // Read through the share link, like the report itself
+  const fetchVersions = async () => {
+    try {
+      const response = await axios.get(`${API}/reports/view/${uniqueLink}/versions`);
+      setVersions(response.data);
+    } catch (error) {
+      console.error('Failed to load version history');
+    }
+  };
+
   const fetchParts = async () => {
     try {
       const response = await axios.get(`${API}/parts`);
@@ -95,32 +111,31 @@ const ViewReport = () => {
     return null;
   };
 
-  const handleVersionChange = (version) => {
+  const handleVersionChange = async (version) => {
     setSelectedVersion(version);
     
     if (!report) return;
     
     // If selecting current version, use the main report data
-    if (version === report.current_version || !report.versions || report.versions.length === 0) {
+    if (version === report.current_version || versions.length === 0) {
       setDisplayData(report);
     } else {
-      // Find the version data from versions array
-      const versionData = report.versions.find(v => v.version === version);
-      if (versionData && versionData.data) {
+      try {
+        const { data: versionData } = await axios.get(`${API}/reports/view/${uniqueLink}/versions/${version}`);
         // Merge version data with current report to fill in missing fields (like photos, system info)
         // This ensures UI doesn't break when viewing older versions with limited data
         setDisplayData({
           ...report,  // Start with current report (has all fields including photos)
           ...versionData.data  // Override with version-specific data (metrics, status)
         });
+      } catch (error) {
+        toast.error('Failed to load this version');
       }
     }
   };
 
   const getVersionLabel = (versionNum) => {
-    if (!report || !report.versions) return `Version ${versionNum}`;
-    
-    const versionData = report.versions.find(v => v.version === versionNum);
+    const versionData = versions.find(v => v.version === versionNum);
     return versionData ? versionData.label : `Version ${versionNum}`;
   };
 
@@ -267,23 +282,23 @@ const ViewReport = () => {
         </div>
 
         {/* Version Selector */}
-        {report.versions && report.versions.length > 0 && (
+        {versions.length > 0 && (
           <div className="bg-white rounded-lg shadow-sm p-3 mb-4 border" style={{borderColor: '#e5e7eb'}}>
             <div className="flex flex-col sm:flex-row items-start sm:items-center justify-between gap-2">
               <div className="flex items-center gap-2">
                 <Calendar className="w-4 h-4" style={{color: '#1C325E'}} />
                 <span className="text-xs font-medium" style={{color: '#1C325E'}}>Version:</span>
                 <span className="text-xs text-gray-600">
-                  {report.versions.find(v => v.version === selectedVersion)?.timestamp 
-                    ? new Date(report.versions.find(v => v.version === selectedVersion)?.timestamp).toLocaleDateString()
+                  {versions.find(v => v.version === selectedVersion)?.timestamp 
+                    ? new Date(versions.find(v => v.version === selectedVersion)?.timestamp).toLocaleDateString()
                     : new Date(report.created_at).toLocaleDateString()
                   }
                 </span>
               </div>
               <div className="flex flex-wrap gap-1">
-                {[...Array(Math.max(report.current_version || 1, report.versions.length))].map((_, i) => {
+                {[...Array(Math.max(report.current_version || 1, versions.length))].map((_, i) => {
                   const versionNum = i + 1;
-                  const versionExists = versionNum === 1 || report.versions.some(v => v.version === versionNum);
+                  const versionExists = versionNum === 1 || versions.some(v => v.version === versionNum);
                   if (!versionExists) return null;
                   
                   return (
@@ -1238,7 +1253,7 @@ const ViewReport = () => {
                   onClick={() => setEnlargedPhotoIndex(index)}
                 >
                   <img 
-                    src={photo} 
+                    src={photoSrc(photo, 'medium')} 
                     alt={`${photoModalTitle} ${index + 1}`}
                     className="w-full h-64 object-cover hover:opacity-90 transition-opacity"
                   />
@@ -1285,7 +1300,7 @@ const ViewReport = () => {
           {/* Image */}
           <div className="max-w-[90vw] max-h-[90vh] flex flex-col items-center" onClick={(e) => e.stopPropagation()}>
             <img 
-              src={selectedPhotos[enlargedPhotoIndex]} 
+              src={photoSrc(selectedPhotos[enlargedPhotoIndex])} 
               alt={`${photoModalTitle} ${enlargedPhotoIndex + 1}`}
               className="max-w-full max-h-[85vh] object-contain rounded-lg shadow-2xl"
             />
@@ -0,0 +1,68 @@
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+import pytest
+from PIL import Image
+
+# The backend modules import each other as top-level modules (see server.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def inline_image_pool(monkeypatch):
+    """Run image work in-process instead of in the spawn pool"""
+    import photo_store
+
+    async def run_inline(func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(photo_store, "run_in_image_pool", run_inline)
+
+
+@pytest.fixture
+def jpeg_bytes():
+    out = BytesIO()
+    Image.new("RGB", (64, 48), (200, 80, 40)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    """server.py wired to an in-memory database and local photo stores"""
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:27017")  # never connected to
+    monkeypatch.setenv("DB_NAME", "test")
+    monkeypatch.setenv("PHOTO_STORE", "local")
+    monkeypatch.setenv("PHOTO_STORE_PATH", str(tmp_path / "photos"))
+    import server
+    from ocr import OcrCache
+    from ocr_jobs import OcrJobs
+    from photo_store import LocalPhotoStore
+    from photo_uploads import PhotoUploads
+    from report_cache import ReportViewCache
+    from tests.fake_mongo import FakeDatabase
+
+    db = FakeDatabase()
+    store = LocalPhotoStore(tmp_path / "photos")
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "photo_store", store)
+    monkeypatch.setattr(server, "photo_uploads", PhotoUploads(db, store, tmp_path / "uploads"))
+    monkeypatch.setattr(server, "ocr_cache", OcrCache(db))
+    monkeypatch.setattr(server, "ocr_jobs", OcrJobs(db, store, LocalPhotoStore(tmp_path / "ocr_images"),
+                                                    server.OCR_HANDLERS))
+    monkeypatch.setattr(server, "report_view_cache", ReportViewCache())
+    return server
+
+
+@pytest.fixture
+async def client(server):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
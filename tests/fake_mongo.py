@@ -0,0 +1,588 @@
+"""In-memory stand-in for the slice of the Motor API the backend uses.
+
+Enough of MongoDB's query, update, projection and aggregation language to
+run the backend's own queries against plain dicts, so tests don't need a
+mongod. Unsupported operators raise NotImplementedError rather than being
+silently ignored.
+"""
+import copy
+import re
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+
+
+# ---- Paths and expressions --------------------------------------------------
+
+def get_path(doc, path, default=_MISSING):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        elif isinstance(value, list):
+            # Paths through an array of subdocuments collect the field from each
+            value = [item[part] for item in value if isinstance(item, dict) and part in item]
+        else:
+            return default
+    return value
+
+
+def set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def unset_path(doc, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def evaluate(expr, doc, variables=None):
+    """Aggregation expression: field paths, $$variables, literals and a few operators"""
+    variables = variables or {}
+    if isinstance(expr, str) and expr.startswith("$$"):
+        name, _, rest = expr[2:].partition(".")
+        value = variables[name]
+        return get_path(value, rest, None) if rest else value
+    if isinstance(expr, str) and expr.startswith("$"):
+        return get_path(doc, expr[1:], None)
+    if isinstance(expr, list):
+        return [evaluate(item, doc, variables) for item in expr]
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)).startswith("$"):
+        op, arg = next(iter(expr.items()))
+        if op == "$literal":
+            return arg
+        args = evaluate(arg, doc, variables)
+        if op == "$add":
+            return sum(args)
+        if op == "$ifNull":
+            return next((value for value in args if value is not None), None)
+        if op == "$size":
+            return len(args)
+        if op == "$sum":
+            return sum(value for value in (args if isinstance(args, list) else [args]) if isinstance(value, (int, float)))
+        if op == "$eq":
+            return args[0] == args[1]
+        raise NotImplementedError(op)
+    if isinstance(expr, dict):
+        return {key: evaluate(value, doc, variables) for key, value in expr.items()}
+    return expr
+
+
+# ---- Queries ----------------------------------------------------------------
+
+def _compare(op, value, target):
+    if op == "$eq":
+        return _equals(value, target)
+    if op == "$ne":
+        return not _equals(value, target)
+    if op == "$in":
+        return any(_equals(value, item) for item in target)
+    if op == "$nin":
+        return not any(_equals(value, item) for item in target)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(target)
+    if op == "$regex":
+        return isinstance(value, str) and re.search(target, value) is not None
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        candidates = value if isinstance(value, list) else [value]
+        for candidate in candidates:
+            if candidate is _MISSING or candidate is None:
+                continue
+            try:
+                if ((op == "$gt" and candidate > target) or (op == "$gte" and candidate >= target)
+                        or (op == "$lt" and candidate < target) or (op == "$lte" and candidate <= target)):
+                    return True
+            except TypeError:
+                continue
+        return False
+    if op == "$elemMatch":
+        if not isinstance(value, list):
+            return False
+        if any(key.startswith("$") for key in target):
+            return any(_field_matches(item, target) for item in value)
+        return any(isinstance(item, dict) and matches(item, target) for item in value)
+    raise NotImplementedError(op)
+
+
+def _equals(value, target):
+    if value is _MISSING:
+        return target is None
+    if isinstance(value, list) and not isinstance(target, list):
+        return target in value
+    return value == target
+
+
+def _field_matches(value, condition):
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        if "$options" in condition:
+            flags = re.IGNORECASE if "i" in condition["$options"] else 0
+            condition = {**condition, "$regex": re.compile(condition["$regex"], flags)}
+        return all(_compare(op, value, target) for op, target in condition.items() if op != "$options")
+    if isinstance(condition, re.Pattern):
+        return isinstance(value, str) and condition.search(value) is not None
+    return _equals(value, condition)
+
+
+def matches(doc, query, variables=None):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub, variables) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub, variables) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub, variables) for sub in condition):
+                return False
+        elif key == "$expr":
+            if not evaluate(condition, doc, variables):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(key)
+        elif not _field_matches(get_path(doc, key), condition):
+            return False
+    return True
+
+
+def project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    include_id = projection.get("_id", 1)
+    if all(value == 0 for value in fields.values()):
+        result = copy.deepcopy(doc)
+        for key in fields:
+            unset_path(result, key)
+    else:
+        result = {}
+        for key, value in fields.items():
+            if value == 1 or value is True:
+                found = get_path(doc, key)
+                if found is not _MISSING:
+                    set_path(result, key, copy.deepcopy(found))
+            else:
+                result[key] = evaluate(value, doc)
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _sort_key(field):
+    def key(doc):
+        value = get_path(doc, field, None)
+        return (value is not None, value)
+    return key
+
+
+def sort_docs(docs, keys):
+    for field, direction in reversed(keys):
+        docs.sort(key=_sort_key(field), reverse=direction < 0)
+    return docs
+
+
+def _sort_keys(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+# ---- Updates ----------------------------------------------------------------
+
+def apply_update(doc, update, inserting=False):
+    if isinstance(update, list):
+        for stage in update:
+            (op, arg), = stage.items()
+            if op in ("$set", "$addFields"):
+                values = {key: evaluate(value, doc) for key, value in arg.items()}
+                for key, value in values.items():
+                    set_path(doc, key, value)
+            elif op == "$unset":
+                for key in [arg] if isinstance(arg, str) else arg:
+                    unset_path(doc, key)
+            else:
+                raise NotImplementedError(op)
+        return
+    for op, fields in update.items():
+        for key, value in fields.items():
+            if op == "$set":
+                set_path(doc, key, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                if inserting:
+                    set_path(doc, key, copy.deepcopy(value))
+            elif op == "$unset":
+                unset_path(doc, key)
+            elif op == "$inc":
+                set_path(doc, key, get_path(doc, key, 0) + value)
+            elif op == "$max":
+                current = get_path(doc, key, None)
+                if current is None or value > current:
+                    set_path(doc, key, value)
+            elif op == "$min":
+                current = get_path(doc, key, None)
+                if current is None or value < current:
+                    set_path(doc, key, value)
+            elif op == "$push":
+                items = get_path(doc, key, None)
+                if items is None:
+                    items = []
+                    set_path(doc, key, items)
+                items.extend(value["$each"] if isinstance(value, dict) and "$each" in value else [value])
+            elif op == "$addToSet":
+                items = get_path(doc, key, None)
+                if items is None:
+                    items = []
+                    set_path(doc, key, items)
+                for item in value["$each"] if isinstance(value, dict) and "$each" in value else [value]:
+                    if item not in items:
+                        items.append(item)
+            elif op == "$pull":
+                items = get_path(doc, key, None)
+                if isinstance(items, list):
+                    items[:] = [item for item in items if not _field_matches(item, value)]
+            else:
+                raise NotImplementedError(op)
+
+
+def _upsert_doc(query):
+    doc = {}
+    for key, value in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(value, dict) and any(op.startswith("$") for op in value):
+            if "$eq" in value:
+                set_path(doc, key, value["$eq"])
+            continue
+        set_path(doc, key, copy.deepcopy(value))
+    return doc
+
+
+# ---- Cursors ----------------------------------------------------------------
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+        self._skip = 0
+        self._limit = 0
+        self.closed = False
+
+    def sort(self, key_or_list, direction=None):
+        sort_docs(self._docs, _sort_keys(key_or_list, direction))
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _results(self):
+        docs = self._docs[self._skip:]
+        return docs[:self._limit] if self._limit else docs
+
+    async def to_list(self, length=None):
+        docs = self._results()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results():
+            if self.closed:
+                return
+            yield doc
+
+    async def close(self):
+        self.closed = True
+
+
+# ---- Collections ------------------------------------------------------------
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.docs = []
+        self._unique = []
+
+    # Indexes only matter for uniqueness here
+    async def create_index(self, keys, unique=False, **kwargs):
+        keys = _sort_keys(keys)
+        if unique:
+            self._unique.append([field for field, _ in keys])
+        return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+    async def create_indexes(self, models):
+        return [await self.create_index(model.document["key"].items(),
+                                        unique=model.document.get("unique", False)) for model in models]
+
+    async def drop_index(self, name):
+        pass
+
+    def list_indexes(self):
+        return FakeCursor([])
+
+    def _check_unique(self, doc, ignore=None):
+        for fields in self._unique:
+            key = [get_path(doc, field, None) for field in fields]
+            for other in self.docs:
+                if other is not ignore and other is not doc and [get_path(other, f, None) for f in fields] == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key: {dict(zip(fields, key))}")
+
+    def _find(self, query):
+        return [doc for doc in self.docs if matches(doc, query or {})]
+
+    async def insert_one(self, document):
+        doc = copy.deepcopy(document)
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self.docs.append(doc)
+        document.setdefault("_id", doc["_id"])
+        return SimpleNamespace(inserted_id=doc["_id"], acknowledged=True)
+
+    async def insert_many(self, documents, ordered=True):
+        return SimpleNamespace(inserted_ids=[(await self.insert_one(doc)).inserted_id for doc in documents])
+
+    def find(self, filter=None, projection=None, sort=None, limit=0, skip=0, **kwargs):
+        cursor = FakeCursor([project(doc, projection) for doc in self._find(filter)])
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    async def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        docs = self._find(filter)
+        if sort:
+            sort_docs(docs, _sort_keys(sort))
+        return project(docs[0], projection) if docs else None
+
+    async def count_documents(self, filter, **kwargs):
+        return len(self._find(filter))
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+    async def distinct(self, key, filter=None):
+        values = []
+        for doc in self._find(filter):
+            value = get_path(doc, key, None)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not None and item not in values:
+                    values.append(item)
+        return values
+
+    def _upsert(self, query, update):
+        doc = _upsert_doc(query)
+        apply_update(doc, update, inserting=True)
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self.docs.append(doc)
+        return doc
+
+    def _update(self, doc, update):
+        before = copy.deepcopy(doc)
+        apply_update(doc, update)
+        try:
+            self._check_unique(doc)
+        except DuplicateKeyError:
+            doc.clear()
+            doc.update(before)
+            raise
+        return before != doc
+
+    async def update_one(self, filter, update, upsert=False, **kwargs):
+        docs = self._find(filter)
+        if docs:
+            modified = self._update(docs[0], update)
+            return SimpleNamespace(matched_count=1, modified_count=int(modified), upserted_id=None)
+        if upsert:
+            doc = self._upsert(filter, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, filter, update, upsert=False, **kwargs):
+        docs = self._find(filter)
+        modified = sum(self._update(doc, update) for doc in docs)
+        upserted_id = None
+        if not docs and upsert:
+            upserted_id = self._upsert(filter, update)["_id"]
+        return SimpleNamespace(matched_count=len(docs), modified_count=modified, upserted_id=upserted_id)
+
+    async def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        docs = self._find(filter)
+        if docs:
+            _id = docs[0]["_id"]
+            docs[0].clear()
+            docs[0].update(copy.deepcopy(replacement), _id=_id)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = {**copy.deepcopy(replacement), "_id": replacement.get("_id", ObjectId())}
+            self.docs.append(doc)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        docs = self._find(filter)
+        if sort:
+            sort_docs(docs, _sort_keys(sort))
+        if docs:
+            before = copy.deepcopy(docs[0])
+            self._update(docs[0], update)
+            return project(docs[0] if return_document == ReturnDocument.AFTER else before, projection)
+        if upsert:
+            doc = self._upsert(filter, update)
+            return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        docs = self._find(filter)
+        if sort:
+            sort_docs(docs, _sort_keys(sort))
+        if not docs:
+            return None
+        self.docs.remove(docs[0])
+        return project(docs[0], projection)
+
+    async def delete_one(self, filter, **kwargs):
+        docs = self._find(filter)
+        if docs:
+            self.docs.remove(docs[0])
+        return SimpleNamespace(deleted_count=len(docs[:1]))
+
+    async def delete_many(self, filter, **kwargs):
+        doomed = {id(doc) for doc in self._find(filter)}
+        self.docs = [doc for doc in self.docs if id(doc) not in doomed]
+        return SimpleNamespace(deleted_count=len(doomed))
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        result = SimpleNamespace(inserted_count=0, matched_count=0, modified_count=0, deleted_count=0,
+                                 upserted_count=0)
+        for request in requests:
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                await self.insert_one(request._doc)
+                result.inserted_count += 1
+                continue
+            if kind in ("DeleteOne", "DeleteMany"):
+                method = self.delete_one if kind == "DeleteOne" else self.delete_many
+                result.deleted_count += (await method(request._filter)).deleted_count
+                continue
+            if kind == "UpdateOne":
+                outcome = await self.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+            elif kind == "UpdateMany":
+                outcome = await self.update_many(request._filter, request._doc, upsert=bool(request._upsert))
+            elif kind == "ReplaceOne":
+                outcome = await self.replace_one(request._filter, request._doc, upsert=bool(request._upsert))
+            else:
+                raise NotImplementedError(kind)
+            result.matched_count += outcome.matched_count
+            result.modified_count += outcome.modified_count
+            result.upserted_count += outcome.upserted_id is not None
+        return result
+
+    def aggregate(self, pipeline, **kwargs):
+        return FakeCursor(self._aggregate(copy.deepcopy(self.docs), pipeline))
+
+    def _aggregate(self, docs, pipeline, variables=None):
+        for stage in pipeline:
+            (op, arg), = stage.items()
+            if op == "$match":
+                docs = [doc for doc in docs if matches(doc, arg, variables)]
+            elif op == "$sort":
+                docs = sort_docs(docs, _sort_keys(arg))
+            elif op == "$skip":
+                docs = docs[arg:]
+            elif op == "$limit":
+                docs = docs[:arg]
+            elif op == "$project":
+                docs = [project(doc, arg) for doc in docs]
+            elif op == "$lookup":
+                docs = [self._lookup(doc, arg) for doc in docs]
+            elif op == "$group":
+                docs = self._group(docs, arg, variables)
+            elif op == "$count":
+                docs = [{arg: len(docs)}] if docs else []
+            else:
+                raise NotImplementedError(op)
+        return docs
+
+    def _lookup(self, doc, spec):
+        foreign = self.database[spec["from"]]
+        if "pipeline" in spec:
+            variables = {name: evaluate(expr, doc) for name, expr in spec.get("let", {}).items()}
+            joined = foreign._aggregate(copy.deepcopy(foreign.docs), spec["pipeline"], variables)
+        else:
+            local = get_path(doc, spec["localField"], None)
+            joined = [copy.deepcopy(other) for other in foreign.docs
+                      if _equals(get_path(other, spec["foreignField"]), local)]
+        return {**doc, spec["as"]: joined}
+
+    def _group(self, docs, spec, variables):
+        groups = {}
+        for doc in docs:
+            key = evaluate(spec["_id"], doc, variables)
+            groups.setdefault(repr(key), (key, []))[1].append(doc)
+        results = []
+        for key, members in groups.values():
+            result = {"_id": key}
+            for field, accumulator in spec.items():
+                if field == "_id":
+                    continue
+                (op, expr), = accumulator.items()
+                values = [evaluate(expr, doc, variables) for doc in members]
+                numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+                if op == "$sum":
+                    result[field] = sum(numbers)
+                elif op == "$max":
+                    result[field] = max((v for v in values if v is not None), default=None)
+                elif op == "$min":
+                    result[field] = min((v for v in values if v is not None), default=None)
+                elif op == "$first":
+                    result[field] = values[0] if values else None
+                elif op == "$push":
+                    result[field] = values
+                else:
+                    raise NotImplementedError(op)
+            results.append(result)
+        return results
+
+
+class FakeDatabase:
+    def __init__(self, name="test"):
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self):
+        return list(self._collections)
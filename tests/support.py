@@ -0,0 +1,63 @@
+"""Request and document builders shared by the API tests"""
+import uuid
+from datetime import datetime, timezone
+
+from diagnostics import evaluate_report
+
+REPORT_FORM = {
+    "customer_name": "Jane Doe",
+    "customer_email": "jane@example.com",
+    "customer_phone": "555-0100",
+    "evaporator_brand": "Lennox",
+    "evaporator_model_number": "CX35",
+    "evaporator_serial_number": "5823C12345",
+    "evaporator_warranty_status": "Active",
+    "condenser_brand": "Lennox",
+    "condenser_model_number": "XC21",
+    "condenser_serial_number": "5823C54321",
+    "condenser_warranty_status": "Active",
+    "refrigerant_type": "R-410A",
+    "superheat": 10,
+    "subcooling": 8,
+    "refrigerant_status": "Good",
+    "blower_motor_type": "PSC Motor",
+    "blower_motor_capacitor_rating": 10,
+    "blower_motor_capacitor_reading": 10,
+    "condenser_capacitor_herm_rating": 40,
+    "condenser_capacitor_herm_reading": 40,
+    "condenser_capacitor_fan_rating": 5,
+    "condenser_capacitor_fan_reading": 5,
+    "return_temp": 75,
+    "supply_temp": 57,
+    "overflow_float_switch": "Working",
+    "primary_drain": "Clear",
+    "drain_pan_condition": "Good shape",
+    "air_filters": "Replaced",
+    "evaporator_coil": "Clean",
+    "condenser_coils": "Clean",
+    "air_purifier": "Good",
+    "plenums": "Good",
+    "ductwork": "Good",
+}
+
+
+def auth(server, user_id: str, user_type: str = "technician") -> dict:
+    return {"Authorization": f"Bearer {server.create_access_token({'sub': user_id, 'type': user_type})}"}
+
+
+def report_doc(technician_id: str = "tech-1", **overrides) -> dict:
+    """A stored report as create_report would have written it"""
+    form = {**REPORT_FORM, **overrides}
+    return {
+        "id": str(uuid.uuid4()),
+        "unique_link": str(uuid.uuid4()),
+        "technician_id": technician_id,
+        "technician_name": "tech",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": 1,
+        "current_version": 1,
+        "edit_count": 0,
+        "archived": False,
+        **form,
+        **evaluate_report(form).fields(),
+    }
@@ -0,0 +1,172 @@
+import gzip
+
+import pytest
+import httpx
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+import compression
+from compression import CompressionMiddleware, Compressor
+
+pytestmark = pytest.mark.anyio
+
+JSON = Headers({"content-type": "application/json"})
+BODY = b'{"reports": [' + b", ".join(b'{"id": %d, "status": "Good"}' % i for i in range(200)) + b"]}"
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    return Compressor(min_size=1024)
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip, deflate", "gzip"),
+    ("GZIP", "gzip"),
+    ("gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=bogus", None),
+    ("deflate", None),
+    ("", None),
+    ("*", "gzip"),
+    ("*, gzip;q=0", None),
+])
+def test_negotiate_gzip(gzip_only, accept, encoding):
+    assert gzip_only.negotiate(accept) == encoding
+
+
+def test_negotiate_prefers_brotli():
+    pytest.importorskip("brotli")
+    compressor = Compressor()
+    assert compressor.negotiate("gzip, br") == "br"
+    assert compressor.negotiate("gzip, br;q=0") == "gzip"
+
+
+@pytest.mark.parametrize("headers, status, size, expected", [
+    ({"content-type": "application/json"}, 200, 2048, True),
+    ({"content-type": "text/html; charset=utf-8"}, 200, 2048, True),
+    ({"content-type": "application/x-ndjson"}, 200, 2048, True),
+    ({"content-type": "application/problem+json"}, 200, 2048, True),
+    ({"content-type": "application/json"}, 200, 1023, False),
+    ({"content-type": "image/jpeg"}, 200, 2048, False),
+    ({"content-type": "application/json"}, 304, 2048, False),
+    ({"content-type": "application/json"}, 204, 2048, False),
+    ({"content-type": "application/json", "content-encoding": "gzip"}, 200, 2048, False),
+])
+def test_should_compress(gzip_only, headers, status, size, expected):
+    assert gzip_only.should_compress(Headers(headers), status, b"x" * size) is expected
+
+
+async def test_gzip_round_trip(gzip_only):
+    compressed = await gzip_only.compress("/api/reports", JSON, BODY, "gzip")
+    assert gzip.decompress(compressed) == BODY
+    assert len(compressed) < len(BODY)
+    assert gzip_only.stats["bytes_in"] == len(BODY)
+    assert gzip_only.stats["bytes_out"] == len(compressed)
+
+
+async def test_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    compressed = await Compressor().compress("/api/reports", JSON, BODY, "br")
+    assert brotli.decompress(compressed) == BODY
+
+
+async def test_large_body_round_trip(gzip_only):
+    body = BODY * (compression.THREAD_THRESHOLD // len(BODY) + 1)
+    compressed = await gzip_only.compress("/api/reports", JSON, body, "gzip")
+    assert gzip.decompress(compressed) == body
+
+
+async def test_public_etag_response_is_cached(gzip_only):
+    headers = Headers({"content-type": "application/json", "etag": '"v1"'})
+    first = await gzip_only.compress("/api/parts", headers, BODY, "gzip")
+    second = await gzip_only.compress("/api/parts", headers, BODY, "gzip")
+    assert first == second
+    assert gzip_only.stats["cache_misses"] == 1
+    assert gzip_only.stats["cache_hits"] == 1
+    assert gzip_only.stats["compressed"] == 2
+
+
+async def test_cache_key_includes_etag_path_and_query(gzip_only):
+    await gzip_only.compress("/api/parts", Headers({"content-type": "application/json", "etag": '"v1"'}),
+                             BODY, "gzip")
+    await gzip_only.compress("/api/parts", Headers({"content-type": "application/json", "etag": '"v2"'}),
+                             BODY, "gzip")
+    await gzip_only.compress("/api/other", Headers({"content-type": "application/json", "etag": '"v1"'}),
+                             BODY, "gzip")
+    await gzip_only.compress("/api/parts", Headers({"content-type": "application/json", "etag": '"v1"'}),
+                             BODY, "gzip", query=b"category=capacitor")
+    assert gzip_only.stats["cache_hits"] == 0
+    assert gzip_only.snapshot()["cache_entries"] == 4
+
+
+@pytest.mark.parametrize("headers", [
+    {"content-type": "application/json"},
+    {"content-type": "application/json", "etag": '"v1"', "cache-control": "private, no-cache"},
+    {"content-type": "application/json", "etag": '"v1"', "cache-control": "no-store"},
+])
+async def test_private_or_untagged_responses_are_not_cached(gzip_only, headers):
+    await gzip_only.compress("/api/reports", Headers(headers), BODY, "gzip")
+    await gzip_only.compress("/api/reports", Headers(headers), BODY, "gzip")
+    assert gzip_only.stats["cache_hits"] == 0
+    assert gzip_only.snapshot()["cache_entries"] == 0
+
+
+async def test_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    entry_size = len(gzip.compress(BODY, compresslevel=6, mtime=0))
+    compressor = Compressor(cache_bytes=entry_size * 2)
+    for etag in ('"1"', '"2"', '"3"'):
+        await compressor.compress("/api/parts", Headers({"content-type": "application/json", "etag": etag}),
+                                  BODY, "gzip")
+    assert compressor.stats["cache_evictions"] == 1
+    assert compressor.cache_size == entry_size * 2
+    await compressor.compress("/api/parts", Headers({"content-type": "application/json", "etag": '"1"'}),
+                              BODY, "gzip")
+    assert compressor.stats["cache_hits"] == 0
+
+
+def etag_app(compressor: Compressor) -> httpx.AsyncClient:
+    """One public route tagged by its query string, 304 on a matching If-None-Match"""
+    async def parts(request: Request):
+        body = BODY + request.url.query.encode()
+        etag = f'"{len(request.url.query)}"'
+        if etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    app = CompressionMiddleware(Starlette(routes=[Route("/api/parts", parts)]), compressor)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_compressed_reply_has_a_weak_etag(gzip_only):
+    async with etag_app(gzip_only) as client:
+        plain = await client.get("/api/parts", headers={"accept-encoding": "identity"})
+        compressed = await client.get("/api/parts", headers={"accept-encoding": "gzip"})
+    assert plain.headers["etag"] == '"0"'
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == 'W/"0"'
+
+
+async def test_revalidating_a_compressed_copy(gzip_only):
+    async with etag_app(gzip_only) as client:
+        response = await client.get("/api/parts", headers={"accept-encoding": "gzip", "if-none-match": 'W/"0"'})
+        plain = await client.get("/api/parts", headers={"accept-encoding": "gzip", "if-none-match": '"0"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"0"'
+    assert plain.headers["etag"] == '"0"'
+
+
+async def test_cached_bodies_are_kept_per_query(gzip_only):
+    async with etag_app(gzip_only) as client:
+        first = await client.get("/api/parts?a=1", headers={"accept-encoding": "gzip"})
+        second = await client.get("/api/parts?b=2", headers={"accept-encoding": "gzip"})
+        again = await client.get("/api/parts?a=1", headers={"accept-encoding": "gzip"})
+    # Same length query, so the same ETag: only the query tells them apart
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.content.endswith(b"a=1") and second.content.endswith(b"b=2")
+    assert again.content == first.content
+    assert gzip_only.stats["cache_hits"] == 1
@@ -0,0 +1,21 @@
+import pytest
+
+from tests.support import auth, report_doc
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_legacy_report_ids_are_backfilled_at_startup(server, client):
+    reports = [report_doc(created_at=f"2024-0{month}-01T00:00:00+00:00") for month in (1, 2, 3)]
+    await server.db.reports.insert_many(reports)
+    await server.db.customers.insert_one({"id": "cust-1", "report_ids": [r["id"] for r in reports] + ["deleted"]})
+
+    await server.backfill_customer_reports()
+
+    response = await client.get("/api/customer/reports", headers=auth(server, "cust-1", "customer"))
+    assert response.status_code == 200
+    assert [report["id"] for report in response.json()] == [r["id"] for r in reversed(reports)]
+    assert "report_ids" not in await server.db.customers.find_one({"id": "cust-1"})
+    # A second worker starting up finds nothing left to do
+    await server.backfill_customer_reports()
+    assert await server.db.customer_reports.count_documents({}) == 3
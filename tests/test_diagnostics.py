@@ -0,0 +1,277 @@
+import itertools
+
+import pytest
+
+from diagnostics import (
+    INPUT_DEFAULTS,
+    MissingInputs,
+    calculate_performance_score,
+    check_amp_draw,
+    check_capacitor_tolerance,
+    check_delta_t,
+    evaluate_report,
+)
+
+# ---- The if/elif checks server.py used before the table-driven engine -------
+
+
+def legacy_capacitor(rating, reading):
+    tolerance = abs(rating - reading) / rating * 100
+    if tolerance <= 6:
+        return "Good", tolerance, False
+    elif tolerance <= 10:
+        return "Warning", tolerance, True
+    return "Critical", tolerance, True
+
+
+def legacy_delta_t(delta):
+    if 15 <= delta <= 24:
+        return "Good"
+    elif 10 <= delta < 15:
+        return "Warning"
+    return "Critical"
+
+
+def legacy_amp_draw(actual, rated):
+    tolerance = abs(actual - rated) / rated * 100
+    if tolerance <= 10:
+        return "Good"
+    elif tolerance <= 20:
+        return "Warning"
+    return "Critical"
+
+
+def legacy_score(data):
+    score = 100
+    cap_tolerance = data.get('capacitor_tolerance', 0)
+    if cap_tolerance > 20:
+        score -= 40
+    elif cap_tolerance > 15:
+        score -= 30
+    elif cap_tolerance > 10:
+        score -= 20
+    elif cap_tolerance > 6:
+        score -= 10
+    delta_t = data.get('delta_t', 18)
+    if delta_t < 10 or delta_t > 28:
+        score -= 25
+    elif delta_t < 12 or delta_t > 25:
+        score -= 15
+    elif delta_t < 15 or delta_t > 22:
+        score -= 8
+    ref_status = data.get('refrigerant_status', 'Good')
+    if ref_status == 'Critical':
+        score -= 20
+    elif ref_status == 'Low':
+        score -= 10
+    if data.get('primary_drain') == 'Clogged, needs immediate service':
+        score -= 15
+    drain_pan = data.get('drain_pan_condition', 'Good shape')
+    if drain_pan == 'Rusted and should be replaced':
+        score -= 15
+    elif drain_pan == 'Poor condition':
+        score -= 10
+    elif drain_pan == 'Fair condition':
+        score -= 5
+    air_purifier = data.get('air_purifier', 'Good')
+    if air_purifier == 'Air purifier needs replacement':
+        score -= 10
+    elif air_purifier == 'UV light needs replacement':
+        score -= 5
+    system_age = data.get('system_age', 0)
+    if system_age > 15:
+        score -= 10
+    elif system_age > 12:
+        score -= 5
+    return max(0, min(100, score))
+
+
+def legacy_evaluate(data):
+    delta_t = data["return_temp"] - data["supply_temp"]
+    psc = data["blower_motor_type"] == "PSC Motor"
+    if psc and data["blower_motor_capacitor_rating"] and data["blower_motor_capacitor_reading"]:
+        blower_status, blower_tolerance, blower_replace = legacy_capacitor(
+            data["blower_motor_capacitor_rating"], data["blower_motor_capacitor_reading"])
+    else:
+        blower_status, blower_tolerance, blower_replace = "N/A", 0.0, False
+    herm_status, herm_tolerance, herm_replace = legacy_capacitor(
+        data["condenser_capacitor_herm_rating"], data["condenser_capacitor_herm_reading"])
+    fan_status, fan_tolerance, fan_replace = legacy_capacitor(
+        data["condenser_capacitor_fan_rating"], data["condenser_capacitor_fan_reading"])
+    condenser_tolerance = max(herm_tolerance, fan_tolerance)
+    priority = {"Critical": 3, "Warning": 2, "Good": 1}
+    condenser_status = herm_status if priority[herm_status] >= priority[fan_status] else fan_status
+    delta_t_status = legacy_delta_t(delta_t)
+
+    warnings = []
+    if blower_replace:
+        warnings.append({
+            "type": "blower_capacitor",
+            "severity": blower_status.lower(),
+            "message": f"Blower motor capacitor reading is {blower_tolerance:.1f}% off from rated value",
+            "part_needed": "capacitor"
+        })
+    if herm_replace or fan_replace:
+        parts = []
+        if herm_replace:
+            parts.append(f"Herm terminal: {herm_tolerance:.1f}% off")
+        if fan_replace:
+            parts.append(f"Fan terminal: {fan_tolerance:.1f}% off")
+        warnings.append({
+            "type": "condenser_capacitor",
+            "severity": condenser_status.lower(),
+            "message": f"Condenser dual run capacitor - {', '.join(parts)}",
+            "part_needed": "capacitor"
+        })
+    if delta_t_status != "Good":
+        warnings.append({
+            "type": "delta_t",
+            "severity": delta_t_status.lower(),
+            "message": f"Delta T is {delta_t:.1f}°F (ideal range: 15-22°F)",
+            "part_needed": None
+        })
+    if data["refrigerant_status"] != "Good":
+        warnings.append({
+            "type": "refrigerant",
+            "severity": "warning" if "Low" in data["refrigerant_status"] else "critical",
+            "message": f"Refrigerant status: {data['refrigerant_status']}",
+            "part_needed": "refrigerant"
+        })
+
+    return {
+        "delta_t": delta_t,
+        "delta_t_status": delta_t_status,
+        "blower_motor_capacitor_health": blower_status if psc else None,
+        "blower_motor_capacitor_tolerance": blower_tolerance if psc else None,
+        "condenser_capacitor_health": condenser_status,
+        "condenser_capacitor_tolerance": condenser_tolerance,
+        "warnings": warnings,
+        "performance_score": legacy_score({
+            'capacitor_tolerance': max(blower_tolerance, condenser_tolerance),
+            'delta_t': delta_t,
+            'refrigerant_status': data["refrigerant_status"],
+            'primary_drain': data["primary_drain"],
+            'drain_pan_condition': data["drain_pan_condition"],
+            'air_purifier': data["air_purifier"],
+            'system_age': 0,
+        }),
+    }
+
+
+# Readings against a 40 µF rating that land on and either side of every band edge
+READINGS = [40, 37.6, 37.5, 37.2, 36, 35.9, 34, 33.9, 32, 31.9, 30, 44.1]
+DELTA_TS = [5, 9.9, 10, 11.9, 12, 14.9, 15, 18, 22, 22.1, 24, 24.1, 25, 25.1, 28, 28.1, 35]
+
+
+def report(**overrides):
+    data = {
+        "return_temp": 75, "supply_temp": 57,
+        "blower_motor_type": "PSC Motor",
+        "blower_motor_capacitor_rating": 40, "blower_motor_capacitor_reading": 40,
+        "condenser_capacitor_herm_rating": 40, "condenser_capacitor_herm_reading": 40,
+        "condenser_capacitor_fan_rating": 40, "condenser_capacitor_fan_reading": 40,
+        "refrigerant_status": "Good",
+        "primary_drain": "Clear",
+        "drain_pan_condition": "Good shape",
+        "air_purifier": "Good",
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.mark.parametrize("reading", READINGS)
+def test_capacitor_matches_legacy(reading):
+    assert check_capacitor_tolerance(40, reading) == legacy_capacitor(40, reading)
+
+
+@pytest.mark.parametrize("delta", DELTA_TS)
+def test_delta_t_matches_legacy(delta):
+    assert check_delta_t(delta) == legacy_delta_t(delta)
+
+
+@pytest.mark.parametrize("actual", [10, 9, 8.9, 8, 7.9, 11, 11.1, 12, 12.1, 15])
+def test_amp_draw_matches_legacy(actual):
+    assert check_amp_draw(actual, 10) == legacy_amp_draw(actual, 10)
+
+
+def test_score_matches_legacy():
+    for tolerance, delta_t, age in itertools.product(
+        [0, 6, 6.1, 10, 10.1, 15, 15.1, 20, 20.1, 50], DELTA_TS, [0, 12, 12.5, 15, 16]
+    ):
+        data = {"capacitor_tolerance": tolerance, "delta_t": delta_t, "system_age": age}
+        assert calculate_performance_score(data) == legacy_score(data), data
+
+
+def test_score_defaults_match_legacy():
+    assert calculate_performance_score({}) == legacy_score({}) == 100
+
+
+def test_evaluate_report_matches_legacy():
+    statuses = itertools.product(
+        ["Good", "Low", "Critical"],
+        ["Clear", "Clogged, needs immediate service"],
+        ["Good shape", "Fair condition", "Poor condition", "Rusted and should be replaced"],
+        ["Good", "UV light needs replacement", "Air purifier needs replacement"],
+    )
+    cases = [
+        report(blower_motor_type=motor, blower_motor_capacitor_reading=blower,
+               condenser_capacitor_herm_reading=herm, condenser_capacitor_fan_reading=fan,
+               supply_temp=75 - delta_t)
+        for motor, blower, herm, fan, delta_t in itertools.product(
+            ["PSC Motor", "ECM Motor"], [40, 37, 33], READINGS[::2], READINGS[1::2], DELTA_TS[::3]
+        )
+    ] + [
+        report(refrigerant_status=refrigerant, primary_drain=drain, drain_pan_condition=pan, air_purifier=purifier)
+        for refrigerant, drain, pan, purifier in statuses
+    ]
+    for data in cases:
+        assert evaluate_report(data).fields() == legacy_evaluate(data), data
+
+
+def test_psc_without_blower_values_is_not_checked():
+    # The old edit path raised here; create treated it as not measured
+    data = report(blower_motor_capacitor_rating=None, blower_motor_capacitor_reading=None)
+    diagnostics = evaluate_report(data)
+    assert diagnostics.blower_motor_capacitor_health == "N/A"
+    assert diagnostics.blower_motor_capacitor_tolerance == 0.0
+    assert diagnostics.fields() == legacy_evaluate(data)
+
+
+def test_evaluate_report_reads_attributes():
+    class Form:
+        def __init__(self, data):
+            self.__dict__.update(data)
+
+    data = report(condenser_capacitor_fan_reading=33, supply_temp=65)
+    assert evaluate_report(Form(data)) == evaluate_report(data)
+
+
+def test_evaluate_report_known_values():
+    diagnostics = evaluate_report(report(condenser_capacitor_fan_reading=36, supply_temp=63,
+                                         refrigerant_status="Low"))
+    assert diagnostics.delta_t == 12
+    assert diagnostics.delta_t_status == "Warning"
+    assert diagnostics.condenser_capacitor_health == "Warning"
+    assert diagnostics.condenser_capacitor_tolerance == pytest.approx(10)
+    assert [w["type"] for w in diagnostics.warnings] == ["condenser_capacitor", "delta_t", "refrigerant"]
+    # 100 - 10 (capacitor 6-10%) - 8 (Delta T 12-15) - 10 (refrigerant low)
+    assert diagnostics.performance_score == 72
+
+
+def test_missing_checklist_answers_use_defaults():
+    data = report()
+    for field in INPUT_DEFAULTS:
+        del data[field]
+    assert evaluate_report(data) == evaluate_report(report(**INPUT_DEFAULTS))
+    assert evaluate_report(data).warnings == []
+
+
+@pytest.mark.parametrize("overrides, fields", [
+    ({"return_temp": None}, ["return_temp"]),
+    ({"condenser_capacitor_herm_rating": 0, "condenser_capacitor_fan_reading": None},
+     ["condenser_capacitor_herm_rating", "condenser_capacitor_fan_reading"]),
+])
+def test_missing_measurements_raise(overrides, fields):
+    with pytest.raises(MissingInputs) as missing:
+        evaluate_report(report(**overrides))
+    assert missing.value.fields == fields
@@ -0,0 +1,73 @@
+import base64
+
+import pytest
+
+from tests.fake_mongo import FakeDatabase
+from migrations import migrate_photos
+from photo_store import LocalPhotoStore, is_photo_hash
+
+pytestmark = pytest.mark.anyio
+
+
+def data_url(data: bytes, content_type: str = "image/jpeg") -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode()}"
+
+
+@pytest.fixture
+def photo_root(tmp_path, monkeypatch):
+    root = tmp_path / "photos"
+    monkeypatch.setenv("PHOTO_STORE", "local")
+    monkeypatch.setenv("PHOTO_STORE_PATH", str(root))
+    return root
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+
+async def test_migrate_photos_moves_inline_photos(db, photo_root, inline_image_pool, jpeg_bytes):
+    store = LocalPhotoStore(photo_root)
+    existing = await store.put(b"already stored")
+    await db.counters.insert_one({"_id": "report_revision", "seq": 10})
+    await db.reports.insert_one({"id": "r1", "revision": 3,
+                                 "evaporator_photos": [data_url(jpeg_bytes), existing]})
+
+    await migrate_photos(db)
+
+    report = await db.reports.find_one({"id": "r1"})
+    photo_hash, kept = report["evaporator_photos"]
+    assert is_photo_hash(photo_hash) and kept == existing
+    assert (await store.read(photo_hash))[0] == jpeg_bytes
+    assert await store.get_renditions(photo_hash)
+    assert report["revision"] == 11
+
+
+async def test_migrate_photos_never_drops_unreadable_photos(db, photo_root, inline_image_pool, jpeg_bytes):
+    unreadable = data_url(b"\x00\x00\x00\x18ftypheic not really", "image/heic")
+    await db.reports.insert_one({
+        "id": "r1", "revision": 1,
+        "evaporator_photos": [data_url(jpeg_bytes), unreadable],
+        "condenser_photos": [data_url(jpeg_bytes)],
+    })
+
+    await migrate_photos(db)
+
+    report = await db.reports.find_one({"id": "r1"})
+    # The field with an unreadable photo keeps its legacy values, the other one is migrated
+    assert report["evaporator_photos"] == [data_url(jpeg_bytes), unreadable]
+    assert [is_photo_hash(photo) for photo in report["condenser_photos"]] == [True]
+
+    # Repeating the migration changes nothing and still leaves the field alone
+    await migrate_photos(db)
+    assert await db.reports.find_one({"id": "r1"}) == report
+
+
+async def test_migrate_photos_dry_run_writes_nothing(db, photo_root, inline_image_pool, jpeg_bytes):
+    await db.reports.insert_one({"id": "r1", "revision": 1, "general_photos": [data_url(jpeg_bytes)]})
+    before = await db.reports.find_one({"id": "r1"})
+
+    await migrate_photos(db, dry_run=True)
+
+    assert await db.reports.find_one({"id": "r1"}) == before
+    assert not any(path.is_file() for path in photo_root.rglob("*"))
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from ocr import OcrCache
+from tests.fake_mongo import FakeDatabase
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_identical_requests_share_one_call():
+    cache = OcrCache(FakeDatabase())
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"brand": "Lennox"}
+
+    waiting = [asyncio.ensure_future(cache.get_or_compute("key", "data_plate", compute)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert cache._in_flight["key"].waiters == 3
+    release.set()
+
+    assert await asyncio.gather(*waiting) == [{"brand": "Lennox"}] * 3
+    assert calls == 1
+    assert cache.stats["coalesced"] == 2
+    assert cache._in_flight == {}
+    assert await cache.get_or_compute("key", "data_plate", compute) == {"brand": "Lennox"}
+    assert cache.stats["hits"] == 1
+
+
+async def test_call_survives_the_request_that_started_it():
+    cache = OcrCache(FakeDatabase())
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return {"ok": True}
+
+    first = asyncio.ensure_future(cache.get_or_compute("key", "warranty", compute))
+    second = asyncio.ensure_future(cache.get_or_compute("key", "warranty", compute))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == {"ok": True}
+    with pytest.raises(asyncio.CancelledError):
+        await first
@@ -0,0 +1,113 @@
+import base64
+from datetime import timedelta
+
+import pytest
+
+from ocr_jobs import OcrJobs, job_image_key
+from photo_store import LocalPhotoStore
+from tests.fake_mongo import FakeDatabase
+from tests.support import auth
+
+pytestmark = pytest.mark.anyio
+
+IMAGE = b"\xff\xd8\xff scan"
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    async def read_plate(image_base64, params, owner_id):
+        return {"bytes": len(base64.b64decode(image_base64)), "owner": owner_id}
+
+    return OcrJobs(FakeDatabase(), LocalPhotoStore(tmp_path / "photos"), LocalPhotoStore(tmp_path / "ocr"),
+                   {"data_plate": read_plate}, workers=0)
+
+
+async def test_job_reads_its_uploaded_image_and_then_deletes_it(jobs):
+    job = await jobs.submit("tech-1", "data_plate", {}, image=IMAGE)
+    assert await jobs.image_store.exists(job_image_key(job["job_id"]))
+
+    await jobs._process(job["job_id"])
+
+    finished = await jobs.get(job["job_id"], "tech-1")
+    assert finished["status"] == "complete"
+    assert finished["result"] == {"bytes": len(IMAGE), "owner": "tech-1"}
+    assert not await jobs.image_store.exists(job_image_key(job["job_id"]))
+
+
+async def test_jobs_with_the_same_image_keep_their_own_copies(jobs):
+    first = await jobs.submit("tech-1", "data_plate", {}, image=IMAGE)
+    second = await jobs.submit("tech-2", "data_plate", {}, image=IMAGE)
+
+    await jobs._process(first["job_id"])
+
+    assert await jobs.image_store.exists(job_image_key(second["job_id"]))
+    await jobs._process(second["job_id"])
+    assert (await jobs.get(second["job_id"], "tech-2"))["status"] == "complete"
+
+
+async def test_report_photos_are_only_read(jobs):
+    photo_hash = await jobs.store.put(IMAGE)
+    job = await jobs.submit("tech-1", "data_plate", {}, photo_id=photo_hash)
+
+    await jobs._process(job["job_id"])
+
+    assert (await jobs.get(job["job_id"], "tech-1"))["status"] == "complete"
+    assert await jobs.store.exists(photo_hash)
+
+
+async def test_unknown_photo_or_kind(jobs):
+    with pytest.raises(ValueError):
+        await jobs.submit("tech-1", "data_plate", {}, photo_id="a" * 64)
+    with pytest.raises(ValueError):
+        await jobs.submit("tech-1", "serial", {}, image=IMAGE)
+
+
+async def submitted_job(server, client) -> dict:
+    response = await client.post("/api/ocr/jobs", headers=auth(server, "tech-1"), json={
+        "kind": "data_plate",
+        "image_base64": base64.b64encode(IMAGE).decode(),
+        "params": {"equipment_type": "evaporator"},
+    })
+    assert response.status_code == 202
+    job = response.json()
+    # No workers run in tests; finish it so the event stream ends
+    await server.db.ocr_jobs.update_one({"id": job["job_id"]}, {"$set": {"status": "complete", "result": {}}})
+    return job
+
+
+async def test_event_stream_takes_the_jobs_stream_token(server, client):
+    job = await submitted_job(server, client)
+
+    response = await client.get(f"/api/ocr/jobs/{job['job_id']}/events", params={"stream_token": job["stream_token"]})
+
+    assert response.status_code == 200
+    assert response.text.startswith("event: complete\n")
+
+
+async def test_event_stream_refuses_other_tokens_in_the_url(server, client):
+    job = await submitted_job(server, client)
+    other = await submitted_job(server, client)
+    events = f"/api/ocr/jobs/{job['job_id']}/events"
+
+    assert (await client.get(events)).status_code == 401
+    # The login token isn't accepted in the URL
+    login = auth(server, "tech-1")["Authorization"].removeprefix("Bearer ")
+    assert (await client.get(events, params={"stream_token": login})).status_code == 401
+    assert (await client.get(events, params={"access_token": login})).status_code == 401
+    assert (await client.get(events, params={"stream_token": other["stream_token"]})).status_code == 401
+    # Headers still work for clients that can send them
+    assert (await client.get(events, headers=auth(server, "tech-1"))).status_code == 200
+
+
+async def test_stream_token_is_no_login(server, client):
+    job = await submitted_job(server, client)
+    response = await client.get(f"/api/ocr/jobs/{job['job_id']}",
+                                headers={"Authorization": f"Bearer {job['stream_token']}"})
+    assert response.status_code == 401
+
+
+async def test_stream_token_expires(server, client, monkeypatch):
+    monkeypatch.setattr(server, "STREAM_TOKEN_TTL", timedelta(seconds=-1))
+    job = await submitted_job(server, client)
+    response = await client.get(f"/api/ocr/jobs/{job['job_id']}/events", params={"stream_token": job["stream_token"]})
+    assert response.status_code == 401
@@ -0,0 +1,89 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+# JPEG magic up front so the content type is sniffed as one; the rest won't decode
+DATA = (b"\xff\xd8\xff" + bytes(range(256)) * 4)[:1024]
+
+
+@pytest.fixture
+async def photo(server):
+    return await server.photo_store.put(DATA, "image/jpeg")
+
+
+async def test_whole_photo(client, photo):
+    response = await client.get(f"/api/photos/{photo}")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["content-length"] == str(len(DATA))
+    assert response.headers["etag"] == f'"{photo}"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "immutable" in response.headers["cache-control"]
+
+
+@pytest.mark.parametrize("etag", ['"{}"', 'W/"{}"', '"other", "{}"', "*"])
+async def test_matching_etag_is_not_modified(client, photo, etag):
+    response = await client.get(f"/api/photos/{photo}", headers={"if-none-match": etag.format(photo)})
+    assert response.status_code == 304
+    assert response.content == b""
+    # Echoed as sent: weak if the client's copy came with a weak tag
+    assert response.headers["etag"].removeprefix("W/") == f'"{photo}"'
+
+
+async def test_stale_etag_gets_the_photo(client, photo):
+    response = await client.get(f"/api/photos/{photo}", headers={"if-none-match": '"other"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+    ("bytes = 10 - 20", 10, 20),
+])
+async def test_range(client, photo, header, start, end):
+    response = await client.get(f"/api/photos/{photo}", headers={"range": header})
+    assert response.status_code == 206
+    assert response.content == DATA[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(DATA)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=20-10"])
+async def test_unsatisfiable_range(client, photo, header):
+    response = await client.get(f"/api/photos/{photo}", headers={"range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+async def test_range_with_if_range(client, photo):
+    current = await client.get(f"/api/photos/{photo}", headers={"range": "bytes=0-9", "if-range": f'"{photo}"'})
+    assert current.status_code == 206
+    # A copy of something else: send the whole photo instead of splicing
+    stale = await client.get(f"/api/photos/{photo}", headers={"range": "bytes=0-9", "if-range": '"other"'})
+    assert stale.status_code == 200
+    assert stale.content == DATA
+
+
+@pytest.mark.parametrize("path", ["/api/photos/not-a-hash", f"/api/photos/{'a' * 64}", f"/api/photos/{'a' * 64}/thumb"])
+async def test_missing_photo(client, path):
+    assert (await client.get(path)).status_code == 404
+
+
+async def test_rendition(server, client, inline_image_pool, jpeg_bytes):
+    photo = await server.photo_store.put(jpeg_bytes, "image/jpeg")
+    response = await client.get(f"/api/photos/{photo}/thumb")
+    assert response.status_code == 200
+    thumb = (await server.photo_store.get_renditions(photo))["thumb"]
+    assert response.headers["etag"] == f'"{thumb}"'
+    assert (await client.get(f"/api/photos/{photo}/thumb", headers={"if-none-match": f'"{thumb}"'})).status_code == 304
+    assert (await client.get(f"/api/photos/{photo}/huge")).status_code == 404
+
+
+async def test_rendition_of_a_non_image_is_the_original(client, photo):
+    response = await client.get(f"/api/photos/{photo}/medium")
+    assert response.status_code == 200
+    assert response.content == DATA
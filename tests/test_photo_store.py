@@ -0,0 +1,86 @@
+import pytest
+
+from photo_store import (InvalidPhoto, LocalPhotoStore, PhotoNotFound, decode_photo_value, ingest_photo,
+                         photo_ref_from_value)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalPhotoStore(tmp_path / "photos")
+
+
+async def test_ingest_stores_original_and_renditions(store, inline_image_pool, jpeg_bytes):
+    photo_hash = await ingest_photo(store, jpeg_bytes, "image/jpeg")
+    assert await store.read(photo_hash) == (jpeg_bytes, "image/jpeg")
+    renditions = await store.get_renditions(photo_hash)
+    assert set(renditions) == {"full", "medium", "thumb"}
+    assert all([await store.exists(rendition) for rendition in renditions.values()])
+    assert await ingest_photo(store, jpeg_bytes, "image/jpeg") == photo_hash
+
+
+async def test_ingest_rejects_non_images_without_storing(store, inline_image_pool, tmp_path):
+    with pytest.raises(InvalidPhoto):
+        await ingest_photo(store, b"not an image", "image/jpeg")
+    assert not any(path.is_file() for path in (tmp_path / "photos").rglob("*"))
+
+
+async def test_rejected_ingest_keeps_bytes_stored_by_someone_else(store, inline_image_pool):
+    # Content-addressed: these bytes may already be referenced elsewhere
+    photo_hash = await store.put(b"not an image")
+    with pytest.raises(InvalidPhoto):
+        await ingest_photo(store, b"not an image")
+    assert await store.exists(photo_hash)
+
+
+async def test_local_store_round_trip(store):
+    photo_hash = await store.put(b"\x89PNG\r\n\x1a\n" + b"x" * 100)
+    assert await store.put(b"\x89PNG\r\n\x1a\n" + b"x" * 100) == photo_hash
+    assert await store.exists(photo_hash)
+    info = await store.stat(photo_hash)
+    assert (info.length, info.content_type) == (108, "image/png")
+    chunks = [chunk async for chunk in store.iter_range(photo_hash, 8, 57, chunk_size=16)]
+    assert [len(chunk) for chunk in chunks] == [16, 16, 16, 2]
+    assert b"".join(chunks) == b"x" * 50
+
+
+async def test_local_store_renditions_and_delete(store):
+    photo_hash = await store.put(b"original")
+    assert await store.get_renditions(photo_hash) is None
+    await store.set_renditions(photo_hash, {"thumb": "a" * 64})
+    assert await store.get_renditions(photo_hash) == {"thumb": "a" * 64}
+    await store.delete(photo_hash)
+    assert not await store.exists(photo_hash)
+    with pytest.raises(PhotoNotFound):
+        await store.read(photo_hash)
+    with pytest.raises(PhotoNotFound):
+        await store.get_renditions(photo_hash)
+
+
+async def test_missing_or_malformed_hashes(store):
+    for photo_hash in ("0" * 64, "../etc/passwd"):
+        assert not await store.exists(photo_hash)
+        with pytest.raises(PhotoNotFound):
+            await store.stat(photo_hash)
+
+
+@pytest.mark.parametrize("value, content_type", [
+    ("data:image/png;base64,iVBORw0KGgo=", "image/png"),
+    ("/9j/4AAQ", "image/jpeg"),
+])
+def test_decode_photo_value(value, content_type):
+    assert decode_photo_value(value)[1] == content_type
+
+
+@pytest.mark.parametrize("value", ["data:image/png;base64,", "!!!"])
+def test_decode_photo_value_rejects_empty_or_garbage(value):
+    with pytest.raises(InvalidPhoto):
+        decode_photo_value(value)
+
+
+def test_photo_ref_from_value():
+    photo_hash = "ab" * 32
+    assert photo_ref_from_value(photo_hash) == photo_hash
+    assert photo_ref_from_value(f"https://example.com/api/photos/{photo_hash}") == photo_hash
+    assert photo_ref_from_value("data:image/png;base64,AAAA") is None
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import photo_uploads
+from photo_store import LocalPhotoStore
+from photo_uploads import PhotoUploads, UploadConflict, UploadNotFound, UploadTooLarge
+from tests.fake_mongo import FakeDatabase
+from tests.support import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def body(*pieces):
+    for piece in pieces:
+        yield piece
+
+
+@pytest.fixture
+def uploads(tmp_path, inline_image_pool):
+    return PhotoUploads(FakeDatabase(), LocalPhotoStore(tmp_path / "photos"), tmp_path / "uploads")
+
+
+async def test_chunks_in_order_then_finalize(uploads, jpeg_bytes):
+    session = await uploads.initiate("tech-1", size=len(jpeg_bytes))
+    upload_id = session["upload_id"]
+    middle = len(jpeg_bytes) // 2
+
+    first = await uploads.write_chunk(upload_id, "tech-1", 0, body(jpeg_bytes[:10], jpeg_bytes[10:middle]))
+    assert first["received"] == middle
+    second = await uploads.write_chunk(upload_id, "tech-1", middle, body(jpeg_bytes[middle:]))
+    assert second["received"] == len(jpeg_bytes)
+
+    done = await uploads.finalize(upload_id, "tech-1")
+    assert done["status"] == "complete"
+    assert done["photo_id"] == hashlib.sha256(jpeg_bytes).hexdigest()
+    assert (await uploads.store.read(done["photo_id"]))[0] == jpeg_bytes
+    assert await uploads.store.get_renditions(done["photo_id"])
+    assert list(uploads.upload_dir.iterdir()) == []
+    # Finalizing again (a retried request) returns the same result
+    assert await uploads.finalize(upload_id, "tech-1") == done
+
+
+async def test_out_of_order_chunk_is_refused(uploads, jpeg_bytes):
+    session = await uploads.initiate("tech-1", size=len(jpeg_bytes))
+    with pytest.raises(UploadConflict, match="Expected offset 0"):
+        await uploads.write_chunk(session["upload_id"], "tech-1", 100, body(jpeg_bytes[100:200]))
+    assert (await uploads.status(session["upload_id"], "tech-1"))["received"] == 0
+    assert [path.suffix for path in uploads.upload_dir.iterdir()] == [".part"]
+
+
+async def test_duplicate_chunk_is_refused_and_upload_resumes(uploads, jpeg_bytes):
+    session = await uploads.initiate("tech-1", size=len(jpeg_bytes))
+    upload_id = session["upload_id"]
+    await uploads.write_chunk(upload_id, "tech-1", 0, body(jpeg_bytes[:100]))
+
+    # The client lost the acknowledgement and resends the same chunk
+    with pytest.raises(UploadConflict, match="Expected offset 100"):
+        await uploads.write_chunk(upload_id, "tech-1", 0, body(b"x" * 100))
+
+    received = (await uploads.status(upload_id, "tech-1"))["received"]
+    await uploads.write_chunk(upload_id, "tech-1", received, body(jpeg_bytes[received:]))
+    done = await uploads.finalize(upload_id, "tech-1")
+    assert (await uploads.store.read(done["photo_id"]))[0] == jpeg_bytes
+
+
+async def test_finalize_before_every_byte_arrived(uploads, jpeg_bytes):
+    session = await uploads.initiate("tech-1", size=len(jpeg_bytes))
+    with pytest.raises(UploadConflict, match=f"Only 0 of {len(jpeg_bytes)}"):
+        await uploads.finalize(session["upload_id"], "tech-1")
+    await uploads.write_chunk(session["upload_id"], "tech-1", 0, body(jpeg_bytes[:100]))
+    with pytest.raises(UploadConflict, match=f"Only 100 of {len(jpeg_bytes)}"):
+        await uploads.finalize(session["upload_id"], "tech-1")
+
+
+async def test_writes_after_finalize_are_refused(uploads, jpeg_bytes):
+    session = await uploads.initiate("tech-1")
+    await uploads.write_chunk(session["upload_id"], "tech-1", 0, body(jpeg_bytes))
+    await uploads.finalize(session["upload_id"], "tech-1")
+    with pytest.raises(UploadConflict, match="finalized"):
+        await uploads.write_chunk(session["upload_id"], "tech-1", len(jpeg_bytes), body(b"more"))
+
+
+async def test_size_limits(uploads, monkeypatch):
+    monkeypatch.setattr(photo_uploads, "MAX_UPLOAD_BYTES", 100)
+    with pytest.raises(UploadTooLarge):
+        await uploads.initiate("tech-1", size=101)
+    declared = await uploads.initiate("tech-1", size=10)
+    with pytest.raises(UploadTooLarge):
+        await uploads.write_chunk(declared["upload_id"], "tech-1", 0, body(b"x" * 11))
+    undeclared = await uploads.initiate("tech-1")
+    with pytest.raises(UploadTooLarge):
+        await uploads.write_chunk(undeclared["upload_id"], "tech-1", 0, body(b"x" * 60, b"x" * 60))
+    assert (await uploads.status(undeclared["upload_id"], "tech-1"))["received"] == 0
+
+
+async def test_sessions_belong_to_their_owner(uploads):
+    session = await uploads.initiate("tech-1")
+    with pytest.raises(UploadNotFound):
+        await uploads.status(session["upload_id"], "tech-2")
+    with pytest.raises(UploadNotFound):
+        await uploads.write_chunk(session["upload_id"], "tech-2", 0, body(b"x"))
+
+
+async def test_expired_sessions_are_purged(uploads):
+    expired = await uploads.initiate("tech-1")
+    live = await uploads.initiate("tech-1")
+    await uploads.collection.update_one(
+        {"id": expired["upload_id"]}, {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+    # A staging file left behind by a session the TTL index already removed
+    orphan = uploads.upload_dir / "gone.part"
+    orphan.touch()
+    old = time.time() - photo_uploads.UPLOAD_TTL.total_seconds() - 60
+    os.utime(orphan, (old, old))
+
+    await uploads.purge_expired()
+
+    with pytest.raises(UploadNotFound):
+        await uploads.status(expired["upload_id"], "tech-1")
+    assert (await uploads.status(live["upload_id"], "tech-1"))["status"] == "open"
+    assert sorted(path.name for path in uploads.upload_dir.iterdir()) == [f"{live['upload_id']}.part"]
+
+
+async def test_upload_over_http(server, client, inline_image_pool, jpeg_bytes):
+    headers = auth(server, "tech-1")
+    session = (await client.post("/api/photos/uploads", headers=headers, json={"size": len(jpeg_bytes)})).json()
+    chunk = f"/api/photos/uploads/{session['upload_id']}"
+
+    assert (await client.put(chunk, headers=headers, params={"offset": 0}, content=jpeg_bytes[:64])).status_code == 200
+    stale = await client.put(chunk, headers=headers, params={"offset": 0}, content=jpeg_bytes[:64])
+    assert stale.status_code == 409
+    assert (await client.put(chunk, headers=headers, params={"offset": 64}, content=jpeg_bytes[64:])).status_code == 200
+
+    done = await client.post(f"{chunk}/complete", headers=headers)
+    assert done.status_code == 200
+    photo = await client.get(done.json()["url"])
+    assert photo.content == jpeg_bytes
+    assert (await client.get(chunk, headers=auth(server, "tech-2"))).status_code == 404
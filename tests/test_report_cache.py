@@ -0,0 +1,105 @@
+from report_cache import ReportViewCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(max_bytes=100, ttl=60):
+    clock = Clock()
+    return ReportViewCache(max_bytes=max_bytes, ttl=ttl, clock=clock), clock
+
+
+def test_get_after_put():
+    cache, _ = make_cache()
+    cache.put("link1", "r1", b"body", '"1"', cache.generation)
+    entry = cache.get("link1")
+    assert (entry.report_id, entry.body, entry.etag) == ("r1", b"body", '"1"')
+    assert cache.get("other") is None
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+
+def test_lru_eviction_by_size():
+    cache, _ = make_cache(max_bytes=30)
+    cache.put("a", "ra", b"x" * 10, "a", cache.generation)
+    cache.put("b", "rb", b"x" * 10, "b", cache.generation)
+    cache.put("c", "rc", b"x" * 10, "c", cache.generation)
+    # Touch a so b becomes least recently used
+    assert cache.get("a") is not None
+    cache.put("d", "rd", b"x" * 10, "d", cache.generation)
+    assert cache.get("b") is None
+    assert all(cache.get(link) is not None for link in ("a", "c", "d"))
+    assert cache.size == 30
+    assert cache.stats["evictions"] == 1
+
+
+def test_body_larger_than_cache_is_not_stored():
+    cache, _ = make_cache(max_bytes=10)
+    cache.put("a", "ra", b"x" * 11, "a", cache.generation)
+    assert cache.get("a") is None
+    assert cache.size == 0
+    assert cache.stats["too_large"] == 1
+
+
+def test_replacing_an_entry_updates_size():
+    cache, _ = make_cache()
+    cache.put("a", "ra", b"x" * 10, "1", cache.generation)
+    cache.put("a", "ra", b"x" * 4, "2", cache.generation)
+    assert cache.size == 4
+    assert cache.get("a").etag == "2"
+
+
+def test_entries_expire_after_ttl():
+    cache, clock = make_cache(ttl=60)
+    cache.put("a", "ra", b"body", "a", cache.generation)
+    clock.now += 59.9
+    assert cache.get("a") is not None
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert cache.size == 0
+    assert cache.snapshot()["entries"] == 0
+
+
+def test_invalidate_by_report_id():
+    cache, _ = make_cache()
+    cache.put("a", "ra", b"body", "a", cache.generation)
+    cache.put("b", "rb", b"body", "b", cache.generation)
+    cache.invalidate("ra")
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.size == 4
+    assert cache.stats["invalidations"] == 1
+
+
+def test_invalidate_uncached_report_still_bumps_generation():
+    cache, _ = make_cache()
+    generation = cache.generation
+    cache.invalidate("missing")
+    assert cache.generation == generation + 1
+    assert cache.stats["invalidations"] == 0
+
+
+def test_body_read_before_an_invalidation_is_not_stored():
+    cache, _ = make_cache()
+    generation = cache.generation
+    # An edit lands while the view is being read from Mongo
+    cache.invalidate("ra")
+    cache.put("a", "ra", b"stale", "a", generation)
+    assert cache.get("a") is None
+
+
+def test_snapshot_hit_ratio():
+    cache, _ = make_cache()
+    assert cache.snapshot()["hit_ratio"] is None
+    cache.put("a", "ra", b"body", "a", cache.generation)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    snapshot = cache.snapshot()
+    assert snapshot["hit_ratio"] == 0.667
+    assert snapshot["entries"] == 1
@@ -0,0 +1,186 @@
+import base64
+
+import pytest
+
+from tests.support import REPORT_FORM, auth, report_doc
+
+pytestmark = pytest.mark.anyio
+
+
+def data_url(data: bytes) -> str:
+    return f"data:image/jpeg;base64,{base64.b64encode(data).decode()}"
+
+
+async def stored_photos(server) -> list:
+    return [path for path in server.photo_store.root.rglob("*") if path.is_file()]
+
+
+async def test_edit_returns_the_updated_report_and_records_a_version(server, client):
+    report = report_doc()
+    await server.db.reports.insert_one(report)
+
+    response = await client.put(f"/api/reports/{report['id']}/edit", headers=auth(server, "tech-1"),
+                                json={**REPORT_FORM, "supply_temp": 65, "notes": "$120 quote"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["current_version"], body["edit_count"]) == (2, 1)
+    assert body["report"]["notes"] == "$120 quote"
+    assert body["report"]["delta_t"] == 10
+    assert body["report"]["edit_count"] == 1
+    stored = await server.db.reports.find_one({"id": report["id"]}, {"_id": 0})
+    assert {k: v for k, v in stored.items() if k != "timestamp"} == \
+        {k: v for k, v in body["report"].items() if k not in ("timestamp", "photo_renditions")}
+    versions = await server.db.report_versions.find({"report_id": report["id"]}).sort("version").to_list(None)
+    assert [version["version"] for version in versions] == [1, 2]
+    assert {op["path"] for op in versions[1]["patch"]} >= {"/delta_t", "/delta_t_status", "/performance_score"}
+
+
+@pytest.mark.parametrize("technician, edit_count, status", [
+    ("tech-2", 0, 403),
+    ("tech-1", 3, 400),
+])
+async def test_rejected_edit_stores_no_photos(server, client, inline_image_pool, jpeg_bytes,
+                                              technician, edit_count, status):
+    report = report_doc(edit_count=edit_count)
+    await server.db.reports.insert_one(report)
+
+    response = await client.put(f"/api/reports/{report['id']}/edit", headers=auth(server, technician),
+                                json={**REPORT_FORM, "general_photos": [data_url(jpeg_bytes)]})
+
+    assert response.status_code == status
+    assert await stored_photos(server) == []
+
+
+async def test_edit_of_a_missing_report(server, client):
+    response = await client.put("/api/reports/nope/edit", headers=auth(server, "tech-1"), json=REPORT_FORM)
+    assert response.status_code == 404
+
+
+async def test_new_photos_are_stored_before_the_report_references_them(server, client, inline_image_pool,
+                                                                       jpeg_bytes):
+    report = report_doc()
+    await server.db.reports.insert_one(report)
+
+    response = await client.put(f"/api/reports/{report['id']}/edit", headers=auth(server, "tech-1"),
+                                json={**REPORT_FORM, "general_photos": [data_url(jpeg_bytes)]})
+
+    assert response.status_code == 200
+    stored = await server.db.reports.find_one({"id": report["id"]})
+    photo_hash, = stored["general_photos"]
+    assert await server.photo_store.exists(photo_hash)
+    assert await server.photo_store.get_renditions(photo_hash)
+
+
+async def test_edit_limit(server, client):
+    report = report_doc()
+    await server.db.reports.insert_one(report)
+    for _ in range(3):
+        response = await client.put(f"/api/reports/{report['id']}/edit", headers=auth(server, "tech-1"),
+                                    json=REPORT_FORM)
+        assert response.status_code == 200
+    response = await client.put(f"/api/reports/{report['id']}/edit", headers=auth(server, "tech-1"),
+                                json=REPORT_FORM)
+    assert response.status_code == 400
+
+
+async def test_edit_saves_embedded_history_before_dropping_it(server, client):
+    old = {key: REPORT_FORM[key] for key in ("customer_name", "refrigerant_status")}
+    report = report_doc(edit_count=1, current_version=2, versions=[
+        {"version": 1, "label": "Before Repair", "timestamp": "t1", "data": {**old, "customer_name": "Old Name"}},
+        {"version": 2, "label": "After Repair 1", "timestamp": "t2", "data": old},
+    ])
+    await server.db.reports.insert_one(report)
+
+    response = await client.put(f"/api/reports/{report['id']}/edit", headers=auth(server, "tech-1"),
+                                json=REPORT_FORM)
+
+    assert response.status_code == 200
+    assert response.json()["current_version"] == 3
+    assert "versions" not in await server.db.reports.find_one({"id": report["id"]})
+    versions = await server.db.report_versions.find({"report_id": report["id"]}).sort("version").to_list(None)
+    assert [version["version"] for version in versions] == [1, 2, 3]
+    assert versions[0]["base"]["customer_name"] == "Old Name"
+
+
+async def test_patch_updates_only_the_fields_sent(server, client):
+    report = report_doc()
+    await server.db.reports.insert_one(report)
+
+    response = await client.patch(f"/api/reports/{report['id']}", headers=auth(server, "tech-1"),
+                                  json={"notes": "Replaced filter", "customer_name": report["customer_name"]})
+
+    assert response.status_code == 200
+    assert response.json()["updated_fields"] == ["notes"]
+    assert response.json()["edit_count"] == 1
+    stored = await server.db.reports.find_one({"id": report["id"]}, {"_id": 0})
+    assert stored["notes"] == "Replaced filter"
+    bookkeeping = ("_id", "revision", "edit_count", "current_version")
+    assert {k: stored[k] for k in report if k not in bookkeeping} == \
+        {k: v for k, v in report.items() if k not in bookkeeping}
+
+
+async def test_patch_rescores_changed_measurements(server, client):
+    report = report_doc()
+    await server.db.reports.insert_one(report)
+
+    response = await client.patch(f"/api/reports/{report['id']}", headers=auth(server, "tech-1"),
+                                  json={"supply_temp": 65})
+
+    assert response.status_code == 200
+    assert {"supply_temp", "delta_t", "delta_t_status", "performance_score"} <= set(response.json()["updated_fields"])
+    stored = await server.db.reports.find_one({"id": report["id"]})
+    assert (stored["delta_t"], stored["delta_t_status"]) == (10, "Warning")
+
+
+async def test_patch_of_a_report_changed_since_it_was_read(server, client, monkeypatch):
+    report = report_doc()
+    await server.db.reports.insert_one(report)
+    next_revision = server.next_revision
+
+    async def edited_meanwhile(db, *args):
+        await db.reports.update_one({"id": report["id"]}, {"$inc": {"edit_count": 1}})
+        return await next_revision(db, *args)
+
+    monkeypatch.setattr(server, "next_revision", edited_meanwhile)
+    response = await client.patch(f"/api/reports/{report['id']}", headers=auth(server, "tech-1"),
+                                  json={"notes": "stale"})
+
+    assert response.status_code == 409
+    assert "notes" not in await server.db.reports.find_one({"id": report["id"]})
+
+
+async def test_patch_stores_photos_for_the_field_sent(server, client, inline_image_pool, jpeg_bytes):
+    kept = "a" * 64
+    report = report_doc(condenser_photos=[kept])
+    await server.db.reports.insert_one(report)
+
+    response = await client.patch(f"/api/reports/{report['id']}", headers=auth(server, "tech-1"),
+                                  json={"evaporator_photos": [data_url(jpeg_bytes)]})
+
+    assert response.status_code == 200
+    assert response.json()["updated_fields"] == ["evaporator_photos"]
+    stored = await server.db.reports.find_one({"id": report["id"]})
+    assert stored["condenser_photos"] == [kept]
+    photo_hash, = stored["evaporator_photos"]
+    assert await server.photo_store.exists(photo_hash)
+
+
+async def test_patch_of_a_report_missing_diagnostic_inputs(server, client):
+    report = report_doc()
+    del report["refrigerant_status"], report["air_purifier"]
+    await server.db.reports.insert_one(report)
+
+    response = await client.patch(f"/api/reports/{report['id']}", headers=auth(server, "tech-1"),
+                                  json={"supply_temp": 60})
+    assert response.status_code == 200
+    stored = await server.db.reports.find_one({"id": report["id"]})
+    assert stored["warnings"] == []
+
+    del report["_id"], report["return_temp"]
+    report["id"] = "no-return-temp"
+    await server.db.reports.insert_one(report)
+    response = await client.patch("/api/reports/no-return-temp", headers=auth(server, "tech-1"),
+                                  json={"supply_temp": 60})
+    assert response.status_code == 400
+    assert "return_temp" in response.json()["detail"]
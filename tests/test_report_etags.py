@@ -0,0 +1,116 @@
+import pytest
+
+from report_revisions import next_revision
+from tests.support import auth, report_doc
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def report(server):
+    # Revisions come off the shared counter, as create_report stamps them
+    doc = report_doc(revision=await next_revision(server.db))
+    await server.db.reports.insert_one(doc)
+    return doc
+
+
+async def edit(server, client, report, **changes):
+    response = await client.patch(f"/api/reports/{report['id']}", headers=auth(server, "tech-1"), json=changes)
+    assert response.status_code == 200
+
+
+async def revalidate(client, url, etag, **headers):
+    return await client.get(url, headers={**headers, "If-None-Match": etag})
+
+
+def strong(etag: str) -> str:
+    """The ETag without the W/ the compression middleware adds to compressed bodies"""
+    return etag.removeprefix("W/")
+
+
+async def test_shared_view_etag(server, client, report):
+    url = f"/api/reports/view/{report['unique_link']}"
+    first = await client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert strong(etag) == f'"{report["id"]}.1"'
+
+    cached = await revalidate(client, url, etag)
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    await edit(server, client, report, customer_phone="555-0199")
+    stale = await revalidate(client, url, etag)
+    assert stale.status_code == 200
+    assert stale.headers["etag"] != etag
+    assert stale.json()["customer_phone"] == "555-0199"
+    assert (await revalidate(client, url, stale.headers["etag"])).status_code == 304
+
+
+async def test_shared_view_revalidates_before_the_view_cache_fills(server, client, report):
+    url = f"/api/reports/view/{report['unique_link']}"
+    response = await revalidate(client, url, f'"{report["id"]}.1"')
+    assert response.status_code == 304
+    assert server.report_view_cache.snapshot()["entries"] == 0
+
+
+async def test_edit_form_etag(server, client, report):
+    url = f"/api/reports/edit/{report['id']}"
+    headers = auth(server, "tech-1")
+    etag = (await client.get(url, headers=headers)).headers["etag"]
+    assert (await revalidate(client, url, etag, **headers)).status_code == 304
+
+    await edit(server, client, report, notes="Recheck drain in spring")
+    stale = await revalidate(client, url, etag, **headers)
+    assert stale.status_code == 200
+    assert stale.json()["notes"] == "Recheck drain in spring"
+    assert stale.headers["etag"] != etag
+
+
+async def test_list_etag(server, client, report):
+    headers = auth(server, "tech-1")
+    url = "/api/reports?view=summary"
+    first = await client.get(url, headers=headers)
+    etag = first.headers["etag"]
+    assert strong(etag) == '"1.1"'
+    assert (await revalidate(client, url, etag, **headers)).status_code == 304
+
+    await edit(server, client, report, customer_name="Jane Smith")
+    stale = await revalidate(client, url, etag, **headers)
+    assert stale.status_code == 200
+    assert stale.headers["etag"] != etag
+    assert stale.json()["reports"][0]["customer_name"] == "Jane Smith"
+    assert (await revalidate(client, url, stale.headers["etag"], **headers)).status_code == 304
+
+
+async def test_list_etag_changes_when_a_report_is_added(server, client, report):
+    headers = auth(server, "tech-1")
+    url = "/api/reports?view=summary"
+    etag = (await client.get(url, headers=headers)).headers["etag"]
+    await server.db.reports.insert_one(report_doc(revision=0))
+    response = await revalidate(client, url, etag, **headers)
+    assert response.status_code == 200
+    assert strong(response.headers["etag"]) == '"2.1"'
+
+
+async def test_list_etag_ignores_other_technicians(server, client, report):
+    headers = auth(server, "tech-1")
+    url = "/api/reports?view=summary"
+    etag = (await client.get(url, headers=headers)).headers["etag"]
+    await server.db.reports.insert_one(report_doc("tech-2"))
+    assert (await revalidate(client, url, etag, **headers)).status_code == 304
+
+
+async def test_customer_history_etag(server, client, report):
+    await server.db.customers.insert_one({"id": "cust-1"})
+    await server.db.customer_reports.insert_one(
+        {"customer_id": "cust-1", "report_id": report["id"], "created_at": report["created_at"]})
+    headers = auth(server, "cust-1", "customer")
+    url = "/api/customer/reports"
+    etag = (await client.get(url, headers=headers)).headers["etag"]
+    assert (await revalidate(client, url, etag, **headers)).status_code == 304
+
+    await edit(server, client, report, customer_phone="555-0199")
+    stale = await revalidate(client, url, etag, **headers)
+    assert stale.status_code == 200
+    assert stale.headers["etag"] != etag
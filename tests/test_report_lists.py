@@ -0,0 +1,84 @@
+import pytest
+
+from tests.support import auth, report_doc
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def reports(server):
+    docs = [
+        report_doc(customer_name="Ann Archer", customer_email="ann@example.com",
+                   created_at="2024-03-01T09:00:00+00:00"),
+        report_doc(customer_name="Bob Baker", customer_email="bob@shop.example",
+                   created_at="2024-03-02T23:30:00+00:00"),
+        report_doc(customer_name="Cy Cole", customer_email="cy@example.com",
+                   created_at="2024-03-03T10:00:00+00:00", archived=True),
+        report_doc("tech-2", customer_name="Ann Other", created_at="2024-03-01T09:00:00+00:00"),
+    ]
+    await server.db.reports.insert_many(docs)
+    return docs
+
+
+async def names(client, server, **params):
+    response = await client.get("/api/reports", headers=auth(server, "tech-1"),
+                                params={"view": "summary", **params})
+    assert response.status_code == 200
+    return [report["customer_name"] for report in response.json()["reports"]]
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({}, ["Bob Baker", "Ann Archer"]),
+    ({"include_archived": "true"}, ["Cy Cole", "Bob Baker", "Ann Archer"]),
+    ({"archived": "true"}, ["Cy Cole"]),
+    ({"archived": "false", "include_archived": "true"}, ["Bob Baker", "Ann Archer"]),
+    ({"q": "ann", "include_archived": "true"}, ["Ann Archer"]),
+    ({"q": "SHOP.example"}, ["Bob Baker"]),
+    ({"q": "a.n"}, []),
+    ({"created_from": "2024-03-02T00:00:00Z", "created_to": "2024-03-03T00:00:00Z"}, ["Bob Baker"]),
+    # A local day that runs past midnight UTC
+    ({"created_from": "2024-03-02T00:00:00-05:00", "created_to": "2024-03-03T00:00:00-05:00"}, ["Bob Baker"]),
+    ({"created_from": "2024-03-03T00:00:00", "include_archived": "true"}, ["Cy Cole"]),
+])
+async def test_filters_cover_every_report(server, client, reports, params, expected):
+    assert await names(client, server, **params) == expected
+
+
+async def test_filters_apply_across_pages(server, client, reports):
+    response = await client.get("/api/reports", headers=auth(server, "tech-1"),
+                                params={"view": "summary", "limit": 1, "q": "example", "include_archived": "true"})
+    page = response.json()
+    assert [report["customer_name"] for report in page["reports"]] == ["Cy Cole"]
+    response = await client.get("/api/reports", headers=auth(server, "tech-1"),
+                                params={"view": "summary", "limit": 1, "q": "example", "include_archived": "true",
+                                        "cursor": page["next_cursor"]})
+    assert [report["customer_name"] for report in response.json()["reports"]] == ["Bob Baker"]
+
+
+async def test_bad_parameters_are_rejected_before_any_work(server, client, reports, monkeypatch):
+    async def no_etag(*args):
+        raise AssertionError("list_etag ran")
+
+    monkeypatch.setattr(server, "list_etag", no_etag)
+    headers = auth(server, "tech-1")
+    assert (await client.get("/api/reports", headers=headers, params={"view": "tiny"})).status_code == 400
+    assert (await client.get("/api/reports", headers=headers, params={"created_from": "yesterday"})).status_code == 400
+
+
+async def test_full_view_is_not_truncated(server, client, reports):
+    headers = auth(server, "tech-1")
+    response = await client.get("/api/reports", headers=headers, params={"include_archived": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert [report["customer_name"] for report in response.json()] == ["Cy Cole", "Bob Baker", "Ann Archer"]
+
+    response = await client.get("/api/reports", headers=auth(server, "tech-3"))
+    assert response.json() == []
+
+
+async def test_full_view_pages_when_asked(server, client, reports):
+    response = await client.get("/api/reports", headers=auth(server, "tech-1"), params={"limit": 1})
+    page = response.json()
+    assert [report["customer_name"] for report in page["reports"]] == ["Bob Baker"]
+    assert "supply_temp" in page["reports"][0]
+    assert page["next_cursor"]
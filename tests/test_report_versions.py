@@ -0,0 +1,100 @@
+import pytest
+
+from report_versions import (
+    ORIGINAL_LABEL,
+    apply_patch,
+    base_version,
+    diff_fields,
+    edit_label,
+    from_embedded,
+    version_data,
+)
+
+BEFORE = {
+    "customer_name": "Jane Doe",
+    "delta_t": 12.0,
+    "delta_t_status": "Warning",
+    "performance_score": 72,
+    "warnings": [{"type": "delta_t", "severity": "warning"}],
+    "superheat": 10,
+}
+
+
+@pytest.mark.parametrize("after", [
+    BEFORE,
+    {},
+    {**BEFORE, "delta_t": 18.0, "delta_t_status": "Good", "warnings": []},
+    {key: value for key, value in BEFORE.items() if key != "superheat"},
+    {**BEFORE, "subcooling": 8},
+    {"customer_name": "John Doe", "subcooling": None, "warnings": [{"type": "refrigerant"}]},
+])
+def test_patch_round_trip(after):
+    assert apply_patch(BEFORE, diff_fields(BEFORE, after)) == after
+
+
+def test_diff_of_identical_data_is_empty():
+    assert diff_fields(BEFORE, dict(BEFORE)) == []
+
+
+def test_diff_ops():
+    after = {**BEFORE, "delta_t": 18.0, "subcooling": 8}
+    del after["superheat"]
+    assert diff_fields(BEFORE, after) == [
+        {"op": "replace", "path": "/delta_t", "value": 18.0},
+        {"op": "remove", "path": "/superheat"},
+        {"op": "add", "path": "/subcooling", "value": 8},
+    ]
+
+
+def test_none_is_a_value_not_a_removal():
+    after = {**BEFORE, "superheat": None}
+    ops = diff_fields(BEFORE, after)
+    assert ops == [{"op": "replace", "path": "/superheat", "value": None}]
+    assert apply_patch(BEFORE, ops) == after
+
+
+def test_apply_patch_leaves_input_alone():
+    original = dict(BEFORE)
+    apply_patch(BEFORE, [{"op": "remove", "path": "/superheat"}, {"op": "add", "path": "/x", "value": 1}])
+    assert BEFORE == original
+
+
+def test_chained_patches_rebuild_every_version():
+    snapshots = [
+        BEFORE,
+        {**BEFORE, "delta_t": 15.0, "delta_t_status": "Good"},
+        {**BEFORE, "delta_t": 16.0, "delta_t_status": "Good", "warnings": [], "performance_score": 90},
+        {"customer_name": "Jane Doe", "performance_score": 95},
+    ]
+    patches = [diff_fields(a, b) for a, b in zip(snapshots, snapshots[1:])]
+    data = snapshots[0]
+    for patch, expected in zip(patches, snapshots[1:]):
+        data = apply_patch(data, patch)
+        assert data == expected
+
+
+def test_from_embedded_round_trip():
+    embedded = [
+        {"version": 2, "label": "After Repair 1", "timestamp": "t2",
+         "data": {**BEFORE, "delta_t": 18.0, "delta_t_status": "Good"}},
+        {"version": 1, "label": "Before Repair", "timestamp": "t1", "data": BEFORE},
+        {"version": 3, "label": "After Repair 2", "timestamp": "t3", "data": {"customer_name": "Jane Roe"}},
+    ]
+    docs = from_embedded("r1", embedded)
+    assert [doc["version"] for doc in docs] == [1, 2, 3]
+    assert docs[0] == base_version("r1", BEFORE, "t1")
+    data = docs[0]["base"]
+    for doc, entry in zip(docs[1:], sorted(embedded, key=lambda v: v["version"])[1:]):
+        data = apply_patch(data, doc["patch"])
+        assert data == entry["data"]
+        assert doc["label"] == entry["label"]
+
+
+def test_version_data_keeps_tracked_fields_only():
+    report = {**BEFORE, "id": "r1", "photos": ["abc"], "equipment_brand": "Lennox"}
+    assert version_data(report) == BEFORE
+
+
+def test_edit_label():
+    assert edit_label(1) == ORIGINAL_LABEL
+    assert edit_label(3) == "After Repair 2"
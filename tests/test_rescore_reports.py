@@ -0,0 +1,103 @@
+import itertools
+
+import pytest
+
+import rescore_reports
+from diagnostics import evaluate_report
+from rescore_reports import OUTPUT_FIELDS, build_updates, rescore
+from tests.fake_mongo import FakeDatabase
+
+pytestmark = pytest.mark.anyio
+
+MEASUREMENTS = {
+    "return_temp": 75, "supply_temp": 57,
+    "blower_motor_type": "PSC Motor",
+    "blower_motor_capacitor_rating": 10, "blower_motor_capacitor_reading": 10,
+    "condenser_capacitor_herm_rating": 40, "condenser_capacitor_herm_reading": 40,
+    "condenser_capacitor_fan_rating": 5, "condenser_capacitor_fan_reading": 5,
+    "refrigerant_status": "Good",
+    "primary_drain": "Clear",
+    "drain_pan_condition": "Good shape",
+    "air_purifier": "Good",
+}
+
+
+def reports():
+    cases = [
+        {"blower_motor_type": motor, "blower_motor_capacitor_reading": blower,
+         "condenser_capacitor_herm_reading": herm, "condenser_capacitor_fan_reading": fan,
+         "supply_temp": 75 - delta_t}
+        for motor, blower, herm, fan, delta_t in itertools.product(
+            ["PSC Motor", "ECM Motor", None], [10, 9.3, 8, None], [40, 37.6, 36, 30], [5, 4.6, 4, 6],
+            [5, 10, 12, 15, 22.1, 25, 28.1],
+        )
+    ] + [
+        {"refrigerant_status": refrigerant, "primary_drain": drain, "drain_pan_condition": pan,
+         "air_purifier": purifier}
+        for refrigerant, drain, pan, purifier in itertools.product(
+            ["Good", "Low - Add Refrigerant", "Critical - Repairs may be needed", None],
+            ["Clear", "Clogged, needs immediate service", None],
+            ["Good shape", "Fair condition", "Rusted and should be replaced", None],
+            ["Good", "UV light needs replacement", None],
+        )
+    ]
+    return [{"_id": i, "revision": 1, **MEASUREMENTS, **case} for i, case in enumerate(cases)]
+
+
+def test_score_frame_matches_evaluate_report():
+    docs = reports()
+    updates, skipped = build_updates(docs)
+    assert skipped == 0
+    # Nothing was scored before, so every report comes back with all of its fields
+    assert len(updates) == len(docs)
+    for _id, changed in updates:
+        expected = evaluate_report(docs[_id]).fields()
+        assert changed == {field: value for field, value in expected.items() if value is not None}, docs[_id]
+
+
+def test_unchanged_reports_are_not_rewritten():
+    docs = [{**doc, **evaluate_report(doc).fields()} for doc in reports()]
+    assert build_updates(docs, verify=True) == ([], 0)
+
+
+def test_unscorable_reports_are_skipped():
+    docs = [{"_id": 1, **MEASUREMENTS, "return_temp": None},
+            {"_id": 2, **MEASUREMENTS, "condenser_capacitor_fan_rating": 0},
+            {"_id": 3, **MEASUREMENTS}]
+    updates, skipped = build_updates(docs)
+    assert [_id for _id, _ in updates] == [3]
+    assert skipped == 2
+
+
+async def test_rescore_writes_changed_reports():
+    db = FakeDatabase()
+    docs = reports()[:20]
+    await db.reports.insert_many(docs)
+
+    totals = await rescore(db, chunk_size=8, verify=True)
+
+    assert totals == {"scanned": 20, "updated": 20, "skipped": 0, "conflicts": 0}
+    stored = await db.reports.find().to_list(None)
+    for doc in stored:
+        assert {field: doc.get(field) for field in OUTPUT_FIELDS} == evaluate_report(doc).fields()
+    # Each rewritten report gets its own revision
+    assert len({doc["revision"] for doc in stored}) == 20
+    assert await db.job_checkpoints.find_one({}) is None
+
+
+async def test_rescore_leaves_reports_edited_since_they_were_read(monkeypatch):
+    db = FakeDatabase()
+    await db.reports.insert_many(reports()[:3])
+    next_revision = rescore_reports.next_revision
+
+    async def edited_meanwhile(db, count=1):
+        await db.reports.update_one({"_id": 1}, {"$set": {"revision": 50, "notes": "edited"}})
+        return await next_revision(db, count)
+
+    monkeypatch.setattr(rescore_reports, "next_revision", edited_meanwhile)
+    totals = await rescore(db)
+
+    assert (totals["updated"], totals["conflicts"]) == (2, 1)
+    edited = await db.reports.find_one({"_id": 1})
+    assert edited["revision"] == 50
+    assert "performance_score" not in edited
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+
+from serial_decoders import brand_family, decode_serial
+
+NOW = datetime(2024, 6, 15)
+
+
+@pytest.mark.parametrize("brand, family", [
+    ("Lennox", "lennox"),
+    ("LENNOX INDUSTRIES INC", "lennox"),
+    ("Bryant", "carrier"),
+    ("American Standard", "trane"),
+    ("american-standard heating & air", "trane"),
+    ("Day & Night", "carrier"),
+    ("Fraser-Johnston", "york"),
+    ("ICP", "icp"),
+    ("Heil Quaker", "icp"),
+    # Short names only match as whole words
+    ("TOPICPRO", None),
+    ("Unknown Brand", None),
+    ("", None),
+    (None, None),
+])
+def test_brand_family(brand, family):
+    assert brand_family(brand) == family
+
+
+@pytest.mark.parametrize("brand, serial, decoder, year, month", [
+    ("Lennox", "5823C12345", "lennox", 2023, 3),
+    ("Carrier", "2310E12345", "carrier_wwyy", 2010, 6),
+    ("Trane", "13153KB21F", "trane_yyww", 2013, 4),
+    ("Goodman", "0901234567", "goodman_yymm", 2009, 1),
+    ("Rheem", "W031512345", "rheem_mmyy", 2015, 3),
+    ("York", "W1L5123456", "york_2004", 2015, 11),
+    ("Tempstar", "E091112345", "icp_yyww", 2009, 3),
+])
+def test_brand_decoders(brand, serial, decoder, year, month):
+    result = decode_serial(brand, serial, now=NOW)
+    assert result.decoder == decoder
+    assert (result.manufacture_year, result.manufacture_month) == (year, month)
+
+
+def test_serial_is_normalized():
+    assert decode_serial("Rheem", "w0315-12345", now=NOW).decoder == "rheem_mmyy"
+
+
+def test_age_and_active_warranty():
+    result = decode_serial("Lennox", "5823C12345", now=NOW)
+    assert result.date_of_manufacture == "March 2023"
+    assert result.estimated_age == "1 years 3 months"
+    assert result.warranty_status == "Active (8 years 8 months remaining)"
+
+
+def test_expired_warranty():
+    result = decode_serial("Goodman", "0901234567", now=NOW)
+    assert result.estimated_age == "15 years 5 months"
+    assert result.warranty_status == "Expired"
+
+
+def test_invalid_month_falls_back_to_generic():
+    # 13 isn't a month, so the Goodman decoder rejects it and the leading year is used
+    result = decode_serial("Goodman", "0913234567", now=NOW)
+    assert result.decoder == "generic"
+    assert (result.manufacture_year, result.manufacture_month) == (2009, None)
+    assert result.date_of_manufacture is None
+
+
+def test_unknown_brand_uses_generic_year():
+    result = decode_serial("Acme", "XX2012ABC", now=NOW)
+    assert result.brand_family is None
+    assert result.decoder == "generic"
+    assert result.manufacture_year == 2012
+
+
+def test_future_date_needs_manual_verification():
+    result = decode_serial("Goodman", "2401234567", now=datetime(2023, 6, 15))
+    assert result.manufacture_year == 2024
+    assert result.estimated_age is None
+    assert result.warranty_status == "Unable to determine - Manual verification needed"
+
+
+@pytest.mark.parametrize("serial", [None, "", "NOT FOUND", "not-found"])
+def test_missing_serial(serial):
+    result = decode_serial("Lennox", serial, now=NOW)
+    assert result.decoder is None
+    assert result.warranty_status == "Unknown"
+
+
+def test_undecodable_serial():
+    result = decode_serial("Lennox", "ABCDEF", now=NOW)
+    assert result.decoder is None
+    assert result.warranty_status == "Unable to determine - Manual verification needed"
@@ -0,0 +1,60 @@
+import pytest
+
+from tests.support import REPORT_FORM, auth, report_doc
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def edited_report(server, client):
+    report = report_doc()
+    await server.db.reports.insert_one(report)
+    response = await client.put(f"/api/reports/{report['id']}/edit", headers=auth(server, "tech-1"),
+                                json={**REPORT_FORM, "customer_email": "new@example.com"})
+    assert response.status_code == 200
+    return report
+
+
+async def test_versions_need_a_login(client, edited_report):
+    for path in ("versions", "versions/1", "versions/1/diff/2"):
+        response = await client.get(f"/api/reports/{edited_report['id']}/{path}")
+        assert response.status_code in (401, 403)
+
+
+@pytest.mark.parametrize("user_id, user_type, linked, status", [
+    ("tech-1", "technician", False, 200),
+    ("tech-2", "technician", False, 403),
+    ("cust-1", "customer", True, 200),
+    ("cust-1", "customer", False, 403),
+])
+async def test_versions_are_for_the_technician_and_linked_customers(server, client, edited_report,
+                                                                    user_id, user_type, linked, status):
+    if linked:
+        await server.db.customer_reports.insert_one({"customer_id": user_id, "report_id": edited_report["id"]})
+    headers = auth(server, user_id, user_type)
+    for path in ("versions", "versions/1", "versions/1/diff/2"):
+        response = await client.get(f"/api/reports/{edited_report['id']}/{path}", headers=headers)
+        assert response.status_code == status, path
+    if status == 200:
+        version = (await client.get(f"/api/reports/{edited_report['id']}/versions/1", headers=headers)).json()
+        assert version["data"]["customer_email"] == "jane@example.com"
+
+
+async def test_versions_of_a_missing_report(server, client):
+    response = await client.get("/api/reports/nope/versions", headers=auth(server, "tech-1"))
+    assert response.status_code == 404
+
+
+async def test_shared_versions_leave_out_contact_details(client, edited_report):
+    link = edited_report["unique_link"]
+    versions = (await client.get(f"/api/reports/view/{link}/versions")).json()
+    assert [version["version"] for version in versions] == [1, 2]
+
+    response = await client.get(f"/api/reports/view/{link}/versions/1")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["customer_name"] == "Jane Doe"
+    assert "customer_email" not in data and "customer_phone" not in data
+
+    assert (await client.get(f"/api/reports/view/{link}/versions/9")).status_code == 404
+    assert (await client.get("/api/reports/view/nope/versions")).status_code == 404
@@ -0,0 +1,188 @@
+import asyncio
+import json
+
+import pytest
+
+from vision_providers import (
+    HEDGE_MIN_SAMPLES,
+    CircuitOpen,
+    FakeVisionProvider,
+    ResilientVision,
+    VisionProvider,
+    VisionTimeout,
+)
+
+pytestmark = pytest.mark.anyio
+
+ARGS = ("test", "system", "Read the data plate", "aW1hZ2U=")
+
+
+class ScriptedProvider(VisionProvider):
+    """Plays back one (delay, outcome) step per call; an exception outcome is raised"""
+    name = "scripted"
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def complete(self, session_prefix, system_message, prompt, image_base64):
+        delay, outcome = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def expire_open_period(vision: ResilientVision) -> None:
+    vision.opened_at -= vision.reset_after
+
+
+async def test_fake_provider_replies_by_prompt():
+    provider = FakeVisionProvider(latency_ms=0, failure_rate=0)
+    plate = await provider.complete("test", "system", "Read the data plate", "")
+    warranty = await provider.complete("test", "system", "Estimate the warranty", "")
+    assert json.loads(plate.strip("`").removeprefix("json")) == FakeVisionProvider.DATA_PLATE_REPLY
+    assert json.loads(warranty.strip("`").removeprefix("json")) == FakeVisionProvider.WARRANTY_REPLY
+
+
+async def test_fake_provider_failure_rate():
+    with pytest.raises(RuntimeError):
+        await FakeVisionProvider(latency_ms=0, failure_rate=1).complete(*ARGS)
+
+
+async def test_breaker_opens_after_consecutive_failures():
+    provider = ScriptedProvider((0, RuntimeError("down")))
+    vision = ResilientVision(provider, timeout=1, failure_threshold=3, reset_after=30, hedge=False)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            await vision.complete(*ARGS)
+    assert vision.state == "open"
+
+    with pytest.raises(CircuitOpen) as refused:
+        await vision.complete(*ARGS)
+    assert provider.calls == 3
+    assert 1 <= refused.value.retry_after <= 30
+    assert vision.stats["short_circuited"] == 1
+
+
+async def test_success_resets_failure_count():
+    provider = ScriptedProvider((0, RuntimeError("down")), (0, RuntimeError("down")), (0, "ok"),
+                                (0, RuntimeError("down")))
+    vision = ResilientVision(provider, timeout=1, failure_threshold=3, reset_after=30, hedge=False)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await vision.complete(*ARGS)
+    assert await vision.complete(*ARGS) == "ok"
+    with pytest.raises(RuntimeError):
+        await vision.complete(*ARGS)
+    assert vision.consecutive_failures == 1
+    assert vision.state == "closed"
+
+
+async def test_half_open_trial_success_closes():
+    provider = ScriptedProvider((0, RuntimeError("down")), (0, "ok"))
+    vision = ResilientVision(provider, timeout=1, failure_threshold=1, reset_after=30, hedge=False)
+    with pytest.raises(RuntimeError):
+        await vision.complete(*ARGS)
+    expire_open_period(vision)
+    assert vision.state == "half_open"
+
+    assert await vision.complete(*ARGS) == "ok"
+    assert vision.state == "closed"
+    assert vision.consecutive_failures == 0
+
+
+async def test_half_open_trial_failure_reopens():
+    provider = ScriptedProvider((0, RuntimeError("down")))
+    vision = ResilientVision(provider, timeout=1, failure_threshold=1, reset_after=30, hedge=False)
+    with pytest.raises(RuntimeError):
+        await vision.complete(*ARGS)
+    expire_open_period(vision)
+
+    with pytest.raises(RuntimeError):
+        await vision.complete(*ARGS)
+    assert vision.state == "open"
+
+
+async def test_half_open_allows_a_single_trial():
+    provider = ScriptedProvider((0, RuntimeError("down")), (0.05, "ok"))
+    vision = ResilientVision(provider, timeout=1, failure_threshold=1, reset_after=30, hedge=False)
+    with pytest.raises(RuntimeError):
+        await vision.complete(*ARGS)
+    expire_open_period(vision)
+
+    trial = asyncio.ensure_future(vision.complete(*ARGS))
+    await asyncio.sleep(0)
+    with pytest.raises(CircuitOpen):
+        await vision.complete(*ARGS)
+    assert await trial == "ok"
+    assert provider.calls == 2
+
+
+async def test_deadline_raises_timeout_and_counts_failure():
+    provider = ScriptedProvider((10, "late"))
+    vision = ResilientVision(provider, timeout=0.05, failure_threshold=2, reset_after=30, hedge=False)
+    with pytest.raises(VisionTimeout):
+        await vision.complete(*ARGS)
+    assert vision.stats["timeouts"] == 1
+    assert vision.consecutive_failures == 1
+    assert provider.cancelled == 1
+
+
+async def test_no_hedge_until_enough_samples():
+    vision = ResilientVision(ScriptedProvider((0, "ok")), hedge=True)
+    vision._latencies.extend([0.01] * (HEDGE_MIN_SAMPLES - 1))
+    assert vision.hedge_delay() is None
+    vision._latencies.append(0.01)
+    assert vision.hedge_delay() == 0.01
+
+
+async def test_hedge_wins_when_primary_is_slow():
+    provider = ScriptedProvider((10, "primary"), (0, "hedge"))
+    vision = ResilientVision(provider, timeout=1, hedge=True)
+    vision._latencies.extend([0.01] * HEDGE_MIN_SAMPLES)
+
+    assert await vision.complete(*ARGS) == "hedge"
+    await asyncio.sleep(0)
+    assert vision.stats["hedges"] == 1
+    assert vision.stats["hedge_wins"] == 1
+    assert provider.cancelled == 1
+
+
+async def test_hedge_not_sent_when_primary_is_fast():
+    provider = ScriptedProvider((0, "primary"))
+    vision = ResilientVision(provider, timeout=1, hedge=True)
+    vision._latencies.extend([0.5] * HEDGE_MIN_SAMPLES)
+
+    assert await vision.complete(*ARGS) == "primary"
+    assert provider.calls == 1
+    assert vision.stats["hedges"] == 0
+
+
+async def test_hedge_falls_back_to_primary_when_hedge_fails():
+    provider = ScriptedProvider((0.05, "primary"), (0, RuntimeError("hedge down")))
+    vision = ResilientVision(provider, timeout=1, hedge=True)
+    vision._latencies.extend([0.01] * HEDGE_MIN_SAMPLES)
+
+    assert await vision.complete(*ARGS) == "primary"
+    assert vision.stats["hedges"] == 1
+    assert vision.stats["hedge_wins"] == 0
+    assert vision.consecutive_failures == 0
+
+
+async def test_deadline_covers_hedges():
+    provider = ScriptedProvider((10, "late"))
+    vision = ResilientVision(provider, timeout=0.1, hedge=True)
+    vision._latencies.extend([0.01] * HEDGE_MIN_SAMPLES)
+
+    with pytest.raises(VisionTimeout):
+        await vision.complete(*ARGS)
+    await asyncio.sleep(0)
+    assert provider.calls == 2
+    assert provider.cancelled == 2